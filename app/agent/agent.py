@@ -5,9 +5,9 @@ from llama_index.core import PromptTemplate
 from schema.agent import AgentResponse
 from pathlib import Path
 
-from typing import Dict, List, Tuple
-from collections import defaultdict
+from typing import List
 from schema.response import KeyframeServiceResponse
+from common.object_index import KeyframeObjectIndex
 import os
 from llama_index.core.llms import ChatMessage, ImageBlock, TextBlock, MessageRole
 
@@ -118,30 +118,6 @@ class VisualEventExtractor:
         response = await self.llm.as_structured_llm(AgentResponse).acomplete(prompt)
         obj = cast(AgentResponse, response.raw)
         return obj
-    
-
-    @staticmethod
-    def calculate_video_scores(keyframes: List[KeyframeServiceResponse]) -> List[Tuple[float, List[KeyframeServiceResponse]]]:
-        """
-        Calculate average scores for each video and return sorted by score
-        
-        Returns:
-            List of tuples: (video_num, average_score, keyframes_in_video)
-        """
-        video_keyframes: Dict[str, List[KeyframeServiceResponse]] = defaultdict(list)
-        
-        for keyframe in keyframes:
-            video_keyframes[f"{keyframe.group_num}/{keyframe.video_num}"].append(keyframe)
-        
-        video_scores: List[Tuple[float, List[KeyframeServiceResponse]]] = []
-        for _, video_keyframes_list in video_keyframes.items():
-            avg_score = sum(kf.confidence_score for kf in video_keyframes_list) / len(video_keyframes_list)
-            video_scores.append((avg_score, video_keyframes_list))
-        
-        video_scores.sort(key=lambda x: x[0], reverse=True)
-        
-        return video_scores
-    
 
 
 
@@ -174,13 +150,12 @@ class AnswerGenerator:
         self,
         original_query: str,
         final_keyframes: List[KeyframeServiceResponse],
-        objects_data: Dict[str, List[str]],
+        object_index: KeyframeObjectIndex,
         
     ):
         chat_messages = []
         for kf in final_keyframes:
-            keyy = f"L{kf.group_num:02d}/V{kf.video_num:03d}/{kf.keyframe_num:08d}.webb"
-            objects = objects_data.get(keyy, [])
+            objects = object_index.objects_of(kf.key)
 
             image_path = os.path.join(self.data_folder, f"L{kf.group_num:02d}/V{kf.video_num:03d}/{kf.keyframe_num:08d}.webp")
 
@@ -8,6 +8,7 @@ ROOT_DIR = os.path.abspath(
 sys.path.insert(0, ROOT_DIR)
 
 from typing import List, cast
+import numpy as np
 from llama_index.core.llms import LLM
 
 from .agent import VisualEventExtractor, AnswerGenerator
@@ -15,34 +16,24 @@ from .agent import VisualEventExtractor, AnswerGenerator
 from service.search_service import KeyframeQueryService
 from service.model_service import ModelService
 from schema.response import KeyframeServiceResponse
+from service.video_ranking import rank_videos
+from common.object_index import KeyframeObjectIndex
 
 
 
 
 def apply_object_filter(
         keyframes: List[KeyframeServiceResponse], 
-        objects_data: dict[str, list[str]], 
+        object_index: KeyframeObjectIndex, 
         target_objects: List[str]
     ) -> List[KeyframeServiceResponse]:
         
         if not target_objects:
             return keyframes
-        
-        target_objects_set = {obj.lower() for obj in target_objects}
-        filtered_keyframes = []
-
-        for kf in keyframes:
-            keyy = f"L{kf.group_num:02d}/V{kf.video_num:03d}/{kf.keyframe_num:08d}.webp"
-            keyframe_objects = objects_data.get(keyy, [])
-            print(f"{keyy=}")
-            print(f"{keyframe_objects=}")
-            keyframe_objects_set = {obj.lower() for obj in keyframe_objects}
-            
-            if target_objects_set.intersection(keyframe_objects_set):
-                filtered_keyframes.append(kf)
 
-        print(f"{filtered_keyframes=}")
-        return filtered_keyframes
+        ids = np.fromiter((kf.key for kf in keyframes), dtype=np.int64, count=len(keyframes))
+        keep = object_index.contains_any(ids, target_objects)
+        return [kf for kf, kept in zip(keyframes, keep) if kept]
 
 
 
@@ -55,17 +46,19 @@ class KeyframeSearchAgent:
         keyframe_service: KeyframeQueryService,
         model_service: ModelService,
         data_folder: str,
-        objects_data: dict[str, list[str]],
+        object_index: KeyframeObjectIndex,
         asr_data: dict[str, str | list[dict[str,str]]],
-        top_k: int = 10
+        top_k: int = 10,
+        push_down_objects: bool = True
     ):
         self.llm = llm
         self.keyframe_service = keyframe_service
         self.model_service = model_service
         self.data_folder = data_folder
         self.top_k = top_k
+        self.push_down_objects = push_down_objects
 
-        self.objects_data = objects_data or {}
+        self.object_index = object_index
         self.asr_data = asr_data or {}
 
         self.query_extractor = VisualEventExtractor(llm)
@@ -77,8 +70,8 @@ class KeyframeSearchAgent:
         Main agent flow:
         1. Extract visual/event elements and rephrase query
         2. Search for top-K keyframes using rephrased query
-        3. Score videos by averaging keyframe scores, select best video
-        4. Optionally apply COCO object filtering
+        3. Score videos by pooling keyframe scores, select best video
+        4. Optionally apply COCO object filtering, inside the vector search when push_down_objects is set
         5. Generate final answer with visual context
         """
 
@@ -90,30 +83,42 @@ class KeyframeSearchAgent:
         print(f"{search_query=}")
         print(f"{suggested_objects=}")
 
-        embedding = self.model_service.embedding(search_query).tolist()[0]
-        top_k_keyframes = await self.keyframe_service.search_by_text(
-            text_embedding=embedding,
-            top_k=self.top_k,
-            score_threshold=0.1
-        )
+        embedding = (await self.model_service.aembedding(search_query)).tolist()
+        object_mask = self.object_index.mask(suggested_objects) if self.push_down_objects else None
+        top_k_keyframes = []
+        if object_mask is not None:
+            # Only keyframes containing a suggested object compete in the search
+            top_k_keyframes = await self.keyframe_service.search_by_text_with_mask(
+                text_embedding=embedding,
+                top_k=self.top_k,
+                score_threshold=0.1,
+                allowed_mask=object_mask
+            )
+        objects_applied = bool(top_k_keyframes)
+        if not objects_applied:
+            top_k_keyframes = await self.keyframe_service.search_by_text(
+                text_embedding=embedding,
+                top_k=self.top_k,
+                score_threshold=0.1
+            )
 
 
-        video_scores = self.query_extractor.calculate_video_scores(top_k_keyframes)
-        _, best_video_keyframes = video_scores[0]
+        ranked_videos = rank_videos(top_k_keyframes, method="mean", top_n=1)
+        if not ranked_videos:
+            return "No relevant keyframes were found for this query."
+        best_video_keyframes = ranked_videos[0].keyframes
 
 
 
         final_keyframes = best_video_keyframes
-        print(f"Length of keyframes before objects {len(final_keyframes)}")
-        if suggested_objects:
+        if suggested_objects and not objects_applied:
             filtered_keyframes = apply_object_filter(
                 keyframes=best_video_keyframes,
-                objects_data=self.objects_data,
+                object_index=self.object_index,
                 target_objects=suggested_objects
             )
             if filtered_keyframes:  
                 final_keyframes = filtered_keyframes
-        print(f"Length of keyframes after objects {len(final_keyframes)}")
         
         
         smallest_kf = min(final_keyframes, key=lambda x: int(x.keyframe_num))
@@ -149,7 +154,7 @@ class KeyframeSearchAgent:
         answer = await self.answer_generator.generate_answer(
             original_query=user_query,
             final_keyframes=final_keyframes,
-            objects_data=self.objects_data,
+            object_index=self.object_index,
             # asr_data=asr_text
         )
 
@@ -0,0 +1,215 @@
+"""
+Per-video embedding shards written by migration/generate_embeddings_features.py. Each video is one
+.npz (ids, embeddings, image mtimes, keyframe numbers) and manifest.json records a fingerprint of the
+video folder and its table ids, so reruns only embed new or changed keyframes, renumbered ids are
+re-keyed, and an interrupted run resumes at the next video.
+"""
+
+from pathlib import Path
+from typing import Iterable, Iterator
+import hashlib
+import json
+import os
+import numpy as np
+
+
+SHARD_MANIFEST = "manifest.json"
+
+
+def shard_name(group_num: int, video_num: int) -> str:
+    """
+    Shard of one video, e.g. (21, 1) -> 'L21_V001'
+    """
+    return f"L{group_num:02d}_V{video_num:03d}"
+
+
+def parse_shard_name(name: str) -> tuple[int, int] | None:
+    """
+    (group_num, video_num) of a shard name, e.g. 'L21_V001' -> (21, 1); None if malformed.
+    """
+    group, _, video = name.partition("_V")
+    if not (group.startswith("L") and group[1:].isdigit() and video.isdigit()):
+        return None
+    return int(group[1:]), int(video)
+
+
+def folder_fingerprint(
+    entries: list[tuple[str, int, int]],
+    keyframes: Iterable[tuple[int, int]] = ()
+) -> str:
+    """
+    Hash of (file name, size, mtime_ns) for the images of a video folder, plus the
+    (id, keyframe number) pairs the keyframe table assigns to that video.
+    """
+    digest = hashlib.sha1()
+    for name, size, mtime_ns in sorted(entries):
+        digest.update(f"{name}:{size}:{mtime_ns}\n".encode())
+    for id_, keyframe_num in sorted(keyframes):
+        digest.update(f"#{id_}:{keyframe_num}\n".encode())
+    return digest.hexdigest()
+
+
+class EmbeddingShardStore:
+    """
+    manifest.json: {"model_name", "dim", "shards": {name: {"fingerprint", "failed", "content", "count", "max_id"}}}
+
+    ``failed`` counts images that could not be loaded; such shards are retried even when
+    their fingerprint is unchanged. ``content`` hashes the stored ids and embeddings, so
+    consumers can tell whether a shard was rewritten since they last read it.
+    """
+
+    def __init__(self, root: str | Path, model_name: str | None = None):
+        self.root = Path(root)
+        manifest_path = self.root / SHARD_MANIFEST
+        if manifest_path.exists():
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"model_name": model_name, "dim": None, "shards": {}}
+        if model_name and self.manifest.get("model_name") not in (None, model_name):
+            raise ValueError(
+                f"Shards in {self.root} were embedded with {self.manifest['model_name']!r}, not {model_name!r}"
+            )
+        if model_name:
+            self.manifest["model_name"] = model_name
+
+    @property
+    def dim(self) -> int | None:
+        return self.manifest.get("dim")
+
+    @property
+    def shards(self) -> dict[str, dict]:
+        return self.manifest["shards"]
+
+    @property
+    def num_ids(self) -> int:
+        """
+        Rows needed to hold every stored id, i.e. max id + 1.
+        """
+        return max((entry["max_id"] for entry in self.shards.values()), default=-1) + 1
+
+    def __len__(self) -> int:
+        return sum(entry["count"] for entry in self.shards.values())
+
+    def fingerprint(self, name: str) -> str | None:
+        entry = self.shards.get(name)
+        return entry["fingerprint"] if entry else None
+
+    def is_complete(self, name: str, fingerprint: str) -> bool:
+        """
+        Whether a shard exists for ``fingerprint`` with every image embedded.
+        """
+        entry = self.shards.get(name)
+        return entry is not None and entry["fingerprint"] == fingerprint and not entry.get("failed", 0)
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.npz"
+
+    def _save_manifest(self):
+        path = self.root / SHARD_MANIFEST
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, path)
+
+    def read(self, name: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (ids, embeddings, image mtimes) of a shard; empty arrays when it does not exist.
+        """
+        path = self._path(name)
+        if name not in self.shards or not path.exists():
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32), np.empty(0, dtype=np.int64)
+        with np.load(path) as shard:
+            return shard["ids"], shard["embeddings"], shard["mtimes"]
+
+    def read_ids(self, name: str) -> np.ndarray:
+        path = self._path(name)
+        if name not in self.shards or not path.exists():
+            return np.empty(0, dtype=np.int64)
+        with np.load(path) as shard:
+            return shard["ids"]
+
+    def read_keyframe_nums(self, name: str) -> np.ndarray | None:
+        """
+        Keyframe number of each row of ``read(name)``; None for shards written without them.
+        """
+        path = self._path(name)
+        if name not in self.shards or not path.exists():
+            return None
+        with np.load(path) as shard:
+            return shard["keyframe_nums"] if "keyframe_nums" in shard.files else None
+
+    def write(
+        self,
+        name: str,
+        ids: np.ndarray,
+        embeddings: np.ndarray,
+        mtimes: np.ndarray,
+        keyframe_nums: np.ndarray,
+        fingerprint: str,
+        failed: int = 0
+    ):
+        """
+        Atomically replace a shard, then record it in the manifest.
+        """
+        if self.dim is None:
+            self.manifest["dim"] = int(embeddings.shape[1])
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Shard {name} has dimension {embeddings.shape[1]}, store has {self.dim}")
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        order = np.argsort(ids, kind="stable")
+        ids = np.ascontiguousarray(np.asarray(ids, dtype=np.int64)[order])
+        embeddings = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32)[order])
+        content = hashlib.sha1(ids.tobytes())
+        content.update(embeddings.tobytes())
+        path = self._path(name)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                ids=ids,
+                embeddings=embeddings,
+                mtimes=np.asarray(mtimes, dtype=np.int64)[order],
+                keyframe_nums=np.asarray(keyframe_nums, dtype=np.int64)[order]
+            )
+        os.replace(tmp_path, path)
+        self.shards[name] = {
+            "fingerprint": fingerprint,
+            "failed": int(failed),
+            "content": content.hexdigest(),
+            "count": int(len(ids)),
+            "max_id": int(ids.max()) if len(ids) else -1,
+        }
+        self._save_manifest()
+
+    def remove(self, name: str):
+        if self.shards.pop(name, None) is not None:
+            self._save_manifest()
+        self._path(name).unlink(missing_ok=True)
+
+    def iter_shards(self, names: list[str] | None = None) -> Iterator[tuple[str, np.ndarray, np.ndarray]]:
+        """
+        (name, ids, embeddings) one shard at a time, in name order.
+        """
+        for name in sorted(names if names is not None else self.shards):
+            ids, embeddings, _ = self.read(name)
+            if len(ids):
+                yield name, ids, embeddings
+
+    def to_memmap(self, output_path: str | Path, num_rows: int | None = None) -> Path:
+        """
+        Write every shard into one (num_rows, dim) .npy with row index == keyframe id,
+        for the local and usearch backends. Rows without a shard stay zero.
+        """
+        if self.dim is None:
+            raise ValueError(f"No shards in {self.root}")
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        num_rows = max(num_rows or 0, self.num_ids)
+        matrix = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(num_rows, self.dim))
+        for _, ids, embeddings in self.iter_shards():
+            matrix[ids] = embeddings
+        matrix.flush()
+        del matrix
+        return output_path
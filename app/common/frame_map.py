@@ -0,0 +1,127 @@
+"""
+(group, video, keyframe n) -> frame_idx / pts_time / fps lookup. The map-keyframes CSVs are
+packed once by migration/generate_frame_map.py into a .npy sorted by a composite key, which is
+searched with np.searchsorted; videos missing from it fall back to an LRU of per-video CSV arrays.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+import csv
+import re
+import numpy as np
+
+
+# Composite key = (group * KEY_SPAN + video) * KEY_SPAN + n
+KEY_SPAN = 1 << 20
+
+FRAME_MAP_DTYPE = np.dtype([
+    ("key", np.int64),
+    ("frame_idx", np.int64),
+    ("pts_time", np.float32),
+    ("fps", np.float32),
+])
+
+VIDEO_FRAMES_DTYPE = np.dtype([
+    ("n", np.int64),
+    ("frame_idx", np.int64),
+    ("pts_time", np.float32),
+    ("fps", np.float32),
+])
+
+MAP_FILE_PATTERN = re.compile(r"^L(\d+)_V(\d+)\.csv$")
+
+
+class FrameInfo(NamedTuple):
+    frame_idx: int
+    pts_time: float
+    fps: float
+
+
+def frame_map_key(group_num, video_num, n):
+    """
+    Composite sort key; accepts scalars or NumPy arrays.
+    """
+    return (np.int64(group_num) * KEY_SPAN + video_num) * KEY_SPAN + n
+
+
+def read_frame_map_csv(map_file: str | Path) -> np.ndarray:
+    """
+    Rows of one map-keyframes CSV (columns n, pts_time, fps, frame_idx), sorted by n.
+    """
+    with open(map_file, 'r', newline='', encoding='utf-8') as f:
+        rows = [
+            (int(float(row["n"])), int(float(row["frame_idx"])), float(row["pts_time"]), float(row["fps"]))
+            for row in csv.DictReader(f)
+        ]
+    frames = np.array(rows, dtype=VIDEO_FRAMES_DTYPE)
+    return frames[np.argsort(frames["n"], kind="stable")]
+
+
+class FrameMap:
+    def __init__(
+        self,
+        records: np.ndarray | None = None,
+        map_keyframes_dir: str | Path | None = None,
+        cache_size: int = 256
+    ):
+        """
+        records: FRAME_MAP_DTYPE rows sorted by key (None: CSV fallback only)
+        map_keyframes_dir: folder of Lxx_Vyyy.csv files for videos not in ``records``
+        cache_size: number of per-video CSV arrays kept in memory
+        """
+        if records is None:
+            records = np.empty(0, dtype=FRAME_MAP_DTYPE)
+        self.records = records
+        self.keys = records["key"]
+        self.map_keyframes_dir = Path(map_keyframes_dir) if map_keyframes_dir else None
+        self.cache_size = cache_size
+        self._videos: OrderedDict[tuple[int, int], np.ndarray | None] = OrderedDict()
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path | None,
+        map_keyframes_dir: str | Path | None = None,
+        cache_size: int = 256
+    ) -> "FrameMap":
+        records = None
+        if path and Path(path).exists():
+            records = np.load(path, mmap_mode="r")
+        return cls(records, map_keyframes_dir=map_keyframes_dir, cache_size=cache_size)
+
+    def __len__(self) -> int:
+        return self.records.shape[0]
+
+    def _video_frames(self, group_num: int, video_num: int) -> np.ndarray | None:
+        video = (group_num, video_num)
+        if video in self._videos:
+            self._videos.move_to_end(video)
+            return self._videos[video]
+
+        frames = None
+        if self.map_keyframes_dir is not None:
+            map_file = self.map_keyframes_dir / f"L{group_num:02d}_V{video_num:03d}.csv"
+            if map_file.exists():
+                frames = read_frame_map_csv(map_file)
+
+        self._videos[video] = frames
+        while len(self._videos) > self.cache_size:
+            self._videos.popitem(last=False)
+        return frames
+
+    def lookup(self, group_num: int, video_num: int, n: int) -> FrameInfo | None:
+        key = frame_map_key(group_num, video_num, n)
+        pos = int(np.searchsorted(self.keys, key))
+        if pos < len(self) and self.keys[pos] == key:
+            row = self.records[pos]
+            return FrameInfo(int(row["frame_idx"]), float(row["pts_time"]), float(row["fps"]))
+
+        frames = self._video_frames(group_num, video_num)
+        if frames is None:
+            return None
+        pos = int(np.searchsorted(frames["n"], n))
+        if pos < len(frames) and frames["n"][pos] == n:
+            row = frames[pos]
+            return FrameInfo(int(row["frame_idx"]), float(row["pts_time"]), float(row["fps"]))
+        return None
@@ -0,0 +1,83 @@
+"""
+Compact keyframe filters. Group/video restrictions are expressed as boolean masks over
+keyframe ids instead of Python lists of excluded ids, so the cost of a filtered query
+does not depend on how many ids it removes.
+"""
+
+from typing import Iterable, Optional
+import numpy as np
+
+
+def group_partition_name(group_num: int) -> str:
+    """
+    Milvus partition holding every keyframe of a group, e.g. 21 -> 'L21'.
+    """
+    return f"L{group_num:02d}"
+
+
+def ranges_to_mask(ranges: Iterable[tuple[int, int]], size: int) -> np.ndarray:
+    """
+    Boolean mask of length ``size`` with the inclusive ``(start, end)`` ranges set.
+    """
+    mask = np.zeros(size, dtype=bool)
+    for start, end in ranges:
+        mask[max(start, 0):max(end + 1, 0)] = True
+    return mask
+
+
+def mask_to_ranges(mask: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Inclusive ``(start, end)`` runs of True values in ``mask``.
+    """
+    padded = np.concatenate(([False], mask.astype(bool), [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return [(int(start), int(end) - 1) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def resolve_allowed_mask(
+    allowed_mask: Optional[np.ndarray],
+    exclude_ids: Optional[list[int]],
+    size: int,
+) -> np.ndarray | None:
+    """
+    Combine an allowed-id mask and a legacy exclude-id list into one mask of length ``size``.
+    Ids beyond the end of ``allowed_mask`` are treated as not allowed.
+    """
+    if allowed_mask is None and not exclude_ids:
+        return None
+
+    if allowed_mask is None:
+        mask = np.ones(size, dtype=bool)
+    elif allowed_mask.shape[0] == size:
+        mask = allowed_mask.astype(bool, copy=True)
+    else:
+        mask = np.zeros(size, dtype=bool)
+        overlap = min(size, allowed_mask.shape[0])
+        mask[:overlap] = allowed_mask[:overlap]
+
+    if exclude_ids:
+        ids = np.asarray(exclude_ids, dtype=np.int64)
+        mask[ids[(ids >= 0) & (ids < size)]] = False
+    return mask
+
+
+def mask_to_milvus_expr(mask: np.ndarray, field: str = "id") -> str:
+    """
+    Milvus boolean expression selecting the True positions of ``mask`` as id ranges.
+    Whichever of the allowed/excluded run lists is shorter is used, so the expression
+    grows with the number of contiguous runs, not with the number of ids.
+    """
+    allowed = mask_to_ranges(mask)
+    excluded = mask_to_ranges(~mask)
+
+    def _ranges_expr(ranges: list[tuple[int, int]]) -> str:
+        return " or ".join(
+            f"({field} >= {start} and {field} <= {end})" for start, end in ranges
+        )
+
+    if not allowed:
+        return f"{field} < 0"
+    if len(allowed) <= len(excluded) + 1:
+        return _ranges_expr(allowed)
+    # Keyframes past the end of the mask are not allowed either
+    return f"{field} < {mask.shape[0]} and not ({_ranges_expr(excluded)})"
@@ -0,0 +1,256 @@
+"""
+Columnar keyframe table: group / video / keyframe numbers and image extension indexed by
+keyframe id. Replaces the string-keyed id2index.json dict at runtime; persisted as a structured
+.npy by migration/generate_id2index.py and opened memory-mapped.
+"""
+
+from pathlib import Path
+from typing import Iterable, Optional
+import json
+import os
+import numpy as np
+
+
+KEYFRAME_TABLE_DTYPE = np.dtype([
+    ("group_num", np.int16),
+    ("video_num", np.int16),
+    ("keyframe_num", np.int32),
+    ("ext", np.uint8),
+])
+
+# Tables written before the ext column existed
+LEGACY_KEYFRAME_TABLE_DTYPE = np.dtype([
+    ("group_num", np.int16),
+    ("video_num", np.int16),
+    ("keyframe_num", np.int32),
+])
+
+# group_num * VIDEO_KEY_SPAN + video_num identifies a video
+VIDEO_KEY_SPAN = 10000
+
+# ext column codes; 0 means the image was not found when the table was built
+KEYFRAME_EXTENSIONS = ("", ".jpg", ".png")
+EXT_UNKNOWN = 0
+
+
+def extension_code(filename: str) -> int:
+    ext = os.path.splitext(filename)[1].lower()
+    return KEYFRAME_EXTENSIONS.index(ext) if ext in KEYFRAME_EXTENSIONS[1:] else EXT_UNKNOWN
+
+
+def video_key(group_num, video_num):
+    """
+    One sortable key per (group, video), e.g. (21, 1) -> 210001; ints or int arrays.
+    """
+    if isinstance(group_num, np.ndarray):
+        group_num = group_num.astype(np.int64)
+    return group_num * VIDEO_KEY_SPAN + video_num
+
+
+def split_video_key(key):
+    """
+    (group_num, video_num) of a ``video_key`` result.
+    """
+    return divmod(key, VIDEO_KEY_SPAN)
+
+
+def keyframe_relative_path(group_num: int, video_num: int, keyframe_num: int, ext: str) -> str:
+    """
+    Path of a keyframe image below DATA_FOLDER, e.g. Keyframes_L21/keyframes/L21_V001/012.jpg
+    """
+    return os.path.join(
+        f"Keyframes_L{group_num:02d}", "keyframes", f"L{group_num:02d}_V{video_num:03d}", f"{keyframe_num:03d}{ext}"
+    )
+
+
+def _keyframe_key(group_nums, video_nums, keyframe_nums) -> np.ndarray:
+    """
+    One sortable int64 per (group, video, keyframe): the video key above 32 keyframe bits
+    """
+    video_keys = video_key(np.asarray(group_nums, dtype=np.int64), np.asarray(video_nums, dtype=np.int64))
+    return video_keys * (1 << 32) + np.asarray(keyframe_nums, dtype=np.int64)
+
+
+class KeyframeIndexTable:
+    """
+    One record per keyframe id. Ids missing from the source have group/video -1.
+    """
+
+    def __init__(self, records: np.ndarray):
+        if records.dtype not in (KEYFRAME_TABLE_DTYPE, LEGACY_KEYFRAME_TABLE_DTYPE):
+            raise ValueError(f"Expected dtype {KEYFRAME_TABLE_DTYPE}, got {records.dtype}")
+        self.records = records
+        self.group_nums = records["group_num"]
+        self.video_nums = records["video_num"]
+        self.keyframe_nums = records["keyframe_num"]
+        # None until known, either from the table itself or from scan_extensions()
+        self.ext_codes = records["ext"] if "ext" in records.dtype.names else None
+        self._group_masks = {
+            int(group): self.group_nums == group
+            for group in np.unique(self.group_nums) if group >= 0
+        }
+        # (group, video, keyframe) -> id search arrays, built on first ids_for() call
+        self._sorted_keys: np.ndarray | None = None
+        self._sorted_ids: np.ndarray | None = None
+
+    @classmethod
+    def from_id2index(
+        cls,
+        id2index: dict[str, str],
+        extensions: dict[str, str] | None = None
+    ) -> "KeyframeIndexTable":
+        """
+        extensions: optional id -> image filename or extension seen at ingest time;
+        without it the table has no ext column
+        """
+        size = max((int(k) for k in id2index), default=-1) + 1
+        dtype = KEYFRAME_TABLE_DTYPE if extensions is not None else LEGACY_KEYFRAME_TABLE_DTYPE
+        records = np.empty(size, dtype=dtype)
+        for field in ("group_num", "video_num", "keyframe_num"):
+            records[field] = -1
+        if extensions is not None:
+            records["ext"] = EXT_UNKNOWN
+        ids = np.fromiter((int(k) for k in id2index), dtype=np.int64, count=len(id2index))
+        values = np.array([value.split('/') for value in id2index.values()], dtype=np.int64).reshape(-1, 3)
+        records["group_num"][ids] = values[:, 0]
+        records["video_num"][ids] = values[:, 1]
+        records["keyframe_num"][ids] = values[:, 2]
+        if extensions:
+            for key, filename in extensions.items():
+                records["ext"][int(key)] = extension_code(filename)
+        return cls(records)
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "KeyframeIndexTable":
+        return cls(np.load(path, mmap_mode="r" if mmap else None))
+
+    @classmethod
+    def load_or_build(cls, table_path: str | Path, id2index_path: str | Path) -> "KeyframeIndexTable":
+        """
+        Open the .npy table, building and saving it from id2index.json the first time and
+        whenever id2index.json is newer than the table. An empty table is returned when
+        neither file exists.
+        """
+        table_path, id2index_path = Path(table_path), Path(id2index_path)
+        if table_path.exists() and not (
+            id2index_path.exists() and id2index_path.stat().st_mtime_ns > table_path.stat().st_mtime_ns
+        ):
+            return cls.load(table_path)
+        if not id2index_path.exists():
+            return cls(np.empty(0, dtype=KEYFRAME_TABLE_DTYPE))
+        with open(id2index_path, 'r', encoding='utf-8') as f:
+            table = cls.from_id2index(json.load(f))
+        table.save(table_path)
+        return table
+
+    def save(self, path: str | Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.records))
+
+    def __len__(self) -> int:
+        return self.records.shape[0]
+
+    def lookup(self, id_: int) -> tuple[int, int, int] | None:
+        """
+        (group_num, video_num, keyframe_num) of a keyframe id, or None if unknown.
+        """
+        if not 0 <= id_ < len(self):
+            return None
+        group = int(self.group_nums[id_])
+        if group < 0:
+            return None
+        return group, int(self.video_nums[id_]), int(self.keyframe_nums[id_])
+
+    def ids_for(
+        self,
+        group_nums: np.ndarray,
+        video_nums: np.ndarray,
+        keyframe_nums: np.ndarray
+    ) -> np.ndarray:
+        """
+        Keyframe ids of (group, video, keyframe) triples, -1 where the triple is unknown.
+        """
+        queries = _keyframe_key(group_nums, video_nums, keyframe_nums)
+        if len(self) == 0:
+            return np.full(queries.shape, -1, dtype=np.int64)
+        if self._sorted_keys is None:
+            keys = _keyframe_key(self.group_nums, self.video_nums, self.keyframe_nums)
+            self._sorted_ids = np.argsort(keys, kind="stable")
+            self._sorted_keys = keys[self._sorted_ids]
+
+        pos = np.minimum(np.searchsorted(self._sorted_keys, queries), len(self) - 1)
+        return np.where(self._sorted_keys[pos] == queries, self._sorted_ids[pos], -1)
+
+    def relative_path(self, id_: int, default_ext: str = ".jpg") -> str | None:
+        """
+        Image path below DATA_FOLDER for a keyframe id, or None when the id is unknown or its
+        image was not found at ingest. Falls back to ``default_ext`` when no ext column is loaded.
+        """
+        row = self.lookup(id_)
+        if row is None:
+            return None
+        if self.ext_codes is None:
+            return keyframe_relative_path(*row, default_ext)
+        ext_code = int(self.ext_codes[id_])
+        if ext_code == EXT_UNKNOWN:
+            return None
+        return keyframe_relative_path(*row, KEYFRAME_EXTENSIONS[ext_code])
+
+    def scan_extensions(self, data_folder: str | Path) -> int:
+        """
+        List each video folder once and fill ``ext_codes`` from what is on disk.
+        Returns the number of keyframes whose image was found.
+        """
+        ext_codes = np.zeros(len(self), dtype=np.uint8)
+        known = self.group_nums >= 0
+        video_keys = video_key(self.group_nums, self.video_nums)
+        for key in np.unique(video_keys[known]):
+            group_num, video_num = split_video_key(int(key))
+            video_dir = os.path.dirname(
+                os.path.join(data_folder, keyframe_relative_path(group_num, video_num, 0, ""))
+            )
+            try:
+                with os.scandir(video_dir) as entries:
+                    found = {}
+                    for entry in entries:
+                        stem, _ = os.path.splitext(entry.name)
+                        code = extension_code(entry.name)
+                        if code != EXT_UNKNOWN and stem.isdigit():
+                            found.setdefault(int(stem), code)
+            except OSError:
+                continue
+            ids = np.flatnonzero(known & (video_keys == key))
+            ext_codes[ids] = [found.get(int(k), EXT_UNKNOWN) for k in self.keyframe_nums[ids]]
+        self.ext_codes = ext_codes
+        return int(np.count_nonzero(ext_codes))
+
+    def _groups_mask(self, groups: Iterable[int]) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        for group in groups:
+            group_mask = self._group_masks.get(int(group))
+            if group_mask is not None:
+                mask |= group_mask
+        return mask
+
+    def mask(
+        self,
+        include_groups: Optional[list[int]] = None,
+        exclude_groups: Optional[list[int]] = None,
+        include_videos: Optional[list[int]] = None,
+    ) -> np.ndarray | None:
+        """
+        Boolean mask of allowed keyframe ids, or None when nothing is filtered.
+        Empty lists mean no filtering for that category.
+        """
+        if not include_groups and not exclude_groups and not include_videos:
+            return None
+
+        mask = np.ones(len(self), dtype=bool)
+        if include_groups:
+            mask &= self._groups_mask(include_groups)
+        if exclude_groups:
+            mask &= ~self._groups_mask(exclude_groups)
+        if include_videos:
+            mask &= np.isin(self.video_nums, np.asarray(include_videos, dtype=self.video_nums.dtype))
+        return mask
@@ -0,0 +1,151 @@
+"""
+Object-detection index over keyframe ids, loaded once at startup from the FRAME2OBJECT JSON.
+Each detected class has a packed bitmap of the keyframes containing it, and each keyframe has a
+bitset of its classes, so object filters are bitmap ORs / ANDs instead of per-keyframe set building.
+"""
+
+from pathlib import Path
+from typing import Iterable
+import json
+import re
+import numpy as np
+
+from common.keyframe_index import KeyframeIndexTable
+
+
+# Keys of the objects JSON, e.g. L21/V001/00000137.webp
+OBJECT_KEY_PATTERN = re.compile(r"L(\d+)/V(\d+)/(\d+)")
+
+
+def _read_objects_data(path: Path) -> dict[str, list[str]]:
+    """
+    One JSON mapping keyframe key -> class names, or a folder of such files merged together.
+    """
+    if path.is_dir():
+        objects_data = {}
+        for json_path in sorted(path.rglob("*.json")):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                objects_data.update(json.load(f))
+        return objects_data
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class KeyframeObjectIndex:
+    """
+    class_bitmaps: (num_classes, ceil(num_keyframes / 8)) uint8, np.packbits rows over keyframe ids
+    keyframe_classes: (num_keyframes, ceil(num_classes / 64)) uint64 class bitsets
+    """
+
+    def __init__(self, classes: list[str], class_bitmaps: np.ndarray, keyframe_classes: np.ndarray):
+        self.classes = classes
+        self.class_bitmaps = class_bitmaps
+        self.keyframe_classes = keyframe_classes
+        self._class_ids = {name: i for i, name in enumerate(classes)}
+
+    @classmethod
+    def empty(cls, num_keyframes: int = 0) -> "KeyframeObjectIndex":
+        return cls([], np.zeros((0, (num_keyframes + 7) // 8), dtype=np.uint8),
+                   np.zeros((num_keyframes, 0), dtype=np.uint64))
+
+    @classmethod
+    def from_objects_data(
+        cls,
+        objects_data: dict[str, list[str]],
+        keyframe_table: KeyframeIndexTable
+    ) -> "KeyframeObjectIndex":
+        num_keyframes = len(keyframe_table)
+        classes = sorted({name.lower() for names in objects_data.values() for name in names})
+        class_ids = {name: i for i, name in enumerate(classes)}
+
+        triples, pair_rows, pair_classes = [], [], []
+        for key, names in objects_data.items():
+            match = OBJECT_KEY_PATTERN.search(key)
+            if match is None or not names:
+                continue
+            row = len(triples)
+            triples.append(tuple(map(int, match.groups())))
+            for name in {name.lower() for name in names}:
+                pair_rows.append(row)
+                pair_classes.append(class_ids[name])
+
+        if not triples:
+            return cls.empty(num_keyframes)
+        triples = np.asarray(triples, dtype=np.int64)
+        row_ids = keyframe_table.ids_for(triples[:, 0], triples[:, 1], triples[:, 2])
+        pair_ids = row_ids[np.asarray(pair_rows, dtype=np.int64)]
+        pair_classes = np.asarray(pair_classes, dtype=np.int64)
+        known = pair_ids >= 0
+        pair_ids, pair_classes = pair_ids[known], pair_classes[known]
+
+        present = np.zeros((len(classes), num_keyframes), dtype=bool)
+        present[pair_classes, pair_ids] = True
+        class_bitmaps = np.packbits(present, axis=1)
+
+        keyframe_classes = np.zeros((num_keyframes, (len(classes) + 63) // 64), dtype=np.uint64)
+        np.bitwise_or.at(
+            keyframe_classes,
+            (pair_ids, pair_classes // 64),
+            np.left_shift(np.uint64(1), (pair_classes % 64).astype(np.uint64))
+        )
+        return cls(classes, class_bitmaps, keyframe_classes)
+
+    @classmethod
+    def load(cls, path: str | Path, keyframe_table: KeyframeIndexTable) -> "KeyframeObjectIndex":
+        """
+        Empty index when ``path`` does not exist.
+        """
+        path = Path(path)
+        if not path.exists():
+            return cls.empty(len(keyframe_table))
+        return cls.from_objects_data(_read_objects_data(path), keyframe_table)
+
+    def __len__(self) -> int:
+        return self.keyframe_classes.shape[0]
+
+    def _known_class_ids(self, target_objects: Iterable[str]) -> list[int]:
+        return sorted({
+            self._class_ids[name.lower()] for name in target_objects if name.lower() in self._class_ids
+        })
+
+    def mask(self, target_objects: list[str] | None) -> np.ndarray | None:
+        """
+        Boolean mask of keyframe ids containing any of ``target_objects``, or None when no
+        objects are requested. Classes never detected match nothing.
+        """
+        if not target_objects:
+            return None
+        class_ids = self._known_class_ids(target_objects)
+        if not class_ids:
+            return np.zeros(len(self), dtype=bool)
+        packed = np.bitwise_or.reduce(self.class_bitmaps[class_ids], axis=0)
+        return np.unpackbits(packed, count=len(self)).astype(bool)
+
+    def _class_bitset(self, class_ids: list[int]) -> np.ndarray:
+        bitset = np.zeros(self.keyframe_classes.shape[1], dtype=np.uint64)
+        for class_id in class_ids:
+            bitset[class_id // 64] |= np.uint64(1) << np.uint64(class_id % 64)
+        return bitset
+
+    def contains_any(self, ids: np.ndarray, target_objects: list[str]) -> np.ndarray:
+        """
+        For each keyframe id, whether it contains any of ``target_objects``.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self))
+        result = np.zeros(ids.shape, dtype=bool)
+        class_ids = self._known_class_ids(target_objects)
+        if not class_ids:
+            return result
+        bitsets = self.keyframe_classes[ids[in_range]]
+        result[in_range] = (bitsets & self._class_bitset(class_ids)).any(axis=1)
+        return result
+
+    def objects_of(self, id_: int) -> list[str]:
+        """
+        Class names detected in a keyframe, empty for unknown ids.
+        """
+        if not 0 <= id_ < len(self) or not self.classes:
+            return []
+        bits = np.unpackbits(self.keyframe_classes[id_].astype("<u8").view(np.uint8), bitorder="little")
+        return [self.classes[i] for i in np.flatnonzero(bits[:len(self.classes)])]
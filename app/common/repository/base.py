@@ -1,5 +1,7 @@
-from typing import TypeVar, Any, Generic, Type, List, Optional
+from typing import TypeVar, Any, Generic, Type, List, Optional, Callable
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from beanie import Document 
 import torch
 import numpy as np
@@ -7,6 +9,10 @@ from pydantic import BaseModel, Field
 from pymilvus import connections
 from pymilvus import Collection as MilvusCollection
 
+from schema.interface import MilvusSearchRequest, MilvusSearchResponse
+from common.keyframe_filter import resolve_allowed_mask
+from common.keyframe_index import KeyframeIndexTable
+
 
 
 
@@ -42,7 +48,113 @@ class MongoBaseRepository(Generic[BeanieDocument]):
 
 
 
-class MilvusBaseRepository(ABC):
+class VectorBaseRepository(ABC):
+    """
+    Common interface for keyframe vector backends (Milvus server, in-process engines).
+    """
+
+    # Group/video numbers by keyframe id, used by backends that do not store metadata themselves
+    filter_index: Optional[KeyframeIndexTable] = None
+
+    # Blocking search calls run on a bounded executor so they never stall the event loop
+    max_concurrency: int = 8
+    search_timeout: Optional[float] = 10.0
+    _executor: Optional[ThreadPoolExecutor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    @abstractmethod
+    async def search_by_embedding(
+        self,
+        request: MilvusSearchRequest
+    ) -> MilvusSearchResponse:
+        """
+        Return the top-k most similar keyframes for a single query embedding.
+        """
+
+    async def search_by_embeddings(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        """
+        Return one response per request. Backends override this to serve the whole batch in one call.
+        """
+        return list(await asyncio.gather(*(self.search_by_embedding(request) for request in requests)))
+
+    @abstractmethod
+    def get_all_id(self) -> list[int]:
+        """
+        Return every keyframe id stored in the backend.
+        """
+
+    def count(self) -> int:
+        """
+        Number of keyframes stored in the backend.
+        """
+        return len(self.get_all_id())
+
+    def configure_execution(self, max_concurrency: int, search_timeout: Optional[float]):
+        """
+        Set how many searches may run at once and how long a single search may take (None: no limit).
+        """
+        self.close()
+        self.max_concurrency = max_concurrency
+        self.search_timeout = search_timeout
+
+    async def _run_in_executor(self, func: Callable, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix=type(self).__name__
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _run_blocking(self, func: Callable, *args):
+        """
+        Run a blocking search call off the event loop, bounded by ``max_concurrency``.
+        The timeout covers both waiting for a slot and the call itself.
+        """
+        try:
+            return await asyncio.wait_for(
+                self._run_in_executor(func, *args), timeout=self.search_timeout
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Vector search did not finish within {self.search_timeout}s"
+            ) from None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+    def _resolve_allowed_mask(self, request: MilvusSearchRequest, size: int) -> np.ndarray | None:
+        """
+        Fold the request's search filter, allowed mask and exclude ids into one mask of length ``size``.
+        """
+        allowed_mask = resolve_allowed_mask(request.allowed_mask, request.exclude_ids, size)
+        search_filter = request.search_filter
+        if search_filter is None or search_filter.is_empty():
+            return allowed_mask
+
+        if self.filter_index is None:
+            raise ValueError("Group/video filters require a keyframe index table on this backend")
+        filter_mask = resolve_allowed_mask(
+            self.filter_index.mask(
+                include_groups=search_filter.include_groups,
+                exclude_groups=search_filter.exclude_groups,
+                include_videos=search_filter.include_videos,
+            ),
+            None,
+            size
+        )
+        return filter_mask if allowed_mask is None else filter_mask & allowed_mask
+
+
+
+class MilvusBaseRepository(VectorBaseRepository):
     
     def __init__(
         self,
@@ -12,6 +12,7 @@ from pathlib import Path
 import json
 
 from agent.main_agent import KeyframeSearchAgent
+from common.object_index import KeyframeObjectIndex
 from service.search_service import KeyframeQueryService
 from service.model_service import ModelService
 from llama_index.core.llms import LLM
@@ -25,12 +26,12 @@ class AgentController:
         keyframe_service: KeyframeQueryService,
         model_service: ModelService,
         data_folder: str,
-        objects_data_path: Optional[Path] = None,
+        object_index: KeyframeObjectIndex,
         asr_data_path: Optional[Path] = None,
-        top_k: int = 200
+        top_k: int = 200,
+        push_down_objects: bool = True
     ):
         
-        objects_data = self._load_json_data(objects_data_path) if objects_data_path else {}
         asr_data = self._load_json_data(asr_data_path) if asr_data_path else {}
 
         self.agent = KeyframeSearchAgent(
@@ -38,13 +39,15 @@ class AgentController:
             keyframe_service=keyframe_service,
             model_service=model_service,
             data_folder=data_folder,
-            objects_data=objects_data,
+            object_index=object_index,
             asr_data=asr_data,
-            top_k=top_k
+            top_k=top_k,
+            push_down_objects=push_down_objects
         )
     
     def _load_json_data(self, path: Path):
-        return json.load(open(path))
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
 
 
 
@@ -1,13 +1,18 @@
-from typing import Tuple, Union, List
+from typing import AsyncIterator, Tuple, Union, List
 from schema.response import KeyframeServiceResponse
 from service import ModelService, KeyframeQueryService
+from service.export_service import ResultExportWriter, export_name
+from service.temporal_search import TemporalChain, find_event_chains
+from service.video_ranking import VideoScore, rank_videos
+from schema.interface import KeyframeSearchFilter
+from common.keyframe_index import KeyframeIndexTable, keyframe_relative_path
+from common.frame_map import FrameMap
 from pathlib import Path
-import json
 import numpy as np
 import os
+import re
 import sys
-import csv
-import pandas as pd
+import asyncio
 
 # Add root directory to Python path
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
@@ -24,114 +29,107 @@ except ImportError:
 
 logger = SimpleLogger(__name__)
 
+VIDEO_PATH_PATTERN = re.compile(r"L(\d+)_V(\d+)[\\/](\d+)\.\w+$")
+
 
 class QueryController:
     def __init__(
         self,
         data_folder: Path,
-        id2index_path: Path,
+        keyframe_table: KeyframeIndexTable,
         model_service: ModelService,
-        keyframe_service: KeyframeQueryService
+        keyframe_service: KeyframeQueryService,
+        frame_map: FrameMap,
+        exporter: ResultExportWriter | None = None,
+        export_on_search: bool = True,
+        export_max_rows: int = 100
     ):
+        """
+        Built once per process in core/lifespan.py; keyframe_table maps keyframe id -> (group, video, keyframe).
+        Searches hand their top ``export_max_rows`` rows to ``exporter`` instead of writing files inline.
+        """
         self.data_folder = data_folder
-        self.id2index = json.load(open(id2index_path, 'r'))
+        self.keyframe_table = keyframe_table
         self.model_service = model_service
         self.keyframe_service = keyframe_service
-        self.output_dir = Path(r"D:\AI Viet Nam\AI_Challenge\Result")
-        self.map_keyframes_dir = Path(
-            r"D:\AI Viet Nam\AI_Challenge\Dataset\map-keyframes")  # Add map-keyframes path
-        # Ensure output directory exists
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.frame_map = frame_map
+        self.exporter = exporter
+        self.export_on_search = export_on_search
+        self.export_max_rows = export_max_rows
 
     def convert_model_to_path(
         self,
         model: KeyframeServiceResponse
     ) -> tuple[str, float]:
-        base_path = os.path.join(
-            self.data_folder, f"Keyframes_L{model.group_num:02d}", "keyframes", f"L{model.group_num:02d}_V{model.video_num:03d}")
-        filename = f"{model.keyframe_num:03d}"
-        for ext in ('.jpg', '.png'):
-            path = os.path.join(base_path, f"{filename}{ext}")
-            if os.path.exists(path):
-                return path, model.confidence_score
-        return os.path.join("static", "path_not_found.jpg"), model.confidence_score
+        # Resolved from the keyframe table built at ingest; no filesystem access per hit
+        if 0 <= model.key < len(self.keyframe_table):
+            relative_path = self.keyframe_table.relative_path(model.key)
+        else:
+            relative_path = keyframe_relative_path(model.group_num, model.video_num, model.keyframe_num, ".jpg")
+        if relative_path is None:
+            return os.path.join("static", "path_not_found.jpg"), model.confidence_score
+        return os.path.join(self.data_folder, relative_path), model.confidence_score
+
+    def _lookup_frame_idx(self, group_num: int, video_num: int, keyframe_num: int) -> int:
+        frame = self.frame_map.lookup(group_num, video_num, keyframe_num)
+        if frame is None:
+            logger.warning(
+                f"No frame_idx found for L{group_num:02d}_V{video_num:03d} keyframe_num {keyframe_num}, using 0")
+            return 0
+        return frame.frame_idx
 
     def _format_to_csv_row(self, item: Union[KeyframeServiceResponse, Tuple]) -> Tuple[str, int, int]:
         if isinstance(item, KeyframeServiceResponse):
-            path, score = self.convert_model_to_path(item)
             video_id = f"L{item.group_num:02d}_V{item.video_num:03d}"
             keyframe_num = item.keyframe_num
-            # Load frame_idx from map-keyframes with exact match using keyframe_num
-            map_file = self.map_keyframes_dir / f"{video_id}.csv"
-            if map_file.exists():
-                df = pd.read_csv(map_file)
-                # Sort by n to ensure correct order and filter exact match
-                df = df.sort_values(by='n')
-                match = df[df['n'] == keyframe_num]
-                if not match.empty:
-                    frame_idx = int(match['frame_idx'].iloc[0])
-                    logger.debug(
-                        f"Matched {video_id} keyframe_num {keyframe_num} to frame_idx {frame_idx}")
-                else:
-                    logger.warning(
-                        f"No exact match found for {video_id} keyframe_num {keyframe_num} in {map_file}")
-                    frame_idx = 0  # Fallback if no match
-            else:
-                logger.warning(
-                    f"Map file {map_file} not found, using frame_idx 0")
-                frame_idx = 0  # Fallback if map file not found
-            return video_id, keyframe_num, frame_idx
+            # Backends that store metadata already return frame_idx with the hit
+            if item.frame_idx is not None and item.frame_idx >= 0:
+                return video_id, keyframe_num, item.frame_idx
+            return video_id, keyframe_num, self._lookup_frame_idx(item.group_num, item.video_num, keyframe_num)
         elif isinstance(item, tuple) and len(item) == 2:
             path, score = item
-            # Derive video_id and keyframe_num from path if possible
-            for key, value in self.id2index.items():
-                if str(path).find(f"L{value.split('/')[0]:02d}_V{value.split('/')[1]:03d}") != -1:
-                    group_num, video_num, keyframe_num = map(
-                        int, value.split('/'))
+            # Derive video_id and keyframe_num from a .../Lxx_Vyyy/zzz.jpg path
+            match = VIDEO_PATH_PATTERN.search(str(path))
+            if match is not None:
+                group_num, video_num, keyframe_num = map(int, match.groups())
+                table = self.keyframe_table
+                if np.any((table.group_nums == group_num) & (table.video_nums == video_num)):
                     video_id = f"L{group_num:02d}_V{video_num:03d}"
-                    # Load frame_idx from map-keyframes with exact match using keyframe_num
-                    map_file = self.map_keyframes_dir / f"{video_id}.csv"
-                    if map_file.exists():
-                        df = pd.read_csv(map_file)
-                        # Sort by n to ensure correct order and filter exact match
-                        df = df.sort_values(by='n')
-                        match = df[df['n'] == keyframe_num]
-                        if not match.empty:
-                            frame_idx = int(match['frame_idx'].iloc[0])
-                            logger.debug(
-                                f"Matched {video_id} keyframe_num {keyframe_num} to frame_idx {frame_idx}")
-                        else:
-                            logger.warning(
-                                f"No exact match found for {video_id} keyframe_num {keyframe_num} in {map_file}")
-                            frame_idx = 0  # Fallback if no match
-                    else:
-                        logger.warning(
-                            f"Map file {map_file} not found, using frame_idx 0")
-                        frame_idx = 0  # Fallback if map file not found
-                    return video_id, keyframe_num, frame_idx
+                    return video_id, keyframe_num, self._lookup_frame_idx(group_num, video_num, keyframe_num)
         return "Unknown", 0, 0
 
+    def export_results(
+        self,
+        prefix: str,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        result: list[KeyframeServiceResponse]
+    ) -> str | None:
+        """
+        Queue the submission rows of ``result`` on the background writer and return the export name
+        """
+        if self.exporter is None:
+            return None
+        name = export_name(prefix, query, top_k, score_threshold, self.exporter.export_format)
+        rows = [self._format_to_csv_row(item) for item in result[:self.export_max_rows]]
+        try:
+            return self.exporter.submit(name, rows)
+        except asyncio.QueueFull:
+            logger.warning(f"Export queue full, skipping {name}")
+            return None
+
     async def search_text(
         self,
         query: str,
         top_k: int,
         score_threshold: float
     ):
-        embedding = self.model_service.embedding(query).tolist()[0]
+        embedding = (await self.model_service.aembedding(query)).tolist()
         result = await self.keyframe_service.search_by_text(embedding, top_k, score_threshold)
 
-        # Convert to CSV with limit of 100
-        output_file = self.output_dir / \
-            f"search_text_exclude_{query.replace(' ', '_')[:75]}_{top_k}_{score_threshold}.csv"
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            # Updated header
-            writer.writerow(["video_id", "keyframe_num", "frame_idx"])
-            for idx, item in enumerate(result[:100]):  # Limit to 100
-                video_id, keyframe_num, frame_idx = self._format_to_csv_row(
-                    item)
-                writer.writerow([video_id, keyframe_num, frame_idx])
-        logger.info(f"Saved {min(100, len(result))} results to {output_file}")
+        if self.export_on_search:
+            self.export_results("search_text_exclude", query, top_k, score_threshold, result)
         return result
 
     async def search_text_with_exlude_group(
@@ -141,27 +139,14 @@ class QueryController:
         score_threshold: float,
         list_group_exlude: list[int]
     ):
-        exclude_ids = [
-            int(k) for k, v in self.id2index.items()
-            if int(v.split('/')[0]) in list_group_exlude
-        ]
-
-        embedding = self.model_service.embedding(query).tolist()[0]
-
-        result = await self.keyframe_service.search_by_text_exclude_ids(embedding, top_k, score_threshold, exclude_ids)
-
-        # Convert to CSV with limit of 100
-        output_file = self.output_dir / \
-            f"search_selected_{query.replace(' ', '_')[:75]}_{top_k}_{score_threshold}.csv"
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            # Updated header
-            writer.writerow(["video_id", "keyframe_num", "frame_idx"])
-            for idx, item in enumerate(result[:100]):  # Limit to 100
-                video_id, keyframe_num, frame_idx = self._format_to_csv_row(
-                    item)
-                writer.writerow([video_id, keyframe_num, frame_idx])
-        logger.info(f"Saved {min(100, len(result))} results to {output_file}")
+        search_filter = KeyframeSearchFilter(exclude_groups=list_group_exlude)
+
+        embedding = (await self.model_service.aembedding(query)).tolist()
+
+        result = await self.keyframe_service.search_by_text_with_filter(embedding, top_k, score_threshold, search_filter)
+
+        if self.export_on_search:
+            self.export_results("search_selected", query, top_k, score_threshold, result)
         return result
 
     async def search_with_selected_video_group(
@@ -173,45 +158,132 @@ class QueryController:
         list_of_include_videos: list[int]
     ):
 
-        exclude_ids = None
-        if len(list_of_include_groups) > 0 and len(list_of_include_videos) == 0:
-            print("hi")
-            exclude_ids = [
-                int(k) for k, v in self.id2index.items()
-                if int(v.split('/')[0]) not in list_of_include_groups
-            ]
-
-        elif len(list_of_include_groups) == 0 and len(list_of_include_videos) > 0:
-            exclude_ids = [
-                int(k) for k, v in self.id2index.items()
-                if int(v.split('/')[1]) not in list_of_include_videos
-            ]
-
-        elif len(list_of_include_groups) == 0 and len(list_of_include_videos) == 0:
-            exclude_ids = []
-        else:
-            exclude_ids = [
-                int(k) for k, v in self.id2index.items()
-                if (
-                    int(v.split('/')[0]) not in list_of_include_groups or
-                    int(v.split('/')[1]) not in list_of_include_videos
-                )
-            ]
-
-        embedding = self.model_service.embedding(query).tolist()[0]
-
-        result = await self.keyframe_service.search_by_text_exclude_ids(embedding, top_k, score_threshold, exclude_ids)
-
-        # Convert to CSV with limit of 100
-        output_file = self.output_dir / \
-            f"search_selected_{query.replace(' ', '_')[:75]}_{top_k}_{score_threshold}.csv"
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            # Updated header
-            writer.writerow(["video_id", "keyframe_num", "frame_idx"])
-            for idx, item in enumerate(result[:100]):  # Limit to 100
-                video_id, keyframe_num, frame_idx = self._format_to_csv_row(
-                    item)
-                writer.writerow([video_id, keyframe_num, frame_idx])
-        logger.info(f"Saved {min(100, len(result))} results to {output_file}")
+        search_filter = KeyframeSearchFilter(
+            include_groups=list_of_include_groups,
+            include_videos=list_of_include_videos
+        )
+
+        embedding = (await self.model_service.aembedding(query)).tolist()
+
+        result = await self.keyframe_service.search_by_text_with_filter(embedding, top_k, score_threshold, search_filter)
+
+        if self.export_on_search:
+            self.export_results("search_selected", query, top_k, score_threshold, result)
         return result
+
+    async def search_text_batch(
+        self,
+        queries: list[str],
+        top_k: int,
+        score_threshold: float,
+        search_filters: list[KeyframeSearchFilter]
+    ) -> list[list[KeyframeServiceResponse]]:
+        """
+        Embed all queries in one forward pass and rank them with one batched vector search
+        """
+        embeddings = await self.model_service.aembed_batch(queries)
+        return await self.keyframe_service.search_by_text_batch(
+            [embedding.tolist() for embedding in embeddings], top_k, score_threshold, search_filters
+        )
+
+    async def stream_search(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        search_filter: KeyframeSearchFilter,
+        page_size: int = 20
+    ) -> AsyncIterator[list[KeyframeServiceResponse]]:
+        """
+        Yield ranked pages as soon as each is resolved; the export is queued once the stream completes
+        """
+        embedding = (await self.model_service.aembedding(query)).tolist()
+        result = []
+        async for page in self.keyframe_service.iter_search_pages(
+            embedding, top_k, score_threshold, search_filter, page_size
+        ):
+            result.extend(page)
+            yield page
+
+        if self.export_on_search:
+            self.export_results("search_stream", query, top_k, score_threshold, result)
+
+    async def search_paged(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        search_filter: KeyframeSearchFilter,
+        page_size: int = 20
+    ) -> tuple[list[KeyframeServiceResponse], str | None, int]:
+        """
+        First page of a ranking kept server-side; later pages come from next_page without re-searching
+        """
+        embedding = (await self.model_service.aembedding(query)).tolist()
+        return await self.keyframe_service.search_first_page(
+            embedding, top_k, score_threshold, search_filter, page_size
+        )
+
+    async def next_page(
+        self,
+        cursor: str,
+        page_size: int = 20
+    ) -> tuple[list[KeyframeServiceResponse], str | None, int]:
+        return await self.keyframe_service.search_next_page(cursor, page_size)
+
+    async def search_temporal(
+        self,
+        events: list[str],
+        top_k: int,
+        score_threshold: float,
+        search_filter: KeyframeSearchFilter,
+        max_gap: int,
+        top_n: int = 10
+    ) -> list[TemporalChain]:
+        """
+        Embed all events in one batch, retrieve top_k candidates per event, then chain them in order
+        """
+        event_candidates = await self.search_text_batch(
+            events, top_k, score_threshold, [search_filter] * len(events)
+        )
+        return find_event_chains(event_candidates, max_gap=max_gap, top_n=top_n)
+
+    async def search_videos(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        search_filter: KeyframeSearchFilter,
+        pooling: str = "top_m_mean",
+        top_m: int = 3,
+        temperature: float = 0.05,
+        top_n: int = 10,
+        keyframes_per_video: int = 5
+    ) -> list[VideoScore]:
+        """
+        Rank top_k keyframes, then rank their videos by pooled keyframe score
+        """
+        embedding = (await self.model_service.aembedding(query)).tolist()
+        result = await self.keyframe_service.search_by_text_with_filter(embedding, top_k, score_threshold, search_filter)
+        return rank_videos(
+            result,
+            method=pooling,
+            top_m=top_m,
+            temperature=temperature,
+            top_n=top_n,
+            keyframes_per_video=keyframes_per_video
+        )
+
+    async def search_and_export(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        search_filter: KeyframeSearchFilter
+    ) -> str | None:
+        """
+        Run a filtered search and queue its export regardless of ``export_on_search``
+        """
+        embedding = (await self.model_service.aembedding(query)).tolist()
+        result = await self.keyframe_service.search_by_text_with_filter(embedding, top_k, score_threshold, search_filter)
+        return self.export_results("export", query, top_k, score_threshold, result)
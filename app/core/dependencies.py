@@ -2,7 +2,6 @@
 from pathlib import Path
 from fastapi import Depends, Request, HTTPException
 from functools import lru_cache
-import json
 
 import os
 import sys
@@ -75,26 +74,35 @@ def get_service_factory(request: Request) -> ServiceFactory:
 
 
 def get_agent_controller(
+    request: Request,
     service_factory = Depends(get_service_factory),
     app_settings: AppSettings = Depends(get_app_settings)
 ) -> AgentController:
-    llm = get_llm()
-    keyframe_service = service_factory.get_keyframe_query_service()
-    model_service = service_factory.get_model_service()
-
-    data_folder = app_settings.DATA_FOLDER
-    objects_data_path = Path(app_settings.FRAME2OBJECT)
-    asr_data_path = Path(app_settings.ASR_PATH)
-
-    return AgentController(
-        llm=llm,
-        keyframe_service=keyframe_service,
-        model_service=model_service,
-        data_folder=data_folder,
-        objects_data_path=objects_data_path,
-        asr_data_path=asr_data_path,
-        top_k=50
+    """Get the agent controller, built on first use and kept in app state"""
+    controller = getattr(request.app.state, 'agent_controller', None)
+    if controller is not None:
+        return controller
+
+    object_index = getattr(request.app.state, 'object_index', None)
+    if object_index is None:
+        logger.error("Object index not found in app state")
+        raise HTTPException(
+            status_code=503,
+            detail="Object index not initialized. Please check application startup."
+        )
+
+    controller = AgentController(
+        llm=get_llm(),
+        keyframe_service=service_factory.get_keyframe_query_service(),
+        model_service=service_factory.get_model_service(),
+        data_folder=app_settings.DATA_FOLDER,
+        object_index=object_index,
+        asr_data_path=Path(app_settings.ASR_PATH) if app_settings.ASR_PATH else None,
+        top_k=50,
+        push_down_objects=app_settings.AGENT_OBJECT_PUSHDOWN
     )
+    request.app.state.agent_controller = controller
+    return controller
 
 
 
@@ -178,41 +186,13 @@ def get_milvus_repository(service_factory: ServiceFactory = Depends(get_service_
         )
 
 
-def get_query_controller(
-    model_service: ModelService = Depends(get_model_service),
-    keyframe_service: KeyframeQueryService = Depends(get_keyframe_service),
-    app_settings: AppSettings = Depends(get_app_settings)
-) -> QueryController:
-    """Get query controller instance"""
-    try:
-        logger.info("Creating query controller...")
-        
-        data_folder = Path(app_settings.DATA_FOLDER)
-        id2index_path = Path(app_settings.ID2INDEX_PATH)
-        
-        if not data_folder.exists():
-            logger.warning(f"Data folder does not exist: {data_folder}")
-            data_folder.mkdir(parents=True, exist_ok=True)
-            
-        if not id2index_path.exists():
-            logger.warning(f"ID2Index file does not exist: {id2index_path}")
-            id2index_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(id2index_path, 'w') as f:
-                json.dump({}, f)
-        
-        controller = QueryController(
-            data_folder=data_folder,
-            id2index_path=id2index_path,
-            model_service=model_service,
-            keyframe_service=keyframe_service
-        )
-        
-        logger.info("Query controller created successfully")
-        return controller
-        
-    except Exception as e:
-        logger.error(f"Failed to create query controller: {str(e)}")
+def get_query_controller(request: Request) -> QueryController:
+    """Get the query controller built once at startup from app state"""
+    controller = getattr(request.app.state, 'query_controller', None)
+    if controller is None:
+        logger.error("QueryController not found in app state")
         raise HTTPException(
             status_code=503,
-            detail=f"Query controller initialization failed: {str(e)}"
-        )
\ No newline at end of file
+            detail="Query controller not initialized. Please check application startup."
+        )
+    return controller
@@ -0,0 +1,58 @@
+"""
+Index-version stamp shared by the migrations and the API. Every migration that rebuilds
+search data writes a new stamp; the API compares it to drop results cached for an older index.
+"""
+
+import os
+import time
+import uuid
+from pathlib import Path
+
+UNVERSIONED = "unversioned"
+
+
+def bump_index_version(stamp_path: str | Path) -> str:
+    """
+    Write a fresh version to ``stamp_path`` atomically and return it.
+    """
+    stamp_path = Path(stamp_path)
+    stamp_path.parent.mkdir(parents=True, exist_ok=True)
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    tmp_path = stamp_path.with_name(stamp_path.name + ".tmp")
+    tmp_path.write_text(version, encoding="utf-8")
+    os.replace(tmp_path, stamp_path)
+    return version
+
+
+class IndexVersion:
+    """
+    Cheap reader for the stamp file: the file is stat'ed at most once per ``check_interval``
+    seconds and only re-read when its mtime changes.
+    """
+
+    def __init__(self, stamp_path: str | Path | None, check_interval: float = 1.0):
+        self.stamp_path = Path(stamp_path) if stamp_path else None
+        self.check_interval = check_interval
+        self._version = UNVERSIONED
+        self._mtime: float | None = None
+        self._checked_at = float("-inf")
+
+    def current(self) -> str:
+        if self.stamp_path is None:
+            return self._version
+
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._version
+        self._checked_at = now
+
+        try:
+            mtime = self.stamp_path.stat().st_mtime
+        except FileNotFoundError:
+            self._version, self._mtime = UNVERSIONED, None
+            return self._version
+
+        if mtime != self._mtime:
+            self._version = self.stamp_path.read_text(encoding="utf-8").strip() or UNVERSIONED
+            self._mtime = mtime
+        return self._version
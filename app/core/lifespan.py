@@ -2,6 +2,8 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
+from pathlib import Path
+import time
 
 import os
 import sys
@@ -13,26 +15,34 @@ ROOT_DIR = os.path.abspath(
 
 sys.path.insert(0, ROOT_DIR)
 
-from core.settings import MongoDBSettings, KeyFrameIndexMilvusSetting, AppSettings
+from core.settings import MongoDBSettings, KeyFrameIndexMilvusSetting, AppSettings, IndexPathSettings
 from models.keyframe import Keyframe
 from factory.factory import ServiceFactory
+from controller.query_controller import QueryController
+from common.keyframe_index import KeyframeIndexTable
+from common.frame_map import FrameMap
+from common.object_index import KeyframeObjectIndex
+from service.export_service import ResultExportWriter
 from core.logger import SimpleLogger
 
 mongo_client: AsyncIOMotorClient = None
 service_factory: ServiceFactory = None
 logger = SimpleLogger(__name__)
 
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     FastAPI lifespan context manager for startup and shutdown events
     """
     logger.info("Starting up application...")
+    startup_timings: dict[str, float] = {}
     
     try:
         # Initialize settings
         app_settings = AppSettings()
         milvus_settings = KeyFrameIndexMilvusSetting()
+        index_path_settings = IndexPathSettings()
         
         # Initialize MongoDB settings
         try:
@@ -42,6 +52,7 @@ async def lifespan(app: FastAPI):
             logger.error(f"Failed to initialize MongoDBSettings: {e}")
             raise
         
+        stage_start = time.perf_counter()
         # MongoDB Atlas connection string
         mongo_uri = (
             f"mongodb+srv://{settings.MONGO_USER}:{settings.MONGO_PASSWORD}@"
@@ -63,6 +74,41 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB Atlas: {e}")
             raise
+        startup_timings["mongo"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        keyframe_table = KeyframeIndexTable.load_or_build(
+            app_settings.KEYFRAME_TABLE_PATH,
+            app_settings.ID2INDEX_PATH
+        )
+        startup_timings["keyframe_table"] = time.perf_counter() - stage_start
+        if len(keyframe_table) == 0:
+            logger.warning(f"Keyframe table is empty: neither {app_settings.KEYFRAME_TABLE_PATH} nor {app_settings.ID2INDEX_PATH} exist")
+        logger.info(f"Loaded keyframe table with {len(keyframe_table)} keyframes")
+
+        if app_settings.SCAN_KEYFRAME_PATHS:
+            stage_start = time.perf_counter()
+            found = keyframe_table.scan_extensions(app_settings.DATA_FOLDER)
+            startup_timings["keyframe_path_scan"] = time.perf_counter() - stage_start
+            logger.info(f"Found images for {found}/{len(keyframe_table)} keyframes under {app_settings.DATA_FOLDER}")
+        elif keyframe_table.ext_codes is None:
+            logger.warning("Keyframe table has no image extensions; assuming .jpg (rerun generate_id2index.py or set SCAN_KEYFRAME_PATHS)")
+
+        stage_start = time.perf_counter()
+        frame_map = FrameMap.load(
+            app_settings.FRAME_MAP_PATH,
+            map_keyframes_dir=app_settings.MAP_KEYFRAMES_FOLDER
+        )
+        startup_timings["frame_map"] = time.perf_counter() - stage_start
+        if len(frame_map) == 0:
+            logger.warning(f"Frame map {app_settings.FRAME_MAP_PATH} not found; frame_idx will be read per video from {app_settings.MAP_KEYFRAMES_FOLDER}")
+        
+        stage_start = time.perf_counter()
+        object_index = KeyframeObjectIndex.load(app_settings.FRAME2OBJECT, keyframe_table)
+        startup_timings["object_index"] = time.perf_counter() - stage_start
+        if not object_index.classes:
+            logger.warning(f"No object detections loaded from {app_settings.FRAME2OBJECT}; agent object filtering is disabled")
+        logger.info(f"Loaded object index with {len(object_index.classes)} classes")
         
         global service_factory
         milvus_search_params = {
@@ -110,13 +156,51 @@ async def lifespan(app: FastAPI):
             milvus_password="",  
             milvus_search_params=milvus_search_params,
             model_name=app_settings.MODEL_NAME,
-            mongo_collection=Keyframe
+            mongo_collection=Keyframe,
+            vector_backend=milvus_settings.VECTOR_BACKEND,
+            embedding_path=app_settings.EMBEDDING_PATH,
+            usearch_index_path=index_path_settings.USEARCH_INDEX_PATH,
+            filter_index=keyframe_table,
+            search_concurrency=milvus_settings.SEARCH_CONCURRENCY,
+            search_timeout=milvus_settings.SEARCH_TIMEOUT,
+            model_device=app_settings.MODEL_DEVICE,
+            embedding_max_batch_size=app_settings.EMBEDDING_MAX_BATCH_SIZE,
+            embedding_max_wait_ms=app_settings.EMBEDDING_MAX_WAIT_MS,
+            embedding_cache_size=app_settings.EMBEDDING_CACHE_SIZE,
+            embedding_cache_path=app_settings.EMBEDDING_CACHE_PATH,
+            result_cache_size=app_settings.RESULT_CACHE_SIZE,
+            result_cache_ttl=app_settings.RESULT_CACHE_TTL,
+            index_version_path=app_settings.INDEX_VERSION_PATH,
+            cursor_cache_size=app_settings.CURSOR_CACHE_SIZE,
+            cursor_ttl=app_settings.CURSOR_TTL
+        )
+        logger.info(f"Service factory initialized successfully with '{milvus_settings.VECTOR_BACKEND}' vector backend")
+        startup_timings.update(service_factory.startup_timings)
+
+        stage_start = time.perf_counter()
+        data_folder = Path(app_settings.DATA_FOLDER)
+        if not data_folder.exists():
+            logger.warning(f"Data folder does not exist: {data_folder}")
+            data_folder.mkdir(parents=True, exist_ok=True)
+        query_controller = QueryController(
+            data_folder=data_folder,
+            keyframe_table=keyframe_table,
+            model_service=service_factory.get_model_service(),
+            keyframe_service=service_factory.get_keyframe_query_service(),
+            frame_map=frame_map,
+            exporter=ResultExportWriter(app_settings.EXPORT_DIR, export_format=app_settings.EXPORT_FORMAT),
+            export_on_search=app_settings.EXPORT_ON_SEARCH,
+            export_max_rows=app_settings.EXPORT_MAX_ROWS
         )
-        logger.info("Service factory initialized successfully")
+        startup_timings["query_controller"] = time.perf_counter() - stage_start
         
         app.state.service_factory = service_factory
         app.state.mongo_client = mongo_client
+        app.state.query_controller = query_controller
+        app.state.object_index = object_index
         
+        breakdown = ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in startup_timings.items())
+        logger.info(f"Startup timings: {breakdown}")
         logger.info("Application startup completed successfully")
         
     except Exception as e:
@@ -128,6 +212,14 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down application...")
     
     try:
+        query_controller = getattr(app.state, 'query_controller', None)
+        if query_controller is not None and query_controller.exporter is not None:
+            await query_controller.exporter.aclose()
+            logger.info("Export writer flushed")
+        if service_factory:
+            service_factory.get_milvus_keyframe_repo().close()
+            await service_factory.get_model_service().aclose()
+            logger.info("Vector search and text embedding workers stopped")
         if mongo_client:
             mongo_client.close()
             logger.info("MongoDB connection closed")
@@ -20,8 +20,12 @@ class MongoDBSettings(BaseSettings):
         env_file_encoding = "utf-8"
 
 class IndexPathSettings(BaseSettings):
-    FAISS_INDEX_PATH: str | None  
-    USEARCH_INDEX_PATH: str | None
+    FAISS_INDEX_PATH: str | None = None
+    USEARCH_INDEX_PATH: str | None = None
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
 
 class KeyFrameIndexMilvusSetting(BaseSettings):
     COLLECTION_NAME: str = "keyframe"
@@ -31,6 +35,12 @@ class KeyFrameIndexMilvusSetting(BaseSettings):
     INDEX_TYPE: str = 'FLAT'
     BATCH_SIZE: int =10000
     SEARCH_PARAMS: dict = {}
+    # 'milvus' queries the Milvus server, 'local' searches the embedding file in-process,
+    # 'usearch' opens the HNSW index at USEARCH_INDEX_PATH
+    VECTOR_BACKEND: str = 'milvus'
+    # Searches run off the event loop; at most SEARCH_CONCURRENCY at a time, each within SEARCH_TIMEOUT seconds
+    SEARCH_CONCURRENCY: int = 8
+    SEARCH_TIMEOUT: float = 10.0
     
 class AppSettings(BaseSettings):
     # ASR_PATH: str = '/media/tinhanhnguyen/Data3/Projects/HCMAI2025_Baseline/app/data/asr_proc.json'
@@ -43,9 +53,43 @@ class AppSettings(BaseSettings):
     ROOT_FOLDER: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline"
     DATA_FOLDER: str = r"D:\AI Viet Nam\AI_Challenge\Dataset\Keyframes"
     ID2INDEX_PATH: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\id2index.json"
+    # Columnar (group, video, keyframe) table written by migration/generate_id2index.py; built from ID2INDEX_PATH if missing
+    KEYFRAME_TABLE_PATH: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\keyframe_index.npy"
+    # List DATA_FOLDER once at startup to find each keyframe's image extension, for tables built without one
+    SCAN_KEYFRAME_PATHS: bool = False
     CLIP_FEATURES_PATH: str = r"D:\AI Viet Nam\AI_Challenge\Dataset\clip-features-32"
+    EMBEDDING_PATH: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\CLIP_ViT-B-32_laion2b_s34b_b79k_clip_embeddings.pt"
+    # Per-video embedding shards written by migration/generate_embeddings_features.py
+    EMBEDDING_SHARD_DIR: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\shards"
+    # Objects JSON (or folder of JSON files) mapping Lxx/Vyyy/kkkkkkkk.webp -> detected classes, indexed once at startup
     FRAME2OBJECT: str = r"D:\AI Viet Nam\AI_Challenge\Dataset\objects"
+    # Agent restricts the vector search to keyframes containing the suggested objects
+    AGENT_OBJECT_PUSHDOWN: bool = True
+    ASR_PATH: str | None = None
+    MAP_KEYFRAMES_FOLDER: str = r"D:\AI Viet Nam\AI_Challenge\Dataset\map-keyframes"
+    # map-keyframes CSVs packed by migration/generate_frame_map.py; videos missing from it are read from MAP_KEYFRAMES_FOLDER
+    FRAME_MAP_PATH: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\frame_map.npy"
+    # Search results are exported by a background writer; EXPORT_FORMAT is 'csv' or 'json'
+    EXPORT_DIR: str = r"D:\AI Viet Nam\AI_Challenge\Result"
+    EXPORT_FORMAT: str = "csv"
+    EXPORT_MAX_ROWS: int = 100
+    EXPORT_ON_SEARCH: bool = True
     MODEL_NAME: str = "hf-hub:laion/CLIP-ViT-B-32-laion2B-s34B-b79K"
+    # None picks cuda when available, otherwise cpu
+    MODEL_DEVICE: str | None = None
+    # Concurrent text queries are encoded together: up to this many, waiting at most this long
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    # Query embeddings are cached in memory (LRU) and persisted to this SQLite file (None: memory only)
+    EMBEDDING_CACHE_SIZE: int = 4096
+    EMBEDDING_CACHE_PATH: str | None = "cache/text_embeddings.sqlite3"
+    # Ranked search results are cached per index version; migrations bump the stamp at INDEX_VERSION_PATH
+    RESULT_CACHE_SIZE: int = 1024
+    RESULT_CACHE_TTL: float = 600.0
+    INDEX_VERSION_PATH: str = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\index_version"
+    # Paged searches keep up to CURSOR_CACHE_SIZE rankings for CURSOR_TTL seconds
+    CURSOR_CACHE_SIZE: int = 256
+    CURSOR_TTL: float = 900.0
     
 
     def __init__(self, **values):
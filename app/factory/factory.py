@@ -12,8 +12,14 @@ sys.path.insert(0, ROOT_DIR)
 
 from repository.mongo import KeyframeRepository
 from repository.milvus import KeyframeVectorRepository
+from repository.local import KeyframeLocalVectorRepository
+from repository.usearch_index import KeyframeUSearchRepository
 from service import KeyframeQueryService, ModelService
+from service.result_cache import SearchResultCache, SearchCursorStore
+from core.index_version import IndexVersion
 from models.keyframe import Keyframe
+from common.keyframe_index import KeyframeIndexTable
+import time
 import open_clip
 from pymilvus import connections, Collection as MilvusCollection
 
@@ -31,24 +37,70 @@ class ServiceFactory:
         milvus_db_name: str = "default",
         milvus_alias: str = "default",
         mongo_collection=Keyframe,
+        vector_backend: str = "milvus",
+        embedding_path: str | None = None,
+        usearch_index_path: str | None = None,
+        filter_index: KeyframeIndexTable | None = None,
+        search_concurrency: int = 8,
+        search_timeout: float | None = 10.0,
+        model_device: str | None = None,
+        embedding_max_batch_size: int = 32,
+        embedding_max_wait_ms: float = 5.0,
+        embedding_cache_size: int = 4096,
+        embedding_cache_path: str | None = None,
+        result_cache_size: int = 1024,
+        result_cache_ttl: float = 600.0,
+        cursor_cache_size: int = 256,
+        cursor_ttl: float = 900.0,
+        index_version_path: str | None = None,
     ):
+        self.startup_timings: dict[str, float] = {}
         self._mongo_keyframe_repo = KeyframeRepository(collection=mongo_collection)
-        self._milvus_keyframe_repo = self._init_milvus_repo(
-            search_params=milvus_search_params,
-            collection_name=milvus_collection_name,
-            host=milvus_host,
-            port=milvus_port,
-            user=milvus_user,
-            password=milvus_password,
-            db_name=milvus_db_name,
-            alias=milvus_alias
+
+        stage_start = time.perf_counter()
+        if vector_backend == "milvus":
+            self._milvus_keyframe_repo = self._init_milvus_repo(
+                search_params=milvus_search_params,
+                collection_name=milvus_collection_name,
+                host=milvus_host,
+                port=milvus_port,
+                user=milvus_user,
+                password=milvus_password,
+                db_name=milvus_db_name,
+                alias=milvus_alias
+            )
+        elif vector_backend == "local":
+            self._milvus_keyframe_repo = self._init_local_repo(embedding_path)
+        elif vector_backend == "usearch":
+            self._milvus_keyframe_repo = self._init_usearch_repo(usearch_index_path)
+        else:
+            raise ValueError(f"Unknown vector backend: {vector_backend}")
+
+        self._milvus_keyframe_repo.configure_execution(
+            max_concurrency=search_concurrency,
+            search_timeout=search_timeout
         )
 
-        self._model_service = self._init_model_service(model_name)
+        self._milvus_keyframe_repo.filter_index = filter_index
+        self.startup_timings["vector_repo"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        self._model_service = self._init_model_service(
+            model_name,
+            device=model_device,
+            max_batch_size=embedding_max_batch_size,
+            max_wait_ms=embedding_max_wait_ms,
+            cache_size=embedding_cache_size,
+            cache_path=embedding_cache_path
+        )
+        self.startup_timings["model_service"] = time.perf_counter() - stage_start
 
         self._keyframe_query_service = KeyframeQueryService(
             keyframe_mongo_repo=self._mongo_keyframe_repo,
-            keyframe_vector_repo=self._milvus_keyframe_repo
+            keyframe_vector_repo=self._milvus_keyframe_repo,
+            result_cache=SearchResultCache(max_size=result_cache_size, ttl_seconds=result_cache_ttl) if result_cache_size > 0 else None,
+            cursor_store=SearchCursorStore(max_size=cursor_cache_size, ttl_seconds=cursor_ttl) if cursor_cache_size > 0 else None,
+            index_version=IndexVersion(index_version_path)
         )
 
     def _init_milvus_repo(
@@ -80,10 +132,38 @@ class ServiceFactory:
 
         return KeyframeVectorRepository(collection=collection, search_params=search_params)
 
-    def _init_model_service(self, model_name: str):
+    def _init_local_repo(self, embedding_path: str | None):
+        if not embedding_path:
+            raise ValueError("embedding_path is required for the local vector backend")
+        return KeyframeLocalVectorRepository.from_file(embedding_path)
+
+    def _init_usearch_repo(self, index_path: str | None):
+        if not index_path:
+            raise ValueError("USEARCH_INDEX_PATH is required for the usearch vector backend")
+        return KeyframeUSearchRepository.from_file(index_path)
+
+    def _init_model_service(
+        self,
+        model_name: str,
+        device: str | None = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 4096,
+        cache_path: str | None = None
+    ):
         model, _, preprocess = open_clip.create_model_and_transforms(model_name)
         tokenizer = open_clip.get_tokenizer(model_name)
-        return ModelService(model=model, preprocess=preprocess, tokenizer=tokenizer)
+        return ModelService(
+            model=model,
+            preprocess=preprocess,
+            tokenizer=tokenizer,
+            device=device,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            model_name=model_name,
+            cache_size=cache_size,
+            cache_path=cache_path
+        )
 
     def get_mongo_keyframe_repo(self):
         return self._mongo_keyframe_repo
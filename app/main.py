@@ -98,6 +98,18 @@ async def health():
     }
 
 
+@app.exception_handler(TimeoutError)
+async def timeout_exception_handler(request, exc):
+    """
+    Vector searches that exceed SEARCH_TIMEOUT are reported as gateway timeouts.
+    """
+    logger.warning(f"Request timed out: {str(exc)}")
+    return JSONResponse(
+        status_code=504,
+        content={"detail": str(exc)}
+    )
+
+
 # @app.exception_handler(Exception)
 # async def global_exception_handler(request, exc):
 #     """
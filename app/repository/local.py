@@ -0,0 +1,203 @@
+"""
+In-process implementation of the Vector Repository. The whole corpus is loaded as a
+memory-mapped, L2-normalised matrix and cosine top-k is answered with NumPy,
+so single-box deployments do not need a Milvus server.
+"""
+
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+
+from pathlib import Path
+import numpy as np
+from common.repository import VectorBaseRepository
+from schema.interface import MilvusSearchRequest, MilvusSearchResult, MilvusSearchResponse
+from core.logger import SimpleLogger
+
+
+logger = SimpleLogger(__name__)
+
+
+NORMALIZED_SUFFIX = ".l2norm.npy"
+
+
+def _read_raw_embeddings(embedding_path: Path) -> np.ndarray:
+    if embedding_path.suffix == ".npy":
+        return np.load(embedding_path, mmap_mode="r")
+
+    import torch
+    embeddings = torch.load(embedding_path, map_location=torch.device('cpu'), weights_only=False)
+    if isinstance(embeddings, torch.Tensor):
+        embeddings = embeddings.numpy()
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def load_normalized_embeddings(
+    embedding_path: str | Path,
+    chunk_size: int = 65536
+) -> np.ndarray:
+    """
+    Return a read-only memory map of the L2-normalised embedding matrix.
+
+    The normalised copy is cached next to the source file as ``<name>.l2norm.npy``
+    and rebuilt only when the source is newer than the cache.
+    """
+    embedding_path = Path(embedding_path)
+    if embedding_path.name.endswith(NORMALIZED_SUFFIX):
+        return np.load(embedding_path, mmap_mode="r")
+
+    cache_path = embedding_path.with_name(embedding_path.name + NORMALIZED_SUFFIX)
+    if cache_path.exists() and cache_path.stat().st_mtime >= embedding_path.stat().st_mtime:
+        logger.info(f"Using cached normalised embeddings at {cache_path}")
+        return np.load(cache_path, mmap_mode="r")
+
+    logger.info(f"Normalising embeddings from {embedding_path} into {cache_path}")
+    raw = _read_raw_embeddings(embedding_path)
+    if raw.ndim == 1:
+        raw = raw.reshape(1, -1)
+
+    normalized = np.lib.format.open_memmap(
+        cache_path, mode="w+", dtype=np.float32, shape=raw.shape
+    )
+    for start in range(0, raw.shape[0], chunk_size):
+        chunk = np.asarray(raw[start:start + chunk_size], dtype=np.float32)
+        norms = np.linalg.norm(chunk, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized[start:start + chunk_size] = chunk / norms
+    normalized.flush()
+    del normalized
+
+    return np.load(cache_path, mmap_mode="r")
+
+
+class KeyframeLocalVectorRepository(VectorBaseRepository):
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        chunk_size: int = 65536
+    ):
+        """
+        embeddings: (num_keyframes, dim) L2-normalised matrix, row index == keyframe id
+        """
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_file(cls, embedding_path: str | Path, chunk_size: int = 65536):
+        embeddings = load_normalized_embeddings(embedding_path, chunk_size=chunk_size)
+        logger.info(f"Loaded {embeddings.shape[0]} embeddings with dimension {embeddings.shape[1]}")
+        return cls(embeddings=embeddings, chunk_size=chunk_size)
+
+    def _score(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every query against every keyframe, shape (num_queries, num_keyframes).
+        The matrix is walked in row chunks so pages of the memory map are touched sequentially.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.embeddings.shape[1])
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        num_keyframes = self.embeddings.shape[0]
+        scores = np.empty((queries.shape[0], num_keyframes), dtype=np.float32)
+        for start in range(0, num_keyframes, self.chunk_size):
+            end = min(start + self.chunk_size, num_keyframes)
+            np.matmul(queries, self.embeddings[start:end].T, out=scores[:, start:end])
+        return scores
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Row-wise top-k with argpartition, returned sorted by descending score.
+        """
+        k = min(top_k, scores.shape[1])
+        if k == 0:
+            empty = np.empty((scores.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        candidate_ids = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidate_ids, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return (
+            np.take_along_axis(candidate_ids, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1)
+        )
+
+    def _allowed_mask(self, request: MilvusSearchRequest) -> np.ndarray | None:
+        return self._resolve_allowed_mask(request, self.embeddings.shape[0])
+
+    async def search_by_embedding(
+        self,
+        request: MilvusSearchRequest
+    ):
+        return await self._run_blocking(self._search_sync, request)
+
+    async def search_by_embeddings(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        if not requests:
+            return []
+        return await self._run_blocking(self._search_many_sync, requests)
+
+    def _search_sync(
+        self,
+        request: MilvusSearchRequest
+    ) -> MilvusSearchResponse:
+        return self._search_many_sync([request])[0]
+
+    def _search_many_sync(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        """
+        Score every query with one matmul over the matrix, then mask and rank each row.
+        """
+        scores = self._score(np.stack([np.asarray(request.embedding, dtype=np.float32) for request in requests]))
+        for row, request in enumerate(requests):
+            mask = self._allowed_mask(request)
+            if mask is not None:
+                scores[row, ~mask] = -np.inf
+
+        top_ids, top_scores = self._top_k(scores, max(request.top_k for request in requests))
+        return [
+            self._response(request, top_ids[row, :request.top_k], top_scores[row, :request.top_k])
+            for row, request in enumerate(requests)
+        ]
+
+    def _response(
+        self,
+        request: MilvusSearchRequest,
+        top_ids: np.ndarray,
+        top_scores: np.ndarray
+    ) -> MilvusSearchResponse:
+        results = [
+            MilvusSearchResult(id_=int(id_), distance=float(score))
+            for id_, score in zip(top_ids, top_scores)
+            if np.isfinite(score)
+        ]
+
+        embeddings = None
+        if request.return_embeddings:
+            embeddings = np.asarray(
+                self.embeddings[[result.id_ for result in results]], dtype=np.float32
+            )
+
+        return MilvusSearchResponse(
+            results=results,
+            total_found=len(results),
+            embeddings=embeddings
+        )
+
+    def count(self) -> int:
+        return self.embeddings.shape[0]
+
+    def get_all_id(self) -> list[int]:
+        return list(range(self.embeddings.shape[0]))
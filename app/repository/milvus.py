@@ -15,7 +15,9 @@ sys.path.insert(0, ROOT_DIR)
 
 
 from typing import cast
+import numpy as np
 from common.repository import MilvusBaseRepository
+from common.keyframe_filter import mask_to_milvus_expr, group_partition_name
 from pymilvus import Collection as MilvusCollection
 from pymilvus.client.search_result import SearchResult
 from schema.interface import  MilvusSearchRequest, MilvusSearchResult, MilvusSearchResponse
@@ -26,6 +28,10 @@ from schema.interface import  MilvusSearchRequest, MilvusSearchResult, MilvusSea
 
 
 
+# Scalar fields written by migration/embedding_migration.py and returned with every hit
+METADATA_FIELDS = ("group_num", "video_num", "keyframe_num", "frame_idx")
+
+
 class KeyframeVectorRepository(MilvusBaseRepository):
     def __init__(
         self, 
@@ -35,41 +41,147 @@ class KeyframeVectorRepository(MilvusBaseRepository):
         
         super().__init__(collection)
         self.search_params = search_params
-    
+
+        field_names = {field.name for field in collection.schema.fields}
+        self.metadata_fields = [
+            name for name in METADATA_FIELDS if name in field_names
+        ]
+        self.has_scalar_filters = {"group_num", "video_num"}.issubset(field_names)
+        self.partition_names = {partition.name for partition in collection.partitions}
+
+    def _build_expr(self, request: MilvusSearchRequest) -> str | None:
+        clauses = []
+        allowed_mask = request.allowed_mask
+        search_filter = request.search_filter
+        if search_filter is not None and not search_filter.is_empty():
+            if self.has_scalar_filters:
+                if search_filter.include_groups:
+                    clauses.append(f"group_num in {search_filter.include_groups}")
+                if search_filter.exclude_groups:
+                    clauses.append(f"group_num not in {search_filter.exclude_groups}")
+                if search_filter.include_videos:
+                    clauses.append(f"video_num in {search_filter.include_videos}")
+            else:
+                # Collections without scalar fields fall back to id-range expressions
+                allowed_mask = self._resolve_allowed_mask(
+                    request.model_copy(update={"exclude_ids": None}),
+                    self.count()
+                )
+
+        if allowed_mask is not None:
+            clauses.append(f"({mask_to_milvus_expr(allowed_mask)})")
+        if request.exclude_ids:
+            clauses.append(f"id not in {request.exclude_ids}")
+        return " and ".join(clauses) or None
+
+    def _output_fields(self, request: MilvusSearchRequest) -> list[str]:
+        """
+        Vectors are only fetched on request; decoding 512 floats per hit is most of the response cost.
+        """
+        fields = ["id", *self.metadata_fields]
+        if request.return_embeddings:
+            fields.append("embedding")
+        return fields
+
+    def _partition_names(self, request: MilvusSearchRequest) -> list[str] | None:
+        """
+        Restrict the search to the per-group partitions when the request includes specific groups.
+        """
+        search_filter = request.search_filter
+        if search_filter is None or not search_filter.include_groups:
+            return None
+        partitions = [
+            group_partition_name(group) for group in search_filter.include_groups
+            if group_partition_name(group) in self.partition_names
+        ]
+        return partitions or None
+
     async def search_by_embedding(
         self,
         request: MilvusSearchRequest
     ):
-        expr = None
-        if request.exclude_ids:
-            expr = f"id not in {request.exclude_ids}"
-        
-        search_results= cast(SearchResult, self.collection.search(
-            data=[request.embedding],
-            anns_field="embedding",
-            param=self.search_params,
-            limit=request.top_k,
-            expr=expr ,
-            output_fields=["id", "embedding"],
-            _async=False
-        ))
+        return await self._run_blocking(self._search_sync, request)
 
+    async def search_by_embeddings(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        if not requests:
+            return []
+        return await self._run_blocking(self._search_many_sync, requests)
 
+    def _search_sync(
+        self,
+        request: MilvusSearchRequest
+    ) -> MilvusSearchResponse:
+        return self._search_many_sync([request])[0]
+
+    def _search_many_sync(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        """
+        Requests sharing an expression, partitions, limit and output fields go to Milvus as one
+        multi-vector search; a batch without filters is a single round trip.
+        """
+        groups: dict[tuple, list[int]] = {}
+        plans = []
+        for i, request in enumerate(requests):
+            expr = self._build_expr(request)
+            partition_names = self._partition_names(request)
+            output_fields = self._output_fields(request)
+            plans.append((expr, partition_names, output_fields))
+            key = (expr, tuple(partition_names or ()), request.top_k, tuple(output_fields))
+            groups.setdefault(key, []).append(i)
+
+        responses: list[MilvusSearchResponse | None] = [None] * len(requests)
+        for indices in groups.values():
+            expr, partition_names, output_fields = plans[indices[0]]
+            search_results = cast(SearchResult, self.collection.search(
+                data=[requests[i].embedding for i in indices],
+                anns_field="embedding",
+                param=self.search_params,
+                limit=requests[indices[0]].top_k,
+                expr=expr,
+                partition_names=partition_names,
+                output_fields=output_fields,
+                timeout=self.search_timeout,
+                _async=False
+            ))
+            for i, hits in zip(indices, search_results):
+                responses[i] = self._to_response(requests[i], hits)
+        return responses
+
+    def _to_response(
+        self,
+        request: MilvusSearchRequest,
+        hits
+    ) -> MilvusSearchResponse:
         results = []
-        for hits in search_results:
-            for hit in hits:
-                result = MilvusSearchResult(
-                    id_=hit.id,
-                    distance=hit.distance,
-                    embedding=hit.entity.get("embedding") if hasattr(hit, 'entity') else None
-                )
-                results.append(result)
-        
+        vectors = []
+        for hit in hits:
+            entity = hit.entity if hasattr(hit, 'entity') else None
+            metadata = {
+                name: entity.get(name) for name in self.metadata_fields
+            } if entity is not None else {}
+            result = MilvusSearchResult(
+                id_=hit.id,
+                distance=hit.distance,
+                **metadata
+            )
+            results.append(result)
+            if request.return_embeddings:
+                vectors.append(entity.get("embedding"))
+
         return MilvusSearchResponse(
             results=results,
             total_found=len(results),
+            embeddings=np.asarray(vectors, dtype=np.float32) if request.return_embeddings else None
         )
     
+    def count(self) -> int:
+        return self.collection.num_entities
+
     def get_all_id(self) -> list[int]:
         return list(range(self.collection.num_entities))
 
@@ -0,0 +1,133 @@
+"""
+USearch (HNSW) implementation of the Vector Repository. The index is built offline by
+migration/usearch_migration.py and opened as a memory-mapped view at startup.
+"""
+
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+
+from pathlib import Path
+import numpy as np
+from usearch.index import Index
+from common.repository import VectorBaseRepository
+from schema.interface import MilvusSearchRequest, MilvusSearchResult, MilvusSearchResponse
+from core.logger import SimpleLogger
+
+
+logger = SimpleLogger(__name__)
+
+
+class KeyframeUSearchRepository(VectorBaseRepository):
+    def __init__(
+        self,
+        index: Index,
+        expansion_search: int | None = None,
+        overfetch_factor: int = 4
+    ):
+        """
+        index: USearch index built with metric 'cos', keys == keyframe ids
+        overfetch_factor: how many extra candidates to pull per round when a filter drops hits
+        """
+        self.index = index
+        if expansion_search is not None:
+            self.index.expansion_search = expansion_search
+        self.overfetch_factor = overfetch_factor
+
+    @classmethod
+    def from_file(cls, index_path: str | Path, expansion_search: int | None = None):
+        index = Index.restore(str(index_path), view=True)
+        if index is None:
+            raise FileNotFoundError(f"USearch index not found or unreadable: {index_path}")
+        logger.info(f"Opened USearch index {index_path} with {len(index)} vectors (view=True)")
+        return cls(index=index, expansion_search=expansion_search)
+
+    def _allowed_mask(self, request: MilvusSearchRequest) -> np.ndarray | None:
+        return self._resolve_allowed_mask(request, len(self.index))
+
+    def _search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        mask: np.ndarray | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        ANN search returning (ids, cosine similarities). When a mask is given the
+        candidate pool is grown until enough allowed hits are found.
+        """
+        total = len(self.index)
+        if mask is not None and not mask.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        count = min(top_k if mask is None else top_k * self.overfetch_factor, total)
+        while True:
+            matches = self.index.search(query, count)
+            keys = np.asarray(matches.keys, dtype=np.int64)
+            similarities = 1.0 - np.asarray(matches.distances, dtype=np.float32)
+            if mask is not None:
+                keep = mask[keys]
+                keys, similarities = keys[keep], similarities[keep]
+            if len(keys) >= top_k or count >= total:
+                return keys[:top_k], similarities[:top_k]
+            count = min(count * self.overfetch_factor, total)
+
+    async def search_by_embedding(
+        self,
+        request: MilvusSearchRequest
+    ):
+        return await self._run_blocking(self._search_sync, request)
+
+    async def search_by_embeddings(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        if not requests:
+            return []
+        return await self._run_blocking(self._search_many_sync, requests)
+
+    def _search_many_sync(
+        self,
+        requests: list[MilvusSearchRequest]
+    ) -> list[MilvusSearchResponse]:
+        # Per-query masks need their own over-fetch loop, so queries run back to back on one worker
+        return [self._search_sync(request) for request in requests]
+
+    def _search_sync(
+        self,
+        request: MilvusSearchRequest
+    ) -> MilvusSearchResponse:
+        query = np.asarray(request.embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        ids, similarities = self._search(query, request.top_k, self._allowed_mask(request))
+
+        results = [
+            MilvusSearchResult(id_=int(id_), distance=float(score))
+            for id_, score in zip(ids, similarities)
+        ]
+
+        embeddings = None
+        if request.return_embeddings:
+            embeddings = np.empty((0, self.index.ndim), dtype=np.float32)
+            if len(ids):
+                embeddings = np.asarray(self.index.get(ids), dtype=np.float32).reshape(len(ids), -1)
+
+        return MilvusSearchResponse(
+            results=results,
+            total_found=len(results),
+            embeddings=embeddings
+        )
+
+    def count(self) -> int:
+        return len(self.index)
+
+    def get_all_id(self) -> list[int]:
+        return list(range(len(self.index)))
@@ -1,16 +1,25 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+import json
 from typing import List, Optional
 
 from schema.request import (
     TextSearchRequest,
     TextSearchWithExcludeGroupsRequest,
     TextSearchWithSelectedGroupsAndVideosRequest,
+    ExportRequest,
+    BatchSearchRequest,
+    StreamSearchRequest,
+    PagedSearchRequest,
+    TemporalSearchRequest,
+    VideoSearchRequest,
 )
-from schema.response import KeyframeServiceResponse, SingleKeyframeDisplay, KeyframeDisplay
+from schema.response import KeyframeServiceResponse, SingleKeyframeDisplay, KeyframeDisplay, BatchKeyframeDisplay, PagedKeyframeDisplay, TemporalChainDisplay, TemporalSearchDisplay, VideoDisplay, VideoRankingDisplay, ExportStatus
+from schema.interface import KeyframeSearchFilter
 from controller.query_controller import QueryController
-from core.dependencies import get_query_controller
+from core.dependencies import get_query_controller, get_model_service, get_keyframe_service
+from service import ModelService, KeyframeQueryService
 from core.logger import SimpleLogger
 
 
@@ -217,6 +226,364 @@ async def search_keyframes_selected_groups_videos(
     )
     return KeyframeDisplay(results=display_results)
 
+
+
+
+@router.post(
+    "/search/batch",
+    response_model=BatchKeyframeDisplay,
+    summary="Batch text search",
+    description="""
+    Search several text queries in one request. All queries are embedded in one forward pass
+    and ranked with one batched vector search, so N queries cost one round trip instead of N.
+    
+    **Parameters:**
+    - **queries**: 1-64 items, each with a query and optional include/exclude groups and include videos
+    - **top_k**: Maximum number of results per query (1-500, default: 10)
+    - **score_threshold**: Minimum confidence score (0.0-1.0, default: 0.0)
+    
+    **Returns:**
+    One result list per query, in request order.
+    """,
+    response_description="Per-query lists of matching keyframes"
+)
+async def search_keyframes_batch(
+    request: BatchSearchRequest,
+    controller: QueryController = Depends(get_query_controller)
+):
+    logger.info(f"Batch text search: {len(request.queries)} queries, top_k={request.top_k}")
+
+    batch_results = await controller.search_text_batch(
+        queries=[item.query for item in request.queries],
+        top_k=request.top_k,
+        score_threshold=request.score_threshold,
+        search_filters=[
+            KeyframeSearchFilter(
+                include_groups=item.include_groups,
+                exclude_groups=item.exclude_groups,
+                include_videos=item.include_videos
+            ) for item in request.queries
+        ]
+    )
+
+    return BatchKeyframeDisplay(results=[
+        KeyframeDisplay(results=[
+            SingleKeyframeDisplay(path=path, score=score)
+            for path, score in map(controller.convert_model_to_path, results)
+        ]) for results in batch_results
+    ])
+
+
+@router.post(
+    "/search/stream",
+    summary="Streaming text search",
+    description="""
+    Same search as `/search`, `/search/exclude-groups` and `/search/selected-groups-videos` combined,
+    but results are streamed as NDJSON (`application/x-ndjson`), best page first.
     
+    Each line is either a page, `{"page": 0, "results": [{"path": ..., "score": ...}, ...]}`,
+    or the final summary line, `{"done": true, "total": 42}`.
+    """,
+    response_description="Newline-delimited JSON pages of matching keyframes"
+)
+async def search_keyframes_stream(
+    request: StreamSearchRequest,
+    controller: QueryController = Depends(get_query_controller)
+):
+    logger.info(f"Streaming text search: query='{request.query}', top_k={request.top_k}, page_size={request.page_size}")
+
+    search_filter = KeyframeSearchFilter(
+        include_groups=request.include_groups,
+        exclude_groups=request.exclude_groups,
+        include_videos=request.include_videos
+    )
+
+    async def pages():
+        total = 0
+        page_num = 0
+        try:
+            async for page in controller.stream_search(
+                query=request.query,
+                top_k=request.top_k,
+                score_threshold=request.score_threshold,
+                search_filter=search_filter,
+                page_size=request.page_size
+            ):
+                results = [
+                    SingleKeyframeDisplay(path=path, score=score).model_dump()
+                    for path, score in map(controller.convert_model_to_path, page)
+                ]
+                total += len(results)
+                yield json.dumps({"page": page_num, "results": results}) + "\n"
+                page_num += 1
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.error(f"Streaming search failed after {page_num} pages: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        yield json.dumps({"done": True, "total": total}) + "\n"
+
+    return StreamingResponse(pages(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/search/temporal",
+    response_model=TemporalSearchDisplay,
+    summary="Temporal multi-event search",
+    description="""
+    Find keyframe sequences where the given events happen in order within one video.
+    
+    All event descriptions are embedded in one batch and `top_k` candidates are retrieved per event.
+    Candidates are then chained per video so that each event's keyframe comes after the previous one,
+    at most `max_gap` keyframes later. Chains are ranked by the mean score of their keyframes.
+    
+    **Example:**
+    ```json
+    {
+        "events": ["a man opens the door", "a dog runs outside"],
+        "top_k": 200,
+        "max_gap": 20
+    }
+    ```
+    """,
+    response_description="Best event chains with one keyframe per event"
+)
+async def search_keyframes_temporal(
+    request: TemporalSearchRequest,
+    controller: QueryController = Depends(get_query_controller)
+):
+    logger.info(f"Temporal search: {len(request.events)} events, top_k={request.top_k}, max_gap={request.max_gap}")
+
+    chains = await controller.search_temporal(
+        events=request.events,
+        top_k=request.top_k,
+        score_threshold=request.score_threshold,
+        search_filter=KeyframeSearchFilter(
+            include_groups=request.include_groups,
+            exclude_groups=request.exclude_groups,
+            include_videos=request.include_videos
+        ),
+        max_gap=request.max_gap,
+        top_n=request.top_n
+    )
+
+    return TemporalSearchDisplay(chains=[
+        TemporalChainDisplay(
+            video_id=f"L{chain.keyframes[0].group_num:02d}_V{chain.keyframes[0].video_num:03d}",
+            score=chain.score,
+            keyframes=[
+                SingleKeyframeDisplay(path=path, score=score)
+                for path, score in map(controller.convert_model_to_path, chain.keyframes)
+            ]
+        ) for chain in chains
+    ])
+
+
+@router.post(
+    "/search/videos",
+    response_model=VideoRankingDisplay,
+    summary="Video-level text search",
+    description="""
+    Rank `top_k` keyframes for the query, then rank their videos by pooling keyframe scores.
+    
+    **Pooling:**
+    - **mean**: average score of the video's hits
+    - **max**: best hit of the video
+    - **top_m_mean**: average of the video's `top_m` best hits (default)
+    - **softmax**: softmax-weighted average with `temperature`
+    
+    **Returns:**
+    The `top_n` best videos, each with its `keyframes_per_video` best keyframes.
+    """,
+    response_description="Ranked videos with their best keyframes"
+)
+async def search_videos(
+    request: VideoSearchRequest,
+    controller: QueryController = Depends(get_query_controller)
+):
+    logger.info(f"Video search: query='{request.query}', top_k={request.top_k}, pooling={request.pooling}")
+
+    videos = await controller.search_videos(
+        query=request.query,
+        top_k=request.top_k,
+        score_threshold=request.score_threshold,
+        search_filter=KeyframeSearchFilter(
+            include_groups=request.include_groups,
+            exclude_groups=request.exclude_groups,
+            include_videos=request.include_videos
+        ),
+        pooling=request.pooling,
+        top_m=request.top_m,
+        temperature=request.temperature,
+        top_n=request.top_n,
+        keyframes_per_video=request.keyframes_per_video
+    )
+
+    return VideoRankingDisplay(videos=[
+        VideoDisplay(
+            video_id=f"L{video.group_num:02d}_V{video.video_num:03d}",
+            score=video.score,
+            keyframes=[
+                SingleKeyframeDisplay(path=path, score=score)
+                for path, score in map(controller.convert_model_to_path, video.keyframes)
+            ]
+        ) for video in videos
+    ])
+
+
+def _paged_display(controller: QueryController, results, next_cursor, total) -> PagedKeyframeDisplay:
+    return PagedKeyframeDisplay(
+        results=[
+            SingleKeyframeDisplay(path=path, score=score)
+            for path, score in map(controller.convert_model_to_path, results)
+        ],
+        next_cursor=next_cursor,
+        total=total
+    )
+
+
+@router.post(
+    "/search/paged",
+    response_model=PagedKeyframeDisplay,
+    summary="Paginated text search",
+    description="""
+    Rank up to `top_k` keyframes (with optional include/exclude groups and include videos) and return
+    the first `page_size` of them with a `next_cursor`. The ranking is kept server-side for a while,
+    so following pages from `GET /keyframe/search/page` skip the embedding and vector search.
+    """,
+    response_description="First page of matching keyframes and the cursor of the next one"
+)
+async def search_keyframes_paged(
+    request: PagedSearchRequest,
+    controller: QueryController = Depends(get_query_controller)
+):
+    logger.info(f"Paged text search: query='{request.query}', top_k={request.top_k}, page_size={request.page_size}")
+
+    try:
+        results, next_cursor, total = await controller.search_paged(
+            query=request.query,
+            top_k=request.top_k,
+            score_threshold=request.score_threshold,
+            search_filter=KeyframeSearchFilter(
+                include_groups=request.include_groups,
+                exclude_groups=request.exclude_groups,
+                include_videos=request.include_videos
+            ),
+            page_size=request.page_size
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return _paged_display(controller, results, next_cursor, total)
 
 
+@router.get(
+    "/search/page",
+    response_model=PagedKeyframeDisplay,
+    summary="Next page of a paginated search",
+    description="""
+    Return the page at `cursor` from a ranking created by `POST /keyframe/search/paged`.
+    Cursors expire after a while and whenever the index is rebuilt (404).
+    """,
+    response_description="One page of matching keyframes and the cursor of the next one"
+)
+async def search_keyframes_page(
+    cursor: str = Query(..., description="next_cursor from the previous page"),
+    page_size: int = Query(default=20, ge=1, le=100, description="Number of results in this page"),
+    controller: QueryController = Depends(get_query_controller)
+):
+    try:
+        results, next_cursor, total = await controller.next_page(cursor, page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return _paged_display(controller, results, next_cursor, total)
+
+
+@router.get(
+    "/cache/stats",
+    summary="Embedding and search result cache statistics",
+    description="""
+    Report size and hit/miss counters of the query embedding cache and the search result cache,
+    together with the index version the result cache currently serves.
+    """,
+)
+async def cache_stats(
+    model_service: ModelService = Depends(get_model_service),
+    keyframe_service: KeyframeQueryService = Depends(get_keyframe_service)
+):
+    result_cache = keyframe_service.result_cache
+    return {
+        "embedding_cache": model_service.cache.stats(),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "cursor_store": keyframe_service.cursor_store.stats() if keyframe_service.cursor_store is not None else None,
+    }
+
+
+def _get_exporter(controller: QueryController):
+    if controller.exporter is None:
+        raise HTTPException(status_code=503, detail="Result export is not configured")
+    return controller.exporter
+
+
+@router.post(
+    "/exports",
+    response_model=ExportStatus,
+    status_code=202,
+    summary="Request a search export",
+    description="""
+    Run a text search (optionally restricted by groups/videos) and queue its results for export.
+    The file is written in the background; poll or download it with `GET /keyframe/exports/{name}`.
+    """,
+)
+async def request_export(
+    request: ExportRequest,
+    controller: QueryController = Depends(get_query_controller)
+):
+    exporter = _get_exporter(controller)
+    search_filter = KeyframeSearchFilter(
+        include_groups=request.include_groups,
+        exclude_groups=request.exclude_groups,
+        include_videos=request.include_videos
+    )
+    name = await controller.search_and_export(
+        query=request.query,
+        top_k=request.top_k,
+        score_threshold=request.score_threshold,
+        search_filter=search_filter
+    )
+    if name is None:
+        raise HTTPException(status_code=503, detail="Export queue is full, retry later")
+    return ExportStatus(name=name, status=exporter.status(name))
+
+
+@router.get(
+    "/exports",
+    summary="List search exports",
+    description="List finished exports in the export directory plus queued or failed ones.",
+)
+async def list_exports(
+    controller: QueryController = Depends(get_query_controller)
+):
+    return {"exports": _get_exporter(controller).list_exports()}
+
+
+@router.get(
+    "/exports/{name}",
+    summary="Download a search export",
+    description="Return the export file once written; 202 with its status while it is still queued.",
+)
+async def download_export(
+    name: str,
+    controller: QueryController = Depends(get_query_controller)
+):
+    exporter = _get_exporter(controller)
+    path = exporter.resolve(name)
+    if path is not None:
+        return FileResponse(path, filename=name)
+    status = exporter.status(name)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Export {name} not found")
+    return JSONResponse(status_code=202, content=ExportStatus(name=name, status=status).model_dump())
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
+import numpy as np
 
 class KeyframeInterface(BaseModel):
     key: int = Field(..., description="Keyframe key")
@@ -10,23 +11,44 @@ class KeyframeInterface(BaseModel):
 
 
 
+class KeyframeSearchFilter(BaseModel):
+    """Group/video restriction applied inside the vector search. Empty lists mean no filtering."""
+    include_groups: List[int] = Field(default_factory=list, description="Only return keyframes from these groups")
+    exclude_groups: List[int] = Field(default_factory=list, description="Never return keyframes from these groups")
+    include_videos: List[int] = Field(default_factory=list, description="Only return keyframes from these video numbers")
+
+    def is_empty(self) -> bool:
+        return not (self.include_groups or self.exclude_groups or self.include_videos)
+
+
 class MilvusSearchRequest(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     embedding: List[float] = Field(..., description="Query embedding vector")
-    top_k: int = Field(default=10, ge=1, le=1000, description="Number of top results to return")
+    top_k: int = Field(default=10, ge=1, le=16384, description="Number of top results to return (Milvus caps topk at 16384)")
     exclude_ids: Optional[List[int]] = Field(default=None, description="IDs to exclude from search results")
+    allowed_mask: Optional[np.ndarray] = Field(default=None, description="Boolean mask indexed by id, True for ids that may be returned")
+    search_filter: Optional[KeyframeSearchFilter] = Field(default=None, description="Group/video restriction")
+    return_embeddings: bool = Field(default=False, description="Also return the stored vectors of the hits")
 
 
 class MilvusSearchResult(BaseModel):
     """Individual search result"""
     id_: int = Field(..., description="Primary key of the result")
     distance: float = Field(..., description="Distance/similarity score")
-    embedding: Optional[List[float]] = Field(default=None, description="Original embedding vector")
+    group_num: Optional[int] = Field(default=None, description="Group ID, when the backend stores metadata")
+    video_num: Optional[int] = Field(default=None, description="Video ID, when the backend stores metadata")
+    keyframe_num: Optional[int] = Field(default=None, description="Keyframe number, when the backend stores metadata")
+    frame_idx: Optional[int] = Field(default=None, description="Frame index in the source video, when the backend stores metadata")
 
 
 class MilvusSearchResponse(BaseModel):
     """Response model for vector search"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     results: List[MilvusSearchResult] = Field(..., description="Search results")
     total_found: int = Field(..., description="Total number of results found")
     search_time_ms: Optional[float] = Field(default=None, description="Search execution time in milliseconds")
+    embeddings: Optional[np.ndarray] = Field(default=None, description="(len(results), dim) float32 vectors aligned with results, only when requested")
 
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 class BaseSearchRequest(BaseModel):
@@ -34,3 +34,70 @@ class TextSearchWithSelectedGroupsAndVideosRequest(BaseSearchRequest):
     )
 
 
+class ExportRequest(BaseSearchRequest):
+    """Search request whose results are exported to a file"""
+    include_groups: List[int] = Field(
+        default_factory=list,
+        description="List of group IDs to include in the export",
+    )
+    exclude_groups: List[int] = Field(
+        default_factory=list,
+        description="List of group IDs to exclude from the export",
+    )
+    include_videos: List[int] = Field(
+        default_factory=list,
+        description="List of video IDs to include in the export",
+    )
+
+
+class BatchSearchItem(BaseModel):
+    """One query of a batch search, with its own group/video filter"""
+    query: str = Field(..., description="Search query text", min_length=1, max_length=1000)
+    include_groups: List[int] = Field(default_factory=list, description="List of group IDs to include in search results")
+    exclude_groups: List[int] = Field(default_factory=list, description="List of group IDs to exclude from search results")
+    include_videos: List[int] = Field(default_factory=list, description="List of video IDs to include in search results")
+
+
+class BatchSearchRequest(BaseModel):
+    """Several text queries searched together"""
+    queries: List[BatchSearchItem] = Field(..., min_length=1, max_length=64, description="Queries to search")
+    top_k: int = Field(default=10, ge=1, le=500, description="Number of top results to return per query")
+    score_threshold: float = Field(default=0.0, ge=0.0, le=1.0, description="Minimum confidence score threshold")
+
+
+class StreamSearchRequest(BaseSearchRequest):
+    """Text search whose results are streamed page by page"""
+    include_groups: List[int] = Field(default_factory=list, description="List of group IDs to include in search results")
+    exclude_groups: List[int] = Field(default_factory=list, description="List of group IDs to exclude from search results")
+    include_videos: List[int] = Field(default_factory=list, description="List of video IDs to include in search results")
+    page_size: int = Field(default=20, ge=1, le=100, description="Number of results per streamed page")
+
+
+class PagedSearchRequest(StreamSearchRequest):
+    """Text search returning its first page and a cursor for the following ones"""
+    pass
+
+
+class TemporalSearchRequest(BaseModel):
+    """Ordered event descriptions to find, one after another, within the same video"""
+    events: List[str] = Field(..., min_length=2, max_length=8, description="Event descriptions in the order they happen")
+    top_k: int = Field(default=200, ge=1, le=500, description="Number of candidates retrieved per event")
+    score_threshold: float = Field(default=0.0, ge=0.0, le=1.0, description="Minimum confidence score of a candidate")
+    max_gap: int = Field(default=20, ge=1, description="Maximum keyframe_num distance between consecutive events")
+    top_n: int = Field(default=10, ge=1, le=100, description="Number of chains to return")
+    include_groups: List[int] = Field(default_factory=list, description="List of group IDs to include in search results")
+    exclude_groups: List[int] = Field(default_factory=list, description="List of group IDs to exclude from search results")
+    include_videos: List[int] = Field(default_factory=list, description="List of video IDs to include in search results")
+
+
+class VideoSearchRequest(BaseSearchRequest):
+    """Text search whose keyframe hits are pooled into a video ranking"""
+    top_k: int = Field(default=500, ge=1, le=5000, description="Number of keyframes ranked before pooling")
+    include_groups: List[int] = Field(default_factory=list, description="List of group IDs to include in search results")
+    exclude_groups: List[int] = Field(default_factory=list, description="List of group IDs to exclude from search results")
+    include_videos: List[int] = Field(default_factory=list, description="List of video IDs to include in search results")
+    pooling: Literal["mean", "max", "top_m_mean", "softmax"] = Field(default="top_m_mean", description="How keyframe scores are combined per video")
+    top_m: int = Field(default=3, ge=1, description="Keyframes averaged per video by top_m_mean")
+    temperature: float = Field(default=0.05, gt=0.0, description="Softmax pooling temperature")
+    top_n: int = Field(default=10, ge=1, le=200, description="Number of videos to return")
+    keyframes_per_video: int = Field(default=5, ge=1, le=100, description="Best keyframes returned per video")
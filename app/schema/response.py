@@ -7,6 +7,7 @@ class KeyframeServiceResponse(BaseModel):
     group_num: int = Field(..., description="Group ID")
     keyframe_num: int = Field(..., description="Keyframe number")
     confidence_score: float = Field(..., description="Keyframe number")
+    frame_idx: int | None = Field(default=None, description="Frame index in the source video, if known")
     
 
 
@@ -15,4 +16,39 @@ class SingleKeyframeDisplay(BaseModel):
     score: float
 
 class KeyframeDisplay(BaseModel):
-    results: list[SingleKeyframeDisplay]
\ No newline at end of file
+    results: list[SingleKeyframeDisplay]
+
+
+class PagedKeyframeDisplay(BaseModel):
+    results: list[SingleKeyframeDisplay]
+    next_cursor: str | None = Field(default=None, description="Pass to /keyframe/search/page for the next page; None on the last page")
+    total: int = Field(..., description="Number of ranked results across all pages")
+
+
+class TemporalChainDisplay(BaseModel):
+    video_id: str = Field(..., description="Video of the chain, e.g. L21_V001")
+    score: float = Field(..., description="Mean confidence of the chain's keyframes")
+    keyframes: list[SingleKeyframeDisplay] = Field(..., description="One keyframe per event, in event order")
+
+
+class TemporalSearchDisplay(BaseModel):
+    chains: list[TemporalChainDisplay]
+
+
+class VideoDisplay(BaseModel):
+    video_id: str = Field(..., description="Video, e.g. L21_V001")
+    score: float = Field(..., description="Pooled score of the video")
+    keyframes: list[SingleKeyframeDisplay] = Field(..., description="Best keyframes of the video, best first")
+
+
+class VideoRankingDisplay(BaseModel):
+    videos: list[VideoDisplay]
+
+
+class BatchKeyframeDisplay(BaseModel):
+    results: list[KeyframeDisplay] = Field(..., description="One result list per query, in request order")
+
+
+class ExportStatus(BaseModel):
+    name: str = Field(..., description="Export file name, used to download it")
+    status: str = Field(..., description="pending, done or failed")
@@ -0,0 +1,152 @@
+import asyncio
+import csv
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    from core.logger import SimpleLogger, logger
+except ImportError:
+    import logging
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(message)s')
+    logger = logging.getLogger(__name__)
+    SimpleLogger = logging.getLogger
+
+logger = SimpleLogger(__name__)
+
+
+EXPORT_FORMATS = ("csv", "json")
+EXPORT_COLUMNS = ("video_id", "keyframe_num", "frame_idx")
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+
+def export_name(prefix: str, query: str, top_k: int, score_threshold: float, export_format: str) -> str:
+    """
+    File name of a search export, e.g. search_text_a_dog_running_100_0.0.csv
+    """
+    slug = re.sub(r"[^\w\-]+", "_", query.strip())[:75]
+    return f"{prefix}_{slug}_{top_k}_{score_threshold}.{export_format}"
+
+
+class ResultExportWriter:
+    """
+    Writes search exports from a background task so requests only enqueue rows.
+    Files are written to a temporary name and renamed, so a listed export is always complete.
+    """
+
+    def __init__(
+        self,
+        output_dir: str | Path,
+        export_format: str = "csv",
+        max_pending: int = 256,
+        max_tracked: int = 1024
+    ):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {export_format!r}, expected one of {EXPORT_FORMATS}")
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.export_format = export_format
+        self.max_tracked = max_tracked
+        self._max_pending = max_pending
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._status: OrderedDict[str, str] = OrderedDict()
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self._max_pending)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def _set_status(self, name: str, status: str):
+        self._status[name] = status
+        self._status.move_to_end(name)
+        while len(self._status) > self.max_tracked:
+            self._status.popitem(last=False)
+
+    def submit(self, name: str, rows: list[tuple[str, int, int]]) -> str:
+        """
+        Queue ``rows`` for writing as ``name`` and return immediately. Raises asyncio.QueueFull
+        when the writer has fallen ``max_pending`` exports behind.
+        """
+        self._ensure_started()
+        self._queue.put_nowait((name, rows))
+        self._set_status(name, PENDING)
+        return name
+
+    def _write(self, name: str, rows: list[tuple[str, int, int]]):
+        path = self.output_dir / name
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            if self.export_format == "csv":
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                writer.writerows(rows)
+            else:
+                json.dump([dict(zip(EXPORT_COLUMNS, row)) for row in rows], f)
+        os.replace(tmp_path, path)
+
+    async def _run(self):
+        while True:
+            name, rows = await self._queue.get()
+            try:
+                await asyncio.to_thread(self._write, name, rows)
+                self._set_status(name, DONE)
+                logger.info(f"Saved {len(rows)} results to {self.output_dir / name}")
+            except Exception as e:
+                self._set_status(name, FAILED)
+                logger.error(f"Failed to write export {name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def status(self, name: str) -> str | None:
+        status = self._status.get(name)
+        if status is None and self.resolve(name) is not None:
+            return DONE
+        return status
+
+    def resolve(self, name: str) -> Path | None:
+        """
+        Path of a finished export, or None. Only plain file names inside ``output_dir`` are accepted.
+        """
+        if Path(name).name != name or name.endswith(".tmp"):
+            return None
+        path = self.output_dir / name
+        return path if path.is_file() else None
+
+    def list_exports(self) -> list[dict]:
+        exports = [
+            {"name": name, "status": status}
+            for name, status in self._status.items() if status != DONE
+        ]
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(tuple(f".{fmt}" for fmt in EXPORT_FORMATS)):
+                    stat = entry.stat()
+                    exports.append({
+                        "name": entry.name,
+                        "status": DONE,
+                        "size": stat.st_size,
+                        "modified": stat.st_mtime,
+                    })
+        return exports
+
+    async def aclose(self, timeout: float = 10.0):
+        """
+        Flush queued exports (waiting at most ``timeout`` seconds), then stop the writer.
+        """
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unwritten exports on shutdown")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
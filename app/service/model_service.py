@@ -1,3 +1,12 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
 import open_clip
 import torch
 import numpy as np
@@ -14,28 +23,367 @@ except ImportError:
 logger = SimpleLogger(__name__)
 
 
+class EmbeddingCache:
+    """
+    Query embeddings keyed by (model name, normalised text): a bounded in-memory LRU
+    in front of an optional SQLite file, so repeated queries survive restarts.
+
+    Only the LRU is touched on the caller's thread. SQLite lookups run on a reader thread,
+    and new entries are queued and committed in batches by a write-behind thread.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 4096,
+        db_path: str | Path | None = None,
+        write_delay: float = 0.2
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.write_delay = write_delay
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._pending_writes: list[tuple[str, str, bytes]] = []
+        self._flush_scheduled = False
+        self._closed = False
+        self._reader: ThreadPoolExecutor | None = None
+        self._writer: ThreadPoolExecutor | None = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS text_embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text))"
+            )
+            self._db.commit()
+            self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache-read")
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache-write")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # The CLIP tokenizer lowercases and collapses whitespace, so these variants embed identically
+        return " ".join(text.split()).lower()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _get_memory(self, texts: list[str]) -> list[np.ndarray | None]:
+        vectors = []
+        with self._lock:
+            for text in texts:
+                key = self.normalize(text)
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                vectors.append(vector)
+        return vectors
+
+    def _get_disk(self, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Blocking SQLite lookup of ``texts``; found vectors are promoted into the LRU.
+        """
+        keys = [self.normalize(text) for text in texts]
+        with self._db_lock:
+            # Closed while the lookup was queued: report misses
+            rows = [None] * len(keys) if self._db is None else [
+                self._db.execute(
+                    "SELECT vector FROM text_embeddings WHERE model = ? AND text = ?",
+                    (self.model_name, key)
+                ).fetchone()
+                for key in keys
+            ]
+        vectors = []
+        with self._lock:
+            for key, row in zip(keys, rows):
+                if row is None:
+                    self.misses += 1
+                    vectors.append(None)
+                    continue
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vector)
+                self.hits += 1
+                self.disk_hits += 1
+                vectors.append(vector)
+        return vectors
+
+    def _fill_from(self, vectors: list[np.ndarray | None], missing: list[int], found: list[np.ndarray | None]):
+        for i, vector in zip(missing, found):
+            vectors[i] = vector
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Cached vectors of ``texts`` (None for misses), reading SQLite on the calling thread.
+        """
+        vectors = self._get_memory(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self._db is not None:
+            self._fill_from(vectors, missing, self._get_disk([texts[i] for i in missing]))
+        elif missing:
+            with self._lock:
+                self.misses += len(missing)
+        return vectors
+
+    async def aget_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Like ``get_many``, but LRU misses are looked up in SQLite on the reader thread.
+        """
+        vectors = self._get_memory(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self._db is not None:
+            missing_texts = [texts[i] for i in missing]
+            try:
+                found = await asyncio.get_running_loop().run_in_executor(self._reader, self._get_disk, missing_texts)
+            except RuntimeError:
+                # The reader was shut down by close(); the lookup then only counts misses
+                found = self._get_disk(missing_texts)
+            self._fill_from(vectors, missing, found)
+        elif missing:
+            with self._lock:
+                self.misses += len(missing)
+        return vectors
+
+    def get(self, text: str) -> np.ndarray | None:
+        return self.get_many([text])[0]
+
+    def put(self, text: str, vector: np.ndarray):
+        """
+        Store in the LRU immediately; the SQLite write is queued for the write-behind thread.
+        """
+        key = self.normalize(text)
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._remember(key, vector)
+            # After close() the entry only lives in memory
+            if self._db is None or self._closed:
+                return
+            self._pending_writes.append((self.model_name, key, vector.tobytes()))
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                self._writer.submit(self._flush, self.write_delay)
+
+    def _flush(self, delay: float = 0.0):
+        # Wait briefly so writes arriving together share one transaction
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            rows, self._pending_writes = self._pending_writes, []
+            self._flush_scheduled = False
+        if not rows:
+            return
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO text_embeddings (model, text, vector) VALUES (?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to persist {len(rows)} cached embeddings: {e}")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "pending_writes": len(self._pending_writes),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is None or self._closed:
+                return
+            self._closed = True
+        self._reader.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        self._flush()
+        with self._db_lock:
+            self._db.close()
+            self._db = None
+
+
+class TextEmbeddingBatcher:
+    """
+    Collects concurrent single-text requests for up to ``max_wait_ms`` and encodes them
+    with one forward pass on a worker thread, resolving each caller's future.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="text-embedding")
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: list[str]) -> np.ndarray:
+        """
+        Encode an already-batched list of texts on the worker thread, bypassing the queue.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.embed_fn, texts)
+
+    async def _collect_batch(self) -> list[tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.embed_fn, texts)
+            except Exception as e:
+                logger.error(f"Batched text embedding failed for {len(texts)} queries: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    async def aclose(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
 class ModelService:
     def __init__(
         self,
         model,
         preprocess,
         tokenizer,
-        device: str = 'cuda'
+        device: str | None = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        model_name: str = "",
+        cache_size: int = 4096,
+        cache_path: str | Path | None = None
     ):
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.model = model
         self.model = model.to(device)
         self.preprocess = preprocess
         self.tokenizer = tokenizer
         self.device = device
         self.model.eval()
+        self.batcher = TextEmbeddingBatcher(
+            self._encode,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self.cache = EmbeddingCache(model_name, max_size=cache_size, db_path=cache_path)
 
-    def embedding(self, query_text: str) -> np.ndarray:
+    def _encode(self, texts: list[str]) -> np.ndarray:
         """
-        Return (1, ndim 1024) torch.Tensor
+        Return (len(texts), ndim) float32 embeddings from a single forward pass
         """
-        with torch.no_grad():
-            text_tokens = self.tokenizer([query_text]).to(self.device)
+        with torch.inference_mode():
+            text_tokens = self.tokenizer(texts).to(self.device)
             query_embedding = self.model.encode_text(
-                # (1, 512)
-                text_tokens).cpu().detach().numpy().astype(np.float32)
+                text_tokens).cpu().numpy().astype(np.float32)
         return query_embedding
+
+    def _split_cached(self, texts: list[str]) -> tuple[list[np.ndarray | None], list[int]]:
+        cached = self.cache.get_many(texts)
+        return cached, [i for i, vector in enumerate(cached) if vector is None]
+
+    async def _asplit_cached(self, texts: list[str]) -> tuple[list[np.ndarray | None], list[int]]:
+        cached = await self.cache.aget_many(texts)
+        return cached, [i for i, vector in enumerate(cached) if vector is None]
+
+    def _merge_cached(
+        self,
+        texts: list[str],
+        cached: list[np.ndarray | None],
+        missing: list[int],
+        computed: np.ndarray
+    ) -> np.ndarray:
+        for i, vector in zip(missing, computed):
+            self.cache.put(texts[i], vector)
+            cached[i] = vector
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """
+        Return (len(texts), ndim) float32 embeddings, encoding only the texts missing from the cache
+        """
+        cached, missing = self._split_cached(texts)
+        computed = self._encode([texts[i] for i in missing]) if missing else []
+        return self._merge_cached(texts, cached, missing, computed)
+
+    def embedding(self, query_text: str) -> np.ndarray:
+        """
+        Return (1, ndim 1024) torch.Tensor
+        """
+        return self.embed_batch([query_text])
+
+    async def aembedding(self, query_text: str) -> np.ndarray:
+        """
+        Return the (ndim,) embedding of one query, micro-batched with concurrent callers
+        """
+        vector = (await self.cache.aget_many([query_text]))[0]
+        if vector is None:
+            vector = await self.batcher.embed(query_text)
+            self.cache.put(query_text, vector)
+        return vector
+
+    async def aembed_batch(self, texts: list[str]) -> np.ndarray:
+        """
+        Return (len(texts), ndim) embeddings, encoding cache misses on a worker thread
+        """
+        cached, missing = await self._asplit_cached(texts)
+        computed = await self.batcher.embed_many([texts[i] for i in missing]) if missing else []
+        return self._merge_cached(texts, cached, missing, computed)
+
+    async def aclose(self):
+        await self.batcher.aclose()
+        logger.info(f"Text embedding cache stats: {self.cache.stats()}")
+        self.cache.close()
@@ -0,0 +1,113 @@
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+from schema.interface import KeyframeSearchFilter
+
+
+class SearchResultCache:
+    """
+    TTL + LRU cache for ranked search results. Keys embed the index version, and the
+    whole cache is dropped as soon as a new version is observed.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._version: Optional[str] = None
+
+    @staticmethod
+    def make_key(
+        index_version: str,
+        embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        exclude_ids: list[int] | None = None,
+        allowed_mask: np.ndarray | None = None,
+        search_filter: KeyframeSearchFilter | None = None,
+    ) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(index_version.encode())
+        digest.update(np.asarray(embedding, dtype=np.float32).tobytes())
+        digest.update(f"|{top_k}|{score_threshold}|".encode())
+        if exclude_ids:
+            digest.update(np.asarray(sorted(exclude_ids), dtype=np.int64).tobytes())
+        digest.update(b"|")
+        if allowed_mask is not None:
+            digest.update(np.packbits(allowed_mask).tobytes())
+        digest.update(b"|")
+        if search_filter is not None and not search_filter.is_empty():
+            digest.update(search_filter.model_dump_json().encode())
+        return digest.hexdigest()
+
+    def sync_version(self, index_version: str):
+        """
+        Invalidate everything when the index was rebuilt since the last lookup.
+        """
+        if index_version != self._version:
+            self._entries.clear()
+            self._version = index_version
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int | str | None]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "index_version": self._version,
+        }
+
+
+class SearchCursorStore(SearchResultCache):
+    """
+    Ranked (ids, scores) of recent searches, held under an opaque token so later pages are a
+    slice instead of a new search. Shares the TTL, LRU and index-version invalidation above.
+    """
+
+    def create(self, index_version: str, ids: np.ndarray, scores: np.ndarray) -> str:
+        self.sync_version(index_version)
+        token = secrets.token_urlsafe(12)
+        self.put(token, (np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float32)))
+        return token
+
+    @staticmethod
+    def encode(token: str, offset: int) -> str:
+        return f"{token}.{offset}"
+
+    @staticmethod
+    def decode(cursor: str) -> tuple[str, int]:
+        token, _, offset = cursor.rpartition(".")
+        if not token or not offset.isdigit():
+            raise ValueError(f"Malformed cursor: {cursor!r}")
+        return token, int(offset)
+
+    def ranking(self, index_version: str, token: str) -> tuple[np.ndarray, np.ndarray] | None:
+        self.sync_version(index_version)
+        return self.get(token)
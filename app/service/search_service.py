@@ -42,25 +42,36 @@ except ImportError as e:
         raise
 
 
-from repository.milvus import KeyframeVectorRepository
+from common.repository import VectorBaseRepository
 from repository.milvus import MilvusSearchRequest
 from repository.mongo import KeyframeRepository
 
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
+import asyncio
+import numpy as np
 from app.models.keyframe import Keyframe
+from common.keyframe_filter import ranges_to_mask
 
 from schema.response import KeyframeServiceResponse
+from schema.interface import KeyframeSearchFilter, MilvusSearchResult, MilvusSearchResponse
+from core.index_version import IndexVersion
+from service.result_cache import SearchResultCache, SearchCursorStore
 
 class KeyframeQueryService:
     def __init__(
             self, 
-            keyframe_vector_repo: KeyframeVectorRepository,
+            keyframe_vector_repo: VectorBaseRepository,
             keyframe_mongo_repo: KeyframeRepository,
-            
+            result_cache: SearchResultCache | None = None,
+            index_version: IndexVersion | None = None,
+            cursor_store: SearchCursorStore | None = None,
         ):
 
         self.keyframe_vector_repo = keyframe_vector_repo
         self.keyframe_mongo_repo= keyframe_mongo_repo
+        self.result_cache = result_cache
+        self.index_version = index_version or IndexVersion(None)
+        self.cursor_store = cursor_store
 
 
     async def _retrieve_keyframes(self, ids: list[int]):
@@ -74,32 +85,122 @@ class KeyframeQueryService:
         return return_keyframe
 
 
+    @staticmethod
+    def _has_metadata(result: MilvusSearchResult) -> bool:
+        return None not in (result.group_num, result.video_num, result.keyframe_num)
+
+
+    def _cache_lookup(
+        self,
+        text_embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        exclude_indices: list[int] | None = None,
+        allowed_mask: np.ndarray | None = None,
+        search_filter: KeyframeSearchFilter | None = None
+    ) -> tuple[str | None, list[KeyframeServiceResponse] | None]:
+        """
+        (cache key, cached results); the key is None when result caching is off
+        """
+        if self.result_cache is None:
+            return None, None
+        index_version = self.index_version.current()
+        self.result_cache.sync_version(index_version)
+        cache_key = SearchResultCache.make_key(
+            index_version, text_embedding, top_k, score_threshold,
+            exclude_indices, allowed_mask, search_filter
+        )
+        cached = self.result_cache.get(cache_key)
+        return cache_key, list(cached) if cached is not None else None
+
+
     async def _search_keyframes(
         self,
         text_embedding: list[float],
         top_k: int,
         score_threshold: float | None = None,
-        exclude_indices: list[int] | None = None
+        exclude_indices: list[int] | None = None,
+        allowed_mask: np.ndarray | None = None,
+        search_filter: KeyframeSearchFilter | None = None
     ) -> list[KeyframeServiceResponse]:
         
+        if allowed_mask is not None and not allowed_mask.any():
+            return []
+
+        cache_key, cached = self._cache_lookup(
+            text_embedding, top_k, score_threshold, exclude_indices, allowed_mask, search_filter
+        )
+        if cached is not None:
+            return cached
+
+        response = await self._rank_keyframes(
+            text_embedding, top_k, score_threshold, exclude_indices, allowed_mask, search_filter
+        )
+        if cache_key is not None:
+            self.result_cache.put(cache_key, tuple(response))
+        return response
+
+
+    async def _rank_keyframes(
+        self,
+        text_embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        exclude_indices: list[int] | None,
+        allowed_mask: np.ndarray | None,
+        search_filter: KeyframeSearchFilter | None
+    ) -> list[KeyframeServiceResponse]:
         search_request = MilvusSearchRequest(
             embedding=text_embedding,
             top_k=top_k,
-            exclude_ids=exclude_indices
+            exclude_ids=exclude_indices,
+            allowed_mask=allowed_mask,
+            search_filter=search_filter
         )
 
         search_response = await self.keyframe_vector_repo.search_by_embedding(search_request)
+        return await self._to_keyframe_responses(search_response, score_threshold)
 
-        
+
+    async def _to_keyframe_responses(
+        self,
+        search_response: MilvusSearchResponse,
+        score_threshold: float | None
+    ) -> list[KeyframeServiceResponse]:
+        return await self._hits_to_responses(self._rank_hits(search_response, score_threshold))
+
+
+    @staticmethod
+    def _rank_hits(
+        search_response: MilvusSearchResponse,
+        score_threshold: float | None
+    ) -> list[MilvusSearchResult]:
         filtered_results = [
             result for result in search_response.results
             if score_threshold is None or result.distance > score_threshold
         ]
 
-        sorted_results = sorted(
+        return sorted(
             filtered_results, key=lambda r: r.distance, reverse=True
         )
 
+
+    async def _hits_to_responses(
+        self,
+        sorted_results: list[MilvusSearchResult]
+    ) -> list[KeyframeServiceResponse]:
+        if all(self._has_metadata(result) for result in sorted_results):
+            return [
+                KeyframeServiceResponse(
+                    key=result.id_,
+                    video_num=result.video_num,
+                    group_num=result.group_num,
+                    keyframe_num=result.keyframe_num,
+                    confidence_score=result.distance,
+                    frame_idx=result.frame_idx
+                ) for result in sorted_results
+            ]
+
         sorted_ids = [result.id_ for result in sorted_results]
 
         keyframes = await self._retrieve_keyframes(sorted_ids)
@@ -144,15 +245,9 @@ class KeyframeQueryService:
         range_queries: a bunch of start end indices, and we just search inside these, ignore everything
         """
 
-        all_ids = self.keyframe_vector_repo.get_all_id()
-        allowed_ids = set()
-        for start, end in range_queries:
-            allowed_ids.update(range(start, end + 1))
-        
-        
-        exclude_ids = [id_ for id_ in all_ids if id_ not in allowed_ids]
+        allowed_mask = ranges_to_mask(range_queries, self.keyframe_vector_repo.count())
 
-        return await self._search_keyframes(text_embedding, top_k, score_threshold, exclude_ids)   
+        return await self._search_keyframes(text_embedding, top_k, score_threshold, allowed_mask=allowed_mask)
     
 
     async def search_by_text_exclude_ids(
@@ -168,33 +263,172 @@ class KeyframeQueryService:
         return await self._search_keyframes(text_embedding, top_k, score_threshold, exclude_ids)   
     
 
+    async def search_by_text_with_filter(
+        self,
+        text_embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        search_filter: KeyframeSearchFilter | None
+    ):
+        """
+        search_filter: group/video restriction pushed down into the vector search
+        """
+        return await self._search_keyframes(text_embedding, top_k, score_threshold, search_filter=search_filter)
 
-    
-
-
-
-
-    
-        
-
-
-
-        
-
-        
-
-        
-        
-        
 
+    async def search_by_text_with_mask(
+        self,
+        text_embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        allowed_mask: np.ndarray | None
+    ):
+        """
+        allowed_mask: boolean mask indexed by keyframe id, None to search everything
+        """
+        return await self._search_keyframes(text_embedding, top_k, score_threshold, allowed_mask=allowed_mask)
 
-        
 
-        
+    async def search_by_text_batch(
+        self,
+        text_embeddings: list[list[float]],
+        top_k: int,
+        score_threshold: float | None,
+        search_filters: list[KeyframeSearchFilter | None] | None = None
+    ) -> list[list[KeyframeServiceResponse]]:
+        """
+        One ranked list per embedding. Cache misses are sent to the vector backend as a single batch.
+        """
+        if search_filters is None:
+            search_filters = [None] * len(text_embeddings)
 
+        lookups = [
+            self._cache_lookup(embedding, top_k, score_threshold, search_filter=search_filter)
+            for embedding, search_filter in zip(text_embeddings, search_filters)
+        ]
+        cache_keys = [cache_key for cache_key, _ in lookups]
+        responses = [cached for _, cached in lookups]
+
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            search_responses = await self.keyframe_vector_repo.search_by_embeddings([
+                MilvusSearchRequest(
+                    embedding=text_embeddings[i],
+                    top_k=top_k,
+                    search_filter=search_filters[i]
+                ) for i in missing
+            ])
+            ranked = await asyncio.gather(*(
+                self._to_keyframe_responses(search_response, score_threshold)
+                for search_response in search_responses
+            ))
+            for i, response in zip(missing, ranked):
+                responses[i] = response
+                if cache_keys[i] is not None:
+                    self.result_cache.put(cache_keys[i], tuple(response))
+        return responses
+
+
+    async def iter_search_pages(
+        self,
+        text_embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        search_filter: KeyframeSearchFilter | None = None,
+        page_size: int = 20
+    ) -> AsyncIterator[list[KeyframeServiceResponse]]:
+        """
+        Yield the ranking page by page, best first. Metadata is joined per page, so the first
+        page is ready before the rest of the hits are resolved.
+        """
+        cache_key, cached = self._cache_lookup(
+            text_embedding, top_k, score_threshold, search_filter=search_filter
+        )
+        if cached is not None:
+            for start in range(0, len(cached), page_size):
+                yield cached[start:start + page_size]
+            return
 
+        search_response = await self.keyframe_vector_repo.search_by_embedding(
+            MilvusSearchRequest(embedding=text_embedding, top_k=top_k, search_filter=search_filter)
+        )
+        hits = self._rank_hits(search_response, score_threshold)
+        collected = []
+        for start in range(0, len(hits), page_size):
+            page = await self._hits_to_responses(hits[start:start + page_size])
+            collected.extend(page)
+            yield page
+        if cache_key is not None:
+            self.result_cache.put(cache_key, tuple(collected))
 
 
+    def _hits_from_ids(self, ids: np.ndarray, scores: np.ndarray) -> list[MilvusSearchResult]:
+        """
+        Rebuild hits from a cached ranking, taking metadata from the keyframe table when loaded
+        """
+        table = self.keyframe_vector_repo.filter_index
+        hits = []
+        for id_, score in zip(ids.tolist(), scores.tolist()):
+            row = table.lookup(id_) if table is not None else None
+            if row is None:
+                hits.append(MilvusSearchResult(id_=id_, distance=score))
+            else:
+                group_num, video_num, keyframe_num = row
+                hits.append(MilvusSearchResult(
+                    id_=id_, distance=score,
+                    group_num=group_num, video_num=video_num, keyframe_num=keyframe_num
+                ))
+        return hits
+
+
+    async def search_first_page(
+        self,
+        text_embedding: list[float],
+        top_k: int,
+        score_threshold: float | None,
+        search_filter: KeyframeSearchFilter | None = None,
+        page_size: int = 20
+    ) -> tuple[list[KeyframeServiceResponse], str | None, int]:
+        """
+        Rank up to top_k keyframes, keep the ranking under a cursor and return
+        (first page, cursor of the next page or None, total ranked)
+        """
+        if self.cursor_store is None:
+            raise RuntimeError("Cursor pagination is not configured")
 
+        search_response = await self.keyframe_vector_repo.search_by_embedding(
+            MilvusSearchRequest(embedding=text_embedding, top_k=top_k, search_filter=search_filter)
+        )
+        hits = self._rank_hits(search_response, score_threshold)
+        token = self.cursor_store.create(
+            self.index_version.current(),
+            np.array([hit.id_ for hit in hits], dtype=np.int64),
+            np.array([hit.distance for hit in hits], dtype=np.float32)
+        )
+        page = await self._hits_to_responses(hits[:page_size])
+        next_cursor = SearchCursorStore.encode(token, page_size) if page_size < len(hits) else None
+        return page, next_cursor, len(hits)
 
 
+    async def search_next_page(
+        self,
+        cursor: str,
+        page_size: int = 20
+    ) -> tuple[list[KeyframeServiceResponse], str | None, int]:
+        """
+        Slice a ranking kept by search_first_page; raises LookupError once the cursor has expired
+        or the index was rebuilt, ValueError if it is malformed
+        """
+        if self.cursor_store is None:
+            raise RuntimeError("Cursor pagination is not configured")
+
+        token, offset = SearchCursorStore.decode(cursor)
+        ranking = self.cursor_store.ranking(self.index_version.current(), token)
+        if ranking is None:
+            raise LookupError("Cursor expired or unknown")
+
+        ids, scores = ranking
+        end = offset + page_size
+        page = await self._hits_to_responses(self._hits_from_ids(ids[offset:end], scores[offset:end]))
+        next_cursor = SearchCursorStore.encode(token, end) if end < len(ids) else None
+        return page, next_cursor, len(ids)
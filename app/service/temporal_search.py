@@ -0,0 +1,69 @@
+"""
+Ordered multi-event search: given ranked candidates for events E1..EK, find chains of keyframes
+from one video where each event follows the previous one within ``max_gap`` keyframes. Chains are
+scored with a dynamic programme over the candidates, one vectorised step per event.
+"""
+
+from typing import NamedTuple
+import numpy as np
+
+from common.keyframe_index import video_key
+from schema.response import KeyframeServiceResponse
+
+
+class TemporalChain(NamedTuple):
+    score: float
+    keyframes: list[KeyframeServiceResponse]
+
+
+def _candidate_arrays(candidates: list[KeyframeServiceResponse]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    video_keys = np.array(
+        [video_key(c.group_num, c.video_num) for c in candidates], dtype=np.int64
+    )
+    keyframe_nums = np.array([c.keyframe_num for c in candidates], dtype=np.int64)
+    scores = np.array([c.confidence_score for c in candidates], dtype=np.float64)
+    return video_keys, keyframe_nums, scores
+
+
+def find_event_chains(
+    event_candidates: list[list[KeyframeServiceResponse]],
+    max_gap: int,
+    top_n: int = 10
+) -> list[TemporalChain]:
+    """
+    Best ``top_n`` chains, one candidate per event in event order, all from the same video with
+    strictly increasing keyframe numbers no more than ``max_gap`` apart. A chain's score is the
+    mean confidence of its keyframes.
+    """
+    if not event_candidates or any(len(candidates) == 0 for candidates in event_candidates):
+        return []
+
+    video_keys, keyframe_nums, dp = _candidate_arrays(event_candidates[0])
+    backpointers = []
+    for candidates in event_candidates[1:]:
+        next_video_keys, next_keyframe_nums, next_scores = _candidate_arrays(candidates)
+        # (previous, current) pairs that may be consecutive links of a chain
+        gaps = next_keyframe_nums[None, :] - keyframe_nums[:, None]
+        linked = (video_keys[:, None] == next_video_keys[None, :]) & (gaps >= 1) & (gaps <= max_gap)
+        chained = np.where(linked, dp[:, None], -np.inf)
+        best_previous = chained.argmax(axis=0)
+        dp = chained[best_previous, np.arange(len(candidates))] + next_scores
+        backpointers.append(best_previous)
+        video_keys, keyframe_nums = next_video_keys, next_keyframe_nums
+
+    finite = np.flatnonzero(np.isfinite(dp))
+    if finite.size == 0:
+        return []
+    ends = finite[np.argsort(-dp[finite], kind="stable")[:top_n]]
+
+    chains = []
+    for end in ends:
+        indices = [int(end)]
+        for pointers in reversed(backpointers):
+            indices.append(int(pointers[indices[-1]]))
+        indices.reverse()
+        chains.append(TemporalChain(
+            score=float(dp[end]) / len(event_candidates),
+            keyframes=[event_candidates[k][i] for k, i in enumerate(indices)]
+        ))
+    return chains
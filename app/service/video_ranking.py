@@ -0,0 +1,105 @@
+"""
+Video-level ranking of keyframe hits. Keyframe scores are pooled per (group, video) with grouped
+NumPy reductions over one sort, so ranking thousands of hits costs a few array passes.
+"""
+
+from typing import NamedTuple
+import numpy as np
+
+from common.keyframe_index import split_video_key, video_key
+from schema.response import KeyframeServiceResponse
+
+
+POOLING_METHODS = ("mean", "max", "top_m_mean", "softmax")
+
+
+class VideoScore(NamedTuple):
+    group_num: int
+    video_num: int
+    score: float
+    keyframes: list[KeyframeServiceResponse]
+
+
+def pool_scores(
+    video_keys: np.ndarray,
+    scores: np.ndarray,
+    method: str = "mean",
+    top_m: int = 3,
+    temperature: float = 0.05
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pool ``scores`` per video key.
+
+    Returns (unique video keys, pooled score per video, order) where ``order`` sorts the hits by
+    video key and then by descending score, i.e. each video's hits are contiguous and best first.
+    """
+    if method not in POOLING_METHODS:
+        raise ValueError(f"Unknown pooling method {method!r}, expected one of {POOLING_METHODS}")
+
+    video_keys = np.asarray(video_keys, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64)
+
+    order = np.lexsort((-scores, video_keys))
+    sorted_keys = video_keys[order]
+    sorted_scores = scores[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, sorted_keys.size])
+    group_ids = np.repeat(np.arange(starts.size), counts)
+
+    if method == "mean":
+        pooled = np.add.reduceat(sorted_scores, starts) / counts
+    elif method == "max":
+        pooled = sorted_scores[starts]
+    elif method == "top_m_mean":
+        rank_in_video = np.arange(sorted_scores.size) - starts[group_ids]
+        kept = rank_in_video < top_m
+        pooled = np.bincount(group_ids[kept], weights=sorted_scores[kept], minlength=starts.size)
+        pooled /= np.minimum(counts, top_m)
+    else:
+        # Softmax-weighted mean: approaches max as temperature -> 0 and mean as it grows
+        weights = np.exp((sorted_scores - sorted_scores[starts][group_ids]) / temperature)
+        pooled = (
+            np.bincount(group_ids, weights=weights * sorted_scores, minlength=starts.size)
+            / np.bincount(group_ids, weights=weights, minlength=starts.size)
+        )
+
+    return sorted_keys[starts], pooled, order
+
+
+def rank_videos(
+    keyframes: list[KeyframeServiceResponse],
+    method: str = "mean",
+    top_m: int = 3,
+    temperature: float = 0.05,
+    top_n: int | None = None,
+    keyframes_per_video: int | None = None
+) -> list[VideoScore]:
+    """
+    Videos of ``keyframes`` ranked by pooled score, each with its keyframes best first.
+    """
+    if not keyframes:
+        return []
+
+    video_keys = np.fromiter(
+        (video_key(kf.group_num, kf.video_num) for kf in keyframes), dtype=np.int64, count=len(keyframes)
+    )
+    scores = np.fromiter((kf.confidence_score for kf in keyframes), dtype=np.float64, count=len(keyframes))
+    unique_keys, pooled, order = pool_scores(video_keys, scores, method, top_m, temperature)
+
+    starts = np.searchsorted(video_keys[order], unique_keys)
+    ends = np.r_[starts[1:], order.size]
+    ranking = np.argsort(-pooled, kind="stable")[:top_n]
+
+    videos = []
+    for i in ranking:
+        members = order[starts[i]:ends[i]][:keyframes_per_video]
+        group_num, video_num = split_video_key(int(unique_keys[i]))
+        videos.append(VideoScore(
+            group_num=group_num,
+            video_num=video_num,
+            score=float(pooled[i]),
+            keyframes=[keyframes[j] for j in members]
+        ))
+    return videos
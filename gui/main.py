@@ -181,6 +181,49 @@ elif search_mode == "Include Groups & Videos":
         except ValueError:
             st.error("Please enter valid video IDs separated by commas")
 
+def render_result(i: int, result: dict):
+    """Render one result card: thumbnail on the left, score and path on the right"""
+    with st.container():
+        col_img, col_info = st.columns([1, 3])
+        
+        with col_img:
+            # Try to display image if path is accessible
+            try:
+                st.image(result['path'], width=200, caption=f"Keyframe {i+1}")
+            except:
+                st.markdown(f"""
+                <div style="
+                    background: #f0f0f0; 
+                    height: 150px; 
+                    border-radius: 10px; 
+                    display: flex; 
+                    align-items: center; 
+                    justify-content: center;
+                    border: 2px dashed #ccc;
+                ">
+                    <div style="text-align: center; color: #666;">
+                        🖼️<br>Image Preview<br>Not Available
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+        
+        with col_info:
+            st.markdown(f"""
+            <div class="result-card">
+                <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 0.5rem;">
+                    <h4 style="margin: 0; color: #333;">Result #{i+1}</h4>
+                    <span class="score-badge">Score: {result['score']:.3f}</span>
+                </div>
+                <p style="margin: 0.5rem 0; color: #666;"><strong>Path:</strong> {result['path']}</p>
+                <div style="background: #f8f9fa; padding: 0.5rem; border-radius: 5px; font-family: monospace; font-size: 0.9rem;">
+                    {result['path'].split('/')[-1]}
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+
+
 # Search button and logic
 if st.button("🚀 Search", use_container_width=True):
     if not query.strip():
@@ -188,54 +231,59 @@ if st.button("🚀 Search", use_container_width=True):
     elif len(query) > 1000:
         st.error("Query too long. Please keep it under 1000 characters.")
     else:
-        with st.spinner("🔍 Searching for keyframes..."):
-            try:
-                if search_mode == "Default":
-                    endpoint = f"{st.session_state.api_base_url}/api/v1/keyframe/search"
-                    payload = {
-                        "query": query,
-                        "top_k": top_k,
-                        "score_threshold": score_threshold
-                    }
-                
-                elif search_mode == "Exclude Groups":
-                    endpoint = f"{st.session_state.api_base_url}/api/v1/keyframe/search/exclude-groups"
-                    payload = {
-                        "query": query,
-                        "top_k": top_k,
-                        "score_threshold": score_threshold,
-                        "exclude_groups": exclude_groups
-                    }
-                
-                else:  # Include Groups & Videos
-                    endpoint = f"{st.session_state.api_base_url}/api/v1/keyframe/search/selected-groups-videos"
-                    payload = {
-                        "query": query,
-                        "top_k": top_k,
-                        "score_threshold": score_threshold,
-                        "include_groups": include_groups,
-                        "include_videos": include_videos
-                    }
-                
+        try:
+            # Every mode goes through the streaming endpoint; cards are drawn as pages arrive
+            endpoint = f"{st.session_state.api_base_url}/api/v1/keyframe/search/stream"
+            payload = {
+                "query": query,
+                "top_k": top_k,
+                "score_threshold": score_threshold,
+            }
+            if search_mode == "Exclude Groups":
+                payload["exclude_groups"] = exclude_groups
+            elif search_mode == "Include Groups & Videos":
+                payload["include_groups"] = include_groups
+                payload["include_videos"] = include_videos
+
+            status = st.empty()
+            status.info("🔍 Searching for keyframes...")
+            live_results = st.container()
+            results = []
 
-                response = requests.post(
-                    endpoint,
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                    timeout=30
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    st.session_state.search_results = data.get("results", [])
-                    st.success(f"✅ Found {len(st.session_state.search_results)} results!")
+            with requests.post(
+                endpoint,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                stream=True,
+                timeout=30
+            ) as response:
+                if response.status_code != 200:
+                    status.error(f"❌ API Error: {response.status_code} - {response.text}")
                 else:
-                    st.error(f"❌ API Error: {response.status_code} - {response.text}")
-                    
-            except requests.exceptions.RequestException as e:
-                st.error(f"❌ Connection Error: {str(e)}")
-            except Exception as e:
-                st.error(f"❌ Unexpected Error: {str(e)}")
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        message = json.loads(line)
+                        if "error" in message:
+                            status.error(f"❌ Search failed: {message['error']}")
+                            break
+                        if message.get("done"):
+                            status.success(f"✅ Found {message['total']} results!")
+                            break
+                        with live_results:
+                            for result in message["results"]:
+                                render_result(len(results), result)
+                                results.append(result)
+                        status.info(f"🔍 Received {len(results)} results...")
+
+            st.session_state.search_results = results
+            # Already drawn above; the results section below only adds the summary this run
+            st.session_state.results_rendered = True
+
+        except requests.exceptions.RequestException as e:
+            st.error(f"❌ Connection Error: {str(e)}")
+        except Exception as e:
+            st.error(f"❌ Unexpected Error: {str(e)}")
 
 # Display results
 if st.session_state.search_results:
@@ -260,46 +308,10 @@ if st.session_state.search_results:
     sorted_results = sorted(st.session_state.search_results, key=lambda x: x['score'], reverse=True)
     
     # Display results in a grid
-    for i, result in enumerate(sorted_results):
-        with st.container():
-            col_img, col_info = st.columns([1, 3])
-            
-            with col_img:
-                # Try to display image if path is accessible
-                try:
-                    st.image(result['path'], width=200, caption=f"Keyframe {i+1}")
-                except:
-                    st.markdown(f"""
-                    <div style="
-                        background: #f0f0f0; 
-                        height: 150px; 
-                        border-radius: 10px; 
-                        display: flex; 
-                        align-items: center; 
-                        justify-content: center;
-                        border: 2px dashed #ccc;
-                    ">
-                        <div style="text-align: center; color: #666;">
-                            🖼️<br>Image Preview<br>Not Available
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            
-            with col_info:
-                st.markdown(f"""
-                <div class="result-card">
-                    <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 0.5rem;">
-                        <h4 style="margin: 0; color: #333;">Result #{i+1}</h4>
-                        <span class="score-badge">Score: {result['score']:.3f}</span>
-                    </div>
-                    <p style="margin: 0.5rem 0; color: #666;"><strong>Path:</strong> {result['path']}</p>
-                    <div style="background: #f8f9fa; padding: 0.5rem; border-radius: 5px; font-family: monospace; font-size: 0.9rem;">
-                        {result['path'].split('/')[-1]}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        st.markdown("<br>", unsafe_allow_html=True)
+    if not st.session_state.get("results_rendered"):
+        for i, result in enumerate(sorted_results):
+            render_result(i, result)
+    st.session_state.results_rendered = False
 
 # Footer
 st.markdown("---")
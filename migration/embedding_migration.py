@@ -5,6 +5,9 @@ from typing import Optional
 from tqdm import tqdm
 import argparse
 import json
+import time
+import pandas as pd
+from pathlib import Path
 
 import sys
 import os
@@ -13,7 +16,11 @@ ROOT_FOLDER = os.path.abspath(
 )
 sys.path.insert(0, ROOT_FOLDER)
 
-from app.core.settings import KeyFrameIndexMilvusSetting
+from app.core.settings import KeyFrameIndexMilvusSetting, AppSettings
+from app.common.keyframe_filter import group_partition_name
+from app.common.embedding_store import EmbeddingShardStore
+from app.common.keyframe_index import split_video_key, video_key
+from app.core.index_version import bump_index_version
 
 try:
     from core.logger import SimpleLogger, logger
@@ -26,6 +33,9 @@ except ImportError:
 
 logger = SimpleLogger(__name__)
 
+
+METADATA_FIELDS = ("group_num", "video_num", "keyframe_num", "frame_idx")
+
 class MilvusEmbeddingInjector:
     def __init__(
         self,
@@ -61,16 +71,36 @@ class MilvusEmbeddingInjector:
         connections.connect(alias=alias, **conn_params)
         print(f"Connected to Milvus at {host}:{port}")
         
-    def create_collection(self, embedding_dim: int, index_params: Optional[dict] = None):
+    def create_collection(
+        self,
+        embedding_dim: int,
+        index_params: Optional[dict] = None,
+        with_metadata: bool = False,
+        group_nums: Optional[list[int]] = None,
+        name: Optional[str] = None
+    ):
+        name = name or self.collection_name
         fields = [
             FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
             FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=embedding_dim)
         ]
+        if with_metadata:
+            fields += [
+                FieldSchema(name="group_num", dtype=DataType.INT16),
+                FieldSchema(name="video_num", dtype=DataType.INT16),
+                FieldSchema(name="keyframe_num", dtype=DataType.INT32),
+                FieldSchema(name="frame_idx", dtype=DataType.INT64),
+            ]
         
         schema = CollectionSchema(fields, f"Collection for {self.collection_name} embeddings")
         
-        collection = Collection(self.collection_name, schema, using=self.alias)
-        print(f"Created collection '{self.collection_name}' with dimension {embedding_dim}")
+        collection = Collection(name, schema, using=self.alias)
+        print(f"Created collection '{name}' with dimension {embedding_dim}")
+
+        for group_num in group_nums or []:
+            collection.create_partition(group_partition_name(group_num))
+        if group_nums:
+            print(f"Created {len(group_nums)} group partitions")
         
         if index_params is None:
             index_params = {
@@ -80,53 +110,327 @@ class MilvusEmbeddingInjector:
         
         collection.create_index("embedding", index_params)
         print("Created index for embedding field")
+
+        if with_metadata:
+            for field_name in ("group_num", "video_num"):
+                collection.create_index(field_name, {"index_type": "INVERTED"})
+            print("Created scalar indexes for group_num and video_num")
         
         return collection
+
+    @staticmethod
+    def load_keyframe_metadata(
+        id2index_path: str,
+        num_vectors: int,
+        map_keyframes_dir: Optional[str] = None
+    ) -> dict[str, np.ndarray]:
+        """
+        Per-id group/video/keyframe numbers from id2index.json, plus frame_idx from the
+        map-keyframes CSVs (one read per video). Missing values are -1.
+        """
+        with open(id2index_path, 'r', encoding='utf-8') as f:
+            id2index = json.load(f)
+
+        metadata = {
+            "group_num": np.full(num_vectors, -1, dtype=np.int16),
+            "video_num": np.full(num_vectors, -1, dtype=np.int16),
+            "keyframe_num": np.full(num_vectors, -1, dtype=np.int32),
+            "frame_idx": np.full(num_vectors, -1, dtype=np.int64),
+        }
+        for key, value in id2index.items():
+            id_ = int(key)
+            if id_ >= num_vectors:
+                continue
+            group_num, video_num, keyframe_num = map(int, value.split('/'))
+            metadata["group_num"][id_] = group_num
+            metadata["video_num"][id_] = video_num
+            metadata["keyframe_num"][id_] = keyframe_num
+
+        if map_keyframes_dir:
+            video_keys = video_key(metadata["group_num"], metadata["video_num"])
+            for key in tqdm(np.unique(video_keys[metadata["group_num"] >= 0]), desc="Reading map-keyframes"):
+                group_num, video_num = split_video_key(int(key))
+                map_file = Path(map_keyframes_dir) / f"L{group_num:02d}_V{video_num:03d}.csv"
+                if not map_file.exists():
+                    logger.warning(f"Map file {map_file} not found, frame_idx left at -1")
+                    continue
+                frame_map = pd.read_csv(map_file, usecols=["n", "frame_idx"])
+                frame_map = dict(zip(frame_map["n"].astype(int), frame_map["frame_idx"].astype(int)))
+                ids = np.flatnonzero(video_keys == key)
+                metadata["frame_idx"][ids] = [
+                    frame_map.get(int(keyframe_num), -1) for keyframe_num in metadata["keyframe_num"][ids]
+                ]
+
+        return metadata
     
+    @staticmethod
+    def _iter_matrix_partitions(
+        embeddings: np.ndarray,
+        metadata: Optional[dict[str, np.ndarray]],
+        group_nums: list[int]
+    ):
+        """
+        (partition name, ids, vectors) per group partition of a row-per-id matrix.
+        Ids missing from id2index are left out.
+        """
+        if metadata is None:
+            yield None, np.arange(len(embeddings)), embeddings
+            return
+        for group_num in group_nums:
+            ids = np.flatnonzero(metadata["group_num"] == group_num)
+            yield group_partition_name(group_num), ids, embeddings[ids]
+
+    @staticmethod
+    def _live_rows(
+        batch_ids: np.ndarray,
+        vectors: np.ndarray,
+        metadata: Optional[dict[str, np.ndarray]]
+    ) -> np.ndarray:
+        """
+        Mask of rows to index: non-zero vectors of ids that id2index maps to a keyframe.
+        Unmapped or retired ids would otherwise come back from search with group_num -1.
+        """
+        live = np.any(vectors != 0, axis=1)
+        if metadata is not None:
+            live &= metadata["group_num"][batch_ids] >= 0
+        return live
+
+    @staticmethod
+    def _group_partition(ids: np.ndarray, metadata: Optional[dict[str, np.ndarray]]) -> Optional[str]:
+        """
+        Partition of a video shard; a shard's ids all share one group.
+        """
+        if metadata is None or len(ids) == 0 or metadata["group_num"][ids[0]] < 0:
+            return None
+        return group_partition_name(int(metadata["group_num"][ids[0]]))
+
+    @classmethod
+    def _iter_shard_partitions(
+        cls,
+        shard_store: EmbeddingShardStore,
+        metadata: Optional[dict[str, np.ndarray]]
+    ):
+        """
+        (partition name, ids, vectors) per video shard.
+        """
+        for _, ids, vectors in shard_store.iter_shards():
+            yield cls._group_partition(ids, metadata), ids, vectors
+
+    @staticmethod
+    def _entities(
+        batch_ids: np.ndarray,
+        vectors: np.ndarray,
+        metadata: Optional[dict[str, np.ndarray]]
+    ) -> list[np.ndarray]:
+        """
+        Column-based batch passed to pymilvus as NumPy arrays, without per-row Python lists.
+        """
+        entities = [
+            np.ascontiguousarray(batch_ids, dtype=np.int64),
+            np.ascontiguousarray(vectors, dtype=np.float32)
+        ]
+        if metadata is not None:
+            entities += [metadata[name][batch_ids] for name in METADATA_FIELDS]
+        return entities
+
+    def _alias_target(self) -> Optional[str]:
+        """
+        Collection currently serving the alias ``collection_name``, None when it is not an alias.
+        """
+        for name in utility.list_collections(using=self.alias):
+            if self.collection_name in utility.list_aliases(name, using=self.alias):
+                return name
+        return None
+
+    def _swap_alias(self, shadow_name: str):
+        """
+        Point ``collection_name`` at ``shadow_name`` in one step and drop the collection it replaced.
+        """
+        previous = self._alias_target()
+        if previous is not None:
+            utility.alter_alias(shadow_name, self.collection_name, using=self.alias)
+            utility.drop_collection(previous, using=self.alias)
+            print(f"Alias '{self.collection_name}' moved from '{previous}' to '{shadow_name}'")
+            return
+        if utility.has_collection(self.collection_name, using=self.alias):
+            # A plain collection still holds the name; it has to go before the alias can take it
+            logger.warning(f"Dropping plain collection '{self.collection_name}' to replace it with an alias")
+            utility.drop_collection(self.collection_name, using=self.alias)
+        utility.create_alias(shadow_name, self.collection_name, using=self.alias)
+        print(f"Alias '{self.collection_name}' now points to '{shadow_name}'")
+
+    def _sync_state_path(self, shard_store: EmbeddingShardStore) -> Path:
+        return shard_store.root / f"milvus_{self.collection_name}.json"
+
+    def _save_sync_state(self, shard_store: EmbeddingShardStore, state: dict):
+        """
+        Content hash and ids of every shard as last written to Milvus.
+        """
+        path = self._sync_state_path(shard_store)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _shard_sync_state(self, shard_store: EmbeddingShardStore) -> dict:
+        return {
+            name: {"content": entry.get("content"), "ids": shard_store.read_ids(name).tolist()}
+            for name, entry in shard_store.shards.items()
+        }
+
     def inject_embeddings(
         self, 
         embedding_file_path: str, 
         batch_size: int = 10000,
+        id2index_path: Optional[str] = None,
+        map_keyframes_dir: Optional[str] = None,
     ):
         print(f"Loading embeddings from {embedding_file_path}")
-        embeddings = torch.load(embedding_file_path, map_location=torch.device('cpu'), weights_only=False)
-        
-        if isinstance(embeddings, torch.Tensor):
-            embeddings = embeddings.cpu().numpy()
-        
-        if embeddings.ndim == 1:
-            embeddings = embeddings.reshape(1, -1)
-        
-        num_vectors, embedding_dim = embeddings.shape
-        print(f"Loaded {num_vectors} embeddings with dimension {embedding_dim}")
-        
-        # Attempt to drop collection with error handling
-        try:
-            if utility.has_collection(self.collection_name, using=self.alias):
-                print(f"Dropping existing collection '{self.collection_name}' before creation...")
-                utility.drop_collection(self.collection_name, using=self.alias)
-        except Exception as e:
-            logger.error(f"Failed to drop collection '{self.collection_name}': {e}")
-            print(f"Warning: Could not drop collection, proceeding to create a new one")
+        shard_store = None
+        if os.path.isdir(embedding_file_path):
+            # Per-video shards are streamed one at a time instead of being concatenated
+            shard_store = EmbeddingShardStore(embedding_file_path)
+            if shard_store.dim is None:
+                raise ValueError(f"No embedding shards found in {embedding_file_path}")
+            num_vectors, embedding_dim = shard_store.num_ids, shard_store.dim
+            print(f"Found {len(shard_store)} embeddings in {len(shard_store.shards)} shards with dimension {embedding_dim}")
+        else:
+            if embedding_file_path.endswith(".npy"):
+                embeddings = np.load(embedding_file_path, mmap_mode="r")
+            else:
+                embeddings = torch.load(embedding_file_path, map_location=torch.device('cpu'), weights_only=False)
+            
+            if isinstance(embeddings, torch.Tensor):
+                embeddings = embeddings.cpu().numpy()
+            
+            if embeddings.ndim == 1:
+                embeddings = embeddings.reshape(1, -1)
+            
+            num_vectors, embedding_dim = embeddings.shape
+            print(f"Loaded {num_vectors} embeddings with dimension {embedding_dim}")
+
+        metadata = None
+        group_nums: list[int] = []
+        if id2index_path:
+            metadata = self.load_keyframe_metadata(id2index_path, num_vectors, map_keyframes_dir)
+            group_nums = [int(g) for g in np.unique(metadata["group_num"]) if g >= 0]
         
-        collection = self.create_collection(embedding_dim)
+        # Build next to the live collection and switch the alias once it is loaded,
+        # so searches keep hitting the old data until then
+        shadow_name = f"{self.collection_name}_{time.strftime('%Y%m%d%H%M%S')}"
+        collection = self.create_collection(
+            embedding_dim,
+            with_metadata=metadata is not None,
+            group_nums=group_nums,
+            name=shadow_name
+        )
         
         print(f"Inserting {num_vectors} embeddings in batches of {batch_size}")
-        
-        for i in tqdm(range(0, num_vectors, batch_size), desc="Inserting batches"):
-            end_idx = min(i + batch_size, num_vectors)
-            batch_embeddings = embeddings[i:end_idx].tolist()
-            batch_ids = list(range(i, end_idx))
-            entities = [batch_ids, batch_embeddings]
-            collection.insert(entities)
+
+        if shard_store is not None:
+            sources = self._iter_shard_partitions(shard_store, metadata)
+        else:
+            sources = self._iter_matrix_partitions(embeddings, metadata, group_nums)
+
+        skipped = 0
+        for partition_name, ids, vectors in sources:
+            for i in tqdm(range(0, len(ids), batch_size), desc=f"Inserting {partition_name or '_default'}"):
+                batch_ids, batch_vectors = ids[i:i + batch_size], np.asarray(vectors[i:i + batch_size])
+                live = self._live_rows(batch_ids, batch_vectors, metadata)
+                skipped += len(live) - int(np.count_nonzero(live))
+                if live.any():
+                    entities = self._entities(batch_ids[live], batch_vectors[live], metadata)
+                    collection.insert(entities, partition_name=partition_name)
+        if skipped:
+            print(f"Skipped {skipped} unmapped or all-zero embeddings")
         
         collection.flush()
         print("Data flushed to disk")
         
         collection.load()
         print("Collection loaded for search")
+
+        self._swap_alias(shadow_name)
+        if shard_store is not None:
+            self._save_sync_state(shard_store, self._shard_sync_state(shard_store))
         
         return collection
+
+    def upsert_shards(
+        self,
+        shard_dir: str,
+        batch_size: int = 10000,
+        id2index_path: Optional[str] = None,
+        map_keyframes_dir: Optional[str] = None,
+    ) -> int:
+        """
+        Upsert the shards rewritten since the last sync into the live collection
+        and delete ids that left them or no longer map to a keyframe, so the cost follows the size
+        of the change. Falls back to a
+        full shadow rebuild when there is no previous sync. Returns the number of ids touched.
+        """
+        shard_store = EmbeddingShardStore(shard_dir)
+        state_path = self._sync_state_path(shard_store)
+        if not state_path.exists() or not utility.has_collection(self.collection_name, using=self.alias):
+            print(f"No previous sync of '{self.collection_name}' from {shard_dir}, rebuilding")
+            self.inject_embeddings(shard_dir, batch_size, id2index_path, map_keyframes_dir)
+            return len(shard_store)
+
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        changed = sorted(
+            name for name, entry in shard_store.shards.items()
+            # Shards from before content hashes were recorded always count as changed
+            if entry.get("content") is None or state.get(name, {}).get("content") != entry["content"]
+        )
+        removed = sorted(name for name in state if name not in shard_store.shards)
+        print(f"{len(changed)} changed and {len(removed)} removed shards")
+
+        collection = Collection(self.collection_name, using=self.alias)
+        has_metadata = "group_num" in {field.name for field in collection.schema.fields}
+        if has_metadata:
+            # Unmapped ids indexed by earlier builds
+            collection.delete("group_num < 0")
+        if not changed and not removed:
+            return 0
+
+        metadata = None
+        if has_metadata:
+            if not id2index_path:
+                raise ValueError(f"'{self.collection_name}' stores keyframe metadata; pass id2index_path")
+            metadata = self.load_keyframe_metadata(id2index_path, shard_store.num_ids, map_keyframes_dir)
+
+        stale_ids, upserted_ids = [], []
+        upserted = 0
+        for name in tqdm(changed, desc="Upserting shards"):
+            ids, vectors, _ = shard_store.read(name)
+            live = self._live_rows(ids, vectors, metadata)
+            # Ids that left the shard or no longer map to a keyframe
+            previous_ids = np.asarray(state.get(name, {}).get("ids", []), dtype=np.int64)
+            stale_ids.append(np.setdiff1d(np.union1d(previous_ids, ids), ids[live]))
+            ids, vectors = ids[live], vectors[live]
+            partition_name = self._group_partition(ids, metadata)
+            if partition_name is not None and not collection.has_partition(partition_name):
+                collection.create_partition(partition_name)
+            for i in range(0, len(ids), batch_size):
+                entities = self._entities(ids[i:i + batch_size], vectors[i:i + batch_size], metadata)
+                collection.upsert(entities, partition_name=partition_name)
+            upserted += len(ids)
+            upserted_ids.append(ids)
+            state[name] = {"content": shard_store.shards[name].get("content"), "ids": ids.tolist()}
+        for name in removed:
+            stale_ids.append(np.asarray(state.pop(name)["ids"], dtype=np.int64))
+
+        stale_ids = np.concatenate(stale_ids) if stale_ids else np.empty(0, dtype=np.int64)
+        # An id that moved to another changed shard was just upserted there and must survive
+        if upserted_ids:
+            stale_ids = np.setdiff1d(stale_ids, np.concatenate(upserted_ids))
+        for i in range(0, len(stale_ids), batch_size):
+            collection.delete(f"id in {stale_ids[i:i + batch_size].tolist()}")
+        collection.flush()
+        self._save_sync_state(shard_store, state)
+        print(f"Upserted {upserted} and deleted {len(stale_ids)} embeddings")
+        return upserted + len(stale_ids)
     
     def get_collection_info(self):
         collection = Collection(self.collection_name, using=self.alias)
@@ -141,7 +445,10 @@ class MilvusEmbeddingInjector:
 
 def inject_embeddings_simple(
     embedding_file_path: str,
-    setting: KeyFrameIndexMilvusSetting
+    setting: KeyFrameIndexMilvusSetting,
+    id2index_path: Optional[str] = None,
+    map_keyframes_dir: Optional[str] = None,
+    incremental: bool = False
 ):
     injector = MilvusEmbeddingInjector(
         setting=setting,
@@ -150,22 +457,57 @@ def inject_embeddings_simple(
         port=setting.PORT
     )
     
-    injector.inject_embeddings(
-        embedding_file_path=embedding_file_path,
-        batch_size=setting.BATCH_SIZE
-    )
+    if incremental:
+        if not os.path.isdir(embedding_file_path):
+            raise ValueError("Incremental mode needs a shard folder from generate_embeddings_features.py")
+        changes = injector.upsert_shards(
+            shard_dir=embedding_file_path,
+            batch_size=setting.BATCH_SIZE,
+            id2index_path=id2index_path,
+            map_keyframes_dir=map_keyframes_dir
+        )
+        if changes == 0:
+            print("Collection already up to date")
+            return
+    else:
+        injector.inject_embeddings(
+            embedding_file_path=embedding_file_path,
+            batch_size=setting.BATCH_SIZE,
+            id2index_path=id2index_path,
+            map_keyframes_dir=map_keyframes_dir
+        )
     count = injector.get_collection_info()
     print(f"Successfully injected embeddings! Total entities: {count}")
+    version = bump_index_version(AppSettings().INDEX_VERSION_PATH)
+    print(f"Bumped index version to {version}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Migrate embedding to Milvus.")
     parser.add_argument(
-        "--file_path", type=str, help="Path to embedding pt."
+        "--file_path", type=str, help="Path to embedding .pt or .npy, or a shard folder from generate_embeddings_features.py."
+    )
+    parser.add_argument(
+        "--id2index_path", type=str, default=None,
+        help="Path to id2index.json; stores group/video/keyframe scalar fields and per-group partitions."
+    )
+    parser.add_argument(
+        "--map_keyframes_dir", type=str, default=None,
+        help="Directory of map-keyframes CSVs used to fill frame_idx (defaults to MAP_KEYFRAMES_FOLDER)."
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Upsert only shards changed since the last run instead of rebuilding the collection."
     )
     args = parser.parse_args()
 
     setting = KeyFrameIndexMilvusSetting()
+    map_keyframes_dir = args.map_keyframes_dir
+    if args.id2index_path and map_keyframes_dir is None:
+        map_keyframes_dir = AppSettings().MAP_KEYFRAMES_FOLDER
     inject_embeddings_simple(
         embedding_file_path=args.file_path,
-        setting=setting
+        setting=setting,
+        id2index_path=args.id2index_path,
+        map_keyframes_dir=map_keyframes_dir,
+        incremental=args.incremental
     )
@@ -1,87 +1,349 @@
-import torch
+import argparse
+from pathlib import Path
 import numpy as np
-import os
-import glob
-from tqdm import tqdm
-import json
-from open_clip import create_model_and_transforms, get_tokenizer
+import torch
+from torch.utils.data import Dataset, DataLoader
+import open_clip
 from PIL import Image
+from tqdm import tqdm
 
-# Paths
-FEATURE_DIR = r"D:\AI Viet Nam\AI_Challenge\Dataset\clip-features-32"
-ID2INDEX_PATH = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\id2index.json"
-OUTPUT_PATH = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\CLIP_ViT-B-32_laion2b_s34b_b79k_clip_embeddings.pt"
-KEYFRAME_DIR = r"D:\AI Viet Nam\AI_Challenge\Dataset\Keyframes"
+import sys
+import os
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
 
-def generate_embeddings():
-    # Load id2index.json for keyframe paths
-    try:
-        with open(ID2INDEX_PATH, 'r') as f:
-            id2index = json.load(f)
-        valid_groups = list(range(21, 31))  # Groups L21 to L30
-        id2index = {k: v for k, v in id2index.items() if int(v.split('/')[0]) in valid_groups}
-        print(f"Loaded {len(id2index)} entries from id2index.json for groups L21 to L30")
-    except Exception as e:
-        print(f"Error loading id2index.json: {e}")
-        return
-
-    # Initialize model
-    try:
-        model, _, preprocess = create_model_and_transforms('ViT-B-32', pretrained='laion2b_s34b_b79k')
-        model.eval()  # Set model to evaluation mode
-        tokenizer = get_tokenizer('ViT-B-32')
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model = model.to(device)
-        print(f"Initialized CLIP model 'laion2b_s34b_b79k' on {device}")
-    except Exception as e:
-        print(f"Error initializing CLIP model 'laion2b_s34b_b79k': {e}")
-        print(f"Check if the model tag is correct or required dependencies are installed.")
-        return
-
-    # Initialize embedding list
-    embedding_dim = 512  # Dimension for ViT-B-32
-    embeddings = np.zeros((len(id2index), embedding_dim), dtype=np.float32)
-    key_to_index = {k: i for i, k in enumerate(sorted(id2index.keys(), key=int))}  # Sort by key for consistency
-
-    # Process each keyframe image based on id2index
-    processed_keys = set()
-    for key, value in tqdm(id2index.items(), desc="Processing keyframes"):
+from app.core.settings import AppSettings
+from app.common.keyframe_index import (
+    EXT_UNKNOWN,
+    KeyframeIndexTable,
+    extension_code,
+    keyframe_relative_path,
+    split_video_key,
+    video_key,
+)
+from app.common.embedding_store import EmbeddingShardStore, folder_fingerprint, parse_shard_name, shard_name
+
+try:
+    from core.logger import SimpleLogger, logger
+except ImportError:
+    import logging
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(message)s')
+    logger = logging.getLogger(__name__)
+    SimpleLogger = logging.getLogger
+
+logger = SimpleLogger(__name__)
+
+
+# Groups embedded by default (L21 to L30)
+DEFAULT_GROUPS = list(range(21, 31))
+
+
+class KeyframeImageDataset(Dataset):
+    """
+    (position, preprocessed image tensor) pairs over ``paths``; images that fail to open
+    yield None and are reported by ``collate_keyframes``.
+    """
+
+    def __init__(self, paths: list[str], preprocess):
+        self.paths = paths
+        self.preprocess = preprocess
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, i: int):
         try:
-            g_num, v_num, k_num = map(int, value.split('/'))
-            filename = f"{k_num:03d}"
-            base_path = os.path.join(KEYFRAME_DIR, f"Keyframes_L{g_num:02d}", "keyframes", f"L{g_num:02d}_V{v_num:03d}")
-            for ext in ('.jpg', '.png'):
-                img_path = os.path.join(base_path, f"{filename}{ext}")
-                if os.path.exists(img_path):
-                    img = Image.open(img_path).convert('RGB')
-                    img_tensor = preprocess(img).unsqueeze(0).to(device)
-                    with torch.no_grad():
-                        embedding = model.encode_image(img_tensor).cpu().numpy()[0]  # (512,)
-                    index = key_to_index[key]
-                    if 0 <= index < len(embeddings):
-                        embeddings[index] = embedding
-                        processed_keys.add(key)
-                    else:
-                        print(f"Skipping key {key}: index {index} out of range for embeddings array")
-                    break
-            else:
-                print(f"No image found for key {key} at {base_path}")
+            with Image.open(self.paths[i]) as img:
+                return i, self.preprocess(img.convert('RGB'))
         except Exception as e:
-            print(f"Error processing key {key}: {e}")
-            continue
+            logger.warning(f"Skipping {self.paths[i]}: {e}")
+            return i, None
 
-    print(f"Processed {len(processed_keys)} out of {len(id2index)} keys")
-    if len(processed_keys) != len(id2index):
-        print(f"Warning: Not all id2index keys were matched. Missing {len(id2index) - len(processed_keys)} keys")
-    
-    # Convert to torch tensor and save
+
+def collate_keyframes(items):
+    """
+    (all positions, mask of positions whose image loaded, stacked images of those or None)
+    """
+    positions = torch.tensor([i for i, _ in items], dtype=torch.int64)
+    loaded = torch.tensor([tensor is not None for _, tensor in items], dtype=torch.bool)
+    tensors = [tensor for _, tensor in items if tensor is not None]
+    return positions, loaded, torch.stack(tensors) if tensors else None
+
+
+def _scan_video(video_dir: str) -> dict[int, tuple[str, int, int]]:
+    """
+    keyframe number -> (file name, size, mtime_ns) of the images in one video folder.
+    """
+    found = {}
     try:
-        embeddings_tensor = torch.from_numpy(embeddings)
-        torch.save(embeddings_tensor, OUTPUT_PATH)
-        print(f"Saved embeddings to {OUTPUT_PATH} with shape {embeddings_tensor.shape}")
-    except Exception as e:
-        print(f"Error saving embeddings to {OUTPUT_PATH}: {e}")
-        return
+        with os.scandir(video_dir) as entries:
+            for entry in entries:
+                stem, _ = os.path.splitext(entry.name)
+                if extension_code(entry.name) != EXT_UNKNOWN and stem.isdigit():
+                    stat = entry.stat()
+                    found.setdefault(int(stem), (entry.name, stat.st_size, stat.st_mtime_ns))
+    except OSError:
+        pass
+    return found
+
+
+class _VideoJob:
+    """
+    One video whose shard must be rewritten: rows kept from the old shard plus ids still to embed.
+    """
+
+    def __init__(self, name: str, fingerprint: str, kept: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.ids, self.embeddings, self.mtimes, self.keyframe_nums = [kept[0]], [kept[1]], [kept[2]], [kept[3]]
+        self.pending = 0
+        self.failed = 0
+
+    def add(self, ids: np.ndarray, embeddings: np.ndarray, mtimes: np.ndarray, keyframe_nums: np.ndarray):
+        self.ids.append(ids)
+        self.embeddings.append(embeddings)
+        self.mtimes.append(mtimes)
+        self.keyframe_nums.append(keyframe_nums)
+
+    def write(self, store: EmbeddingShardStore):
+        parts = [i for i, ids in enumerate(self.ids) if len(ids)]
+        if not parts:
+            store.remove(self.name)
+            return
+        store.write(
+            self.name,
+            np.concatenate([self.ids[i] for i in parts]),
+            np.concatenate([self.embeddings[i] for i in parts]),
+            np.concatenate([self.mtimes[i] for i in parts]),
+            np.concatenate([self.keyframe_nums[i] for i in parts]),
+            self.fingerprint,
+            # Unreadable images are retried on the next run
+            failed=self.failed
+        )
+
+
+def generate_embeddings(
+    keyframe_dir: str,
+    table_path: str,
+    id2index_path: str,
+    shard_dir: str,
+    model_name: str,
+    groups: list[int] | None = None,
+    batch_size: int = 64,
+    num_workers: int = 4,
+    num_threads: int | None = None,
+    device: str | None = None
+) -> EmbeddingShardStore:
+    """
+    Embed keyframe images of ``groups`` into per-video shards under ``shard_dir``.
+
+    A video whose folder and table ids fingerprint matches the manifest is skipped; otherwise only
+    keyframes that are new or whose image mtime changed are embedded and the rest are copied from
+    the old shard under their current ids, so renumbering id2index re-keys instead of re-embedding.
+    Shards of videos that left the table are removed. Each shard is written as soon as its video
+    finishes, so an interrupted run resumes at the first unfinished video.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+
+    table = KeyframeIndexTable.load_or_build(table_path, id2index_path)
+    if len(table) == 0:
+        raise FileNotFoundError(f"Neither {table_path} nor {id2index_path} exist")
+    store = EmbeddingShardStore(shard_dir, model_name=model_name)
+
+    wanted = table.group_nums >= 0
+    if groups:
+        wanted &= np.isin(table.group_nums, np.asarray(groups, dtype=table.group_nums.dtype))
+    wanted_ids = np.flatnonzero(wanted)
+    video_keys = video_key(table.group_nums[wanted_ids], table.video_nums[wanted_ids])
+    order = np.argsort(video_keys, kind="stable")
+    wanted_ids, video_keys = wanted_ids[order], video_keys[order]
+    unique_keys, starts = np.unique(video_keys, return_index=True)
+
+    jobs: list[_VideoJob | None] = []
+    job_of, pending_ids, pending_paths, pending_mtimes, pending_keyframes = [], [], [], [], []
+    missing = skipped = 0
+    for key, ids in tqdm(
+        zip(unique_keys, np.split(wanted_ids, starts[1:])), total=len(unique_keys), desc="Scanning videos"
+    ):
+        group_num, video_num = split_video_key(int(key))
+        name = shard_name(group_num, video_num)
+        video_dir = os.path.dirname(
+            os.path.join(keyframe_dir, keyframe_relative_path(group_num, video_num, 0, ""))
+        )
+        found = _scan_video(video_dir)
+        keyframe_nums = table.keyframe_nums[ids].astype(np.int64)
+        fingerprint = folder_fingerprint(list(found.values()), zip(ids.tolist(), keyframe_nums.tolist()))
+        if store.is_complete(name, fingerprint):
+            skipped += 1
+            continue
+
+        # Old rows are matched by keyframe number, not id, so they survive a renumbered table;
+        # shards written without keyframe numbers cannot be matched and are re-embedded
+        old_ids, old_embeddings, old_mtimes = store.read(name)
+        old_keyframe_nums = store.read_keyframe_nums(name)
+        old_row_by_keyframe = {} if old_keyframe_nums is None else {
+            keyframe_num: row for row, keyframe_num in enumerate(old_keyframe_nums.tolist())
+        }
+        kept_ids, kept_rows, kept_keyframes = [], [], []
+        new_ids, new_paths, new_mtimes, new_keyframes = [], [], [], []
+        for id_, keyframe_num in zip(ids.tolist(), keyframe_nums.tolist()):
+            image = found.get(keyframe_num)
+            row = old_row_by_keyframe.get(keyframe_num)
+            if image is None:
+                missing += 1
+            elif row is not None and old_mtimes[row] == image[2]:
+                kept_ids.append(id_)
+                kept_rows.append(row)
+                kept_keyframes.append(keyframe_num)
+            else:
+                new_ids.append(id_)
+                new_paths.append(os.path.join(video_dir, image[0]))
+                new_mtimes.append(image[2])
+                new_keyframes.append(keyframe_num)
+
+        kept_rows = np.asarray(kept_rows, dtype=np.int64)
+        job = _VideoJob(name, fingerprint, (
+            np.asarray(kept_ids, dtype=np.int64),
+            old_embeddings[kept_rows],
+            old_mtimes[kept_rows],
+            np.asarray(kept_keyframes, dtype=np.int64)
+        ))
+        if not new_ids:
+            if kept_ids:
+                job.write(store)
+            else:
+                store.remove(name)
+            continue
+        job.pending = len(new_ids)
+        job_of += [len(jobs)] * len(new_ids)
+        jobs.append(job)
+        pending_ids += new_ids
+        pending_paths += new_paths
+        pending_mtimes += new_mtimes
+        pending_keyframes += new_keyframes
+
+    # Videos of the embedded groups that no longer have ids in the table, e.g. folders
+    # removed before an incremental generate_id2index rescan
+    live = {shard_name(*split_video_key(int(key))) for key in unique_keys}
+    retired = []
+    for name in list(store.shards):
+        parsed = parse_shard_name(name)
+        if name not in live and (not groups or (parsed is not None and parsed[0] in groups)):
+            retired.append(name)
+    for name in retired:
+        store.remove(name)
+    if retired:
+        logger.info(f"Removed {len(retired)} shards of videos no longer in the keyframe table")
+
+    if missing:
+        logger.warning(f"No image found for {missing} keyframes")
+    logger.info(
+        f"{skipped} videos unchanged; embedding {len(pending_ids)} keyframes from {len(jobs)} videos "
+        f"in batches of {batch_size} with {num_workers} workers"
+    )
+    if not pending_ids:
+        return store
+
+    model, _, preprocess = open_clip.create_model_and_transforms(model_name)
+    model = model.to(device).eval()
+    logger.info(f"Initialized {model_name} on {device}")
+
+    job_of = np.asarray(job_of, dtype=np.int64)
+    pending_ids = np.asarray(pending_ids, dtype=np.int64)
+    pending_mtimes = np.asarray(pending_mtimes, dtype=np.int64)
+    pending_keyframes = np.asarray(pending_keyframes, dtype=np.int64)
+    loader = DataLoader(
+        KeyframeImageDataset(pending_paths, preprocess),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        collate_fn=collate_keyframes,
+        pin_memory=device.type == 'cuda',
+        persistent_workers=num_workers > 0
+    )
+    embedded = 0
+    with torch.inference_mode():
+        for positions, loaded, images in tqdm(loader, desc="Embedding keyframes"):
+            positions, loaded = positions.numpy(), loaded.numpy()
+            features = None
+            if images is not None:
+                features = model.encode_image(images.to(device, non_blocking=True)).float().cpu().numpy()
+                embedded += len(features)
+
+            # Batches arrive in video order; a shard is written as soon as its last keyframe lands
+            batch_jobs = job_of[positions]
+            for j in np.unique(batch_jobs):
+                job = jobs[j]
+                in_job = batch_jobs == j
+                rows = positions[in_job & loaded]
+                if len(rows):
+                    job.add(pending_ids[rows], features[in_job[loaded]], pending_mtimes[rows], pending_keyframes[rows])
+                job.failed += int(np.count_nonzero(in_job & ~loaded))
+                job.pending -= int(np.count_nonzero(in_job))
+                if job.pending == 0:
+                    job.write(store)
+                    jobs[j] = None
+
+    logger.info(f"Embedded {embedded} keyframes; store holds {len(store)} embeddings in {len(store.shards)} shards")
+    return store
+
+
+def export_pt(npy_path: str, pt_path: str):
+    """
+    Save the consolidated matrix as the torch tensor file EMBEDDING_PATH historically pointed to.
+    """
+    embeddings = np.load(npy_path, mmap_mode="r")
+    torch.save(torch.from_numpy(np.ascontiguousarray(embeddings)), pt_path)
+    logger.info(f"Saved embeddings to {pt_path} with shape {embeddings.shape}")
+
 
 if __name__ == "__main__":
-    generate_embeddings()
+    app_settings = AppSettings()
+    parser = argparse.ArgumentParser(description="Embed keyframe images with the CLIP image encoder.")
+    parser.add_argument("--keyframe_dir", type=str, default=app_settings.DATA_FOLDER)
+    parser.add_argument("--table_path", type=str, default=app_settings.KEYFRAME_TABLE_PATH)
+    parser.add_argument("--id2index_path", type=str, default=app_settings.ID2INDEX_PATH)
+    parser.add_argument(
+        "--shard_dir", type=str, default=app_settings.EMBEDDING_SHARD_DIR,
+        help="Per-video shard store; rerunning only embeds new or changed keyframes."
+    )
+    parser.add_argument(
+        "--output_path", type=str, default=None,
+        help="Also write every shard into one .npy matrix for the local/usearch backends."
+    )
+    parser.add_argument(
+        "--pt_path", type=str, default=None,
+        help="Also save that matrix as a torch tensor file (requires --output_path)."
+    )
+    parser.add_argument("--model_name", type=str, default=app_settings.MODEL_NAME)
+    parser.add_argument(
+        "--groups", type=int, nargs="*", default=DEFAULT_GROUPS,
+        help="Group numbers to embed; pass no values to embed every group."
+    )
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--num_workers", type=int, default=4, help="Image decode/preprocess worker processes.")
+    parser.add_argument("--num_threads", type=int, default=None, help="torch intra-op threads for CPU inference.")
+    parser.add_argument("--device", type=str, default=app_settings.MODEL_DEVICE)
+    args = parser.parse_args()
+
+    store = generate_embeddings(
+        keyframe_dir=args.keyframe_dir,
+        table_path=args.table_path,
+        id2index_path=args.id2index_path,
+        shard_dir=args.shard_dir,
+        model_name=args.model_name,
+        groups=args.groups,
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
+        num_threads=args.num_threads,
+        device=args.device
+    )
+    if args.output_path:
+        store.to_memmap(args.output_path)
+        logger.info(f"Wrote {len(store)} embeddings to {args.output_path}")
+        if args.pt_path:
+            export_pt(args.output_path, args.pt_path)
@@ -0,0 +1,84 @@
+import argparse
+from pathlib import Path
+import numpy as np
+from tqdm import tqdm
+
+import sys
+import os
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+
+from app.core.settings import AppSettings
+from app.common.frame_map import (
+    FRAME_MAP_DTYPE,
+    MAP_FILE_PATTERN,
+    frame_map_key,
+    read_frame_map_csv,
+)
+
+try:
+    from core.logger import SimpleLogger, logger
+except ImportError:
+    import logging
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(message)s')
+    logger = logging.getLogger(__name__)
+    SimpleLogger = logging.getLogger
+
+logger = SimpleLogger(__name__)
+
+
+def generate_frame_map(map_keyframes_dir: str, output_path: str) -> np.ndarray:
+    """
+    Pack every map-keyframes/Lxx_Vyyy.csv into one FRAME_MAP_DTYPE table sorted by
+    (group, video, n), saved as .npy for FrameMap to memory-map at startup.
+    """
+    map_keyframes_dir = Path(map_keyframes_dir)
+    if not map_keyframes_dir.exists():
+        raise FileNotFoundError(f"map-keyframes directory {map_keyframes_dir} does not exist")
+
+    map_files = sorted(f for f in os.listdir(map_keyframes_dir) if MAP_FILE_PATTERN.match(f))
+    chunks = []
+    for map_file in tqdm(map_files, desc="Reading map-keyframes"):
+        group_num, video_num = map(int, MAP_FILE_PATTERN.match(map_file).groups())
+        try:
+            frames = read_frame_map_csv(map_keyframes_dir / map_file)
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping malformed map file {map_file}: {e}")
+            continue
+
+        chunk = np.empty(len(frames), dtype=FRAME_MAP_DTYPE)
+        chunk["key"] = frame_map_key(group_num, video_num, frames["n"])
+        chunk["frame_idx"] = frames["frame_idx"]
+        chunk["pts_time"] = frames["pts_time"]
+        chunk["fps"] = frames["fps"]
+        chunks.append(chunk)
+
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=FRAME_MAP_DTYPE)
+    records = records[np.argsort(records["key"], kind="stable")]
+    duplicates = int(np.count_nonzero(records["key"][1:] == records["key"][:-1]))
+    if duplicates:
+        logger.warning(f"{duplicates} duplicate (group, video, n) rows; lookups return the first")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    np.save(output_path, records)
+    logger.info(f"Saved frame map with {len(records)} rows from {len(chunks)} videos to {output_path}")
+    return records
+
+
+if __name__ == "__main__":
+    app_settings = AppSettings()
+    parser = argparse.ArgumentParser(description="Pack map-keyframes CSVs into one frame_idx lookup table.")
+    parser.add_argument(
+        "--map_keyframes_dir", type=str, default=app_settings.MAP_KEYFRAMES_FOLDER,
+        help="Folder of Lxx_Vyyy.csv files."
+    )
+    parser.add_argument(
+        "--output_path", type=str, default=app_settings.FRAME_MAP_PATH,
+        help="Output .npy path (defaults to FRAME_MAP_PATH)."
+    )
+    args = parser.parse_args()
+
+    generate_frame_map(args.map_keyframes_dir, args.output_path)
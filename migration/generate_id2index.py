@@ -1,13 +1,27 @@
+import argparse
 import os
 import json
 import sys
 import io
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 
 # Add root directory to Python path
-ROOT_DIR = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline-main"
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, ROOT_DIR)
 
+from app.common.keyframe_index import (
+    EXT_UNKNOWN,
+    KEYFRAME_TABLE_DTYPE,
+    KeyframeIndexTable,
+    extension_code,
+    split_video_key,
+    video_key,
+)
+from app.common.embedding_store import SHARD_MANIFEST
+from app.core.settings import AppSettings
+
 try:
     from core.logger import SimpleLogger, logger
 except ImportError:
@@ -18,14 +32,174 @@ except ImportError:
 
 logger = SimpleLogger(__name__)
 
-def generate_id2index(keyframes_root: str, output_path: str, expected_count: int = 289324):
+
+# Groups scanned by default (Keyframes_L21 to Keyframes_L30)
+DEFAULT_GROUPS = list(range(21, 31))
+# Binary manifest written next to id2index.json: the table records plus each video folder's mtime
+MANIFEST_SUFFIX = ".manifest.npz"
+
+
+def manifest_path_for(output_path: str | Path) -> Path:
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + MANIFEST_SUFFIX)
+
+
+def _keyframe_number(filename: str) -> int | None:
+    # Keyframe index from the file name, tolerating prefixes like 'frame_012.jpg'
+    digits = ''.join(filter(str.isdigit, filename.split('.')[0]))
+    return int(digits) if digits else None
+
+
+def _scan_video(video_path: str) -> list[tuple[int, int]]:
+    """
+    (keyframe number, ext code) of the images in one video folder, sorted by keyframe number.
+    """
+    found = []
+    try:
+        with os.scandir(video_path) as entries:
+            for entry in entries:
+                code = extension_code(entry.name)
+                if code == EXT_UNKNOWN:
+                    continue
+                keyframe_num = _keyframe_number(entry.name)
+                if keyframe_num is None:
+                    logger.warning(f"Skipping invalid keyframe file {entry.path}")
+                    continue
+                found.append((keyframe_num, code))
+    except OSError as e:
+        logger.warning(f"Failed to list keyframe files in {video_path}: {e}")
+    return sorted(found)
+
+
+def _list_videos(keyframes_root: Path, groups: list[int]) -> list[tuple[int, str, int]]:
+    """
+    (video key, folder path, folder mtime_ns) of every Keyframes_Lxx/keyframes/Lxx_Vyyy folder,
+    sorted by group then video.
+    """
+    videos = []
+    for group_num in groups:
+        video_root = keyframes_root / f"Keyframes_L{group_num:02d}" / "keyframes"
+        if not video_root.exists():
+            logger.warning(f"Video root {video_root} does not exist, skipping...")
+            continue
+        with os.scandir(video_root) as entries:
+            for entry in entries:
+                if not (entry.is_dir() and entry.name.startswith("L") and '_V' in entry.name):
+                    continue
+                try:
+                    video_num = int(entry.name.split('_V')[1])
+                except (IndexError, ValueError) as e:
+                    logger.warning(f"Skipping invalid video folder {entry.name}: {e}")
+                    continue
+                videos.append((video_key(group_num, video_num), entry.path, entry.stat().st_mtime_ns))
+    return sorted(videos)
+
+
+def _load_manifest(manifest_path: Path) -> tuple[np.ndarray, dict[int, int]] | None:
+    if not manifest_path.exists():
+        return None
+    with np.load(manifest_path) as manifest:
+        records = manifest["records"]
+        video_mtimes = dict(zip(manifest["video_keys"].tolist(), manifest["video_mtimes"].tolist()))
+    if records.dtype != KEYFRAME_TABLE_DTYPE:
+        logger.warning(f"Ignoring manifest {manifest_path} with dtype {records.dtype}")
+        return None
+    return records, video_mtimes
+
+
+def _video_rows(records: np.ndarray) -> dict[int, np.ndarray]:
+    # Row ids of each video in ``records``, from one sort instead of a scan per video
+    known = np.flatnonzero(records["group_num"] >= 0)
+    video_keys = video_key(records["group_num"][known], records["video_num"][known])
+    order = np.argsort(video_keys, kind="stable")
+    unique_keys, starts = np.unique(video_keys[order], return_index=True)
+    return dict(zip(unique_keys.tolist(), np.split(known[order], starts[1:])))
+
+
+def _clear_rows(records: np.ndarray, rows: np.ndarray):
+    for field in ("group_num", "video_num", "keyframe_num"):
+        records[field][rows] = -1
+    records["ext"][rows] = EXT_UNKNOWN
+
+
+def scan_keyframes(
+    keyframes_root: Path,
+    groups: list[int],
+    previous: tuple[np.ndarray, dict[int, int]] | None = None,
+    num_workers: int = 16
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Table records (row index == keyframe id) plus the video keys and folder mtimes they were built from.
+
+    Video folders are listed in parallel with os.scandir. With a ``previous`` manifest only folders
+    whose mtime changed are listed again; existing keyframes keep their ids, new ones are appended
+    and removed ones become -1 rows, so ids already embedded stay valid.
+    """
+    videos = _list_videos(keyframes_root, groups)
+    previous_records, previous_mtimes = previous if previous is not None else (None, {})
+    to_scan = [(key, path) for key, path, mtime in videos if previous_mtimes.get(key) != mtime]
+    logger.info(f"Listing {len(to_scan)} of {len(videos)} video folders with {num_workers} threads")
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        scanned = dict(zip([key for key, _ in to_scan], pool.map(_scan_video, [path for _, path in to_scan])))
+
+    if previous_records is None:
+        records = np.empty(0, dtype=KEYFRAME_TABLE_DTYPE)
+        previous_rows = {}
+    else:
+        records = previous_records.copy()
+        previous_rows = _video_rows(records)
+        # Videos of the scanned groups whose folder disappeared
+        listed = {key for key, _, _ in videos}
+        for key, rows in previous_rows.items():
+            if split_video_key(key)[0] in groups and key not in listed:
+                _clear_rows(records, rows)
+
+    appended = []
+    for key in scanned:
+        group_num, video_num = split_video_key(key)
+        found = dict(scanned[key])
+        rows = previous_rows.get(key, np.empty(0, dtype=np.int64))
+        existing = dict(zip(records["keyframe_num"][rows].tolist(), rows.tolist()))
+        gone = [row for keyframe_num, row in existing.items() if keyframe_num not in found]
+        _clear_rows(records, np.asarray(gone, dtype=np.int64))
+        for keyframe_num, code in sorted(found.items()):
+            row = existing.get(keyframe_num)
+            if row is not None:
+                records["ext"][row] = code
+            else:
+                appended.append((group_num, video_num, keyframe_num, code))
+
+    if appended:
+        records = np.concatenate([records, np.array(appended, dtype=KEYFRAME_TABLE_DTYPE)])
+    # Folder mtimes of groups outside this scan are carried over for the next one
+    mtimes = {key: mtime for key, mtime in previous_mtimes.items() if split_video_key(key)[0] not in groups}
+    mtimes.update((key, mtime) for key, _, mtime in videos)
+    video_keys = np.array(sorted(mtimes), dtype=np.int64)
+    video_mtimes = np.array([mtimes[key] for key in video_keys.tolist()], dtype=np.int64)
+    return records, video_keys, video_mtimes
+
+
+def generate_id2index(
+    keyframes_root: str,
+    output_path: str,
+    expected_count: int = 289324,
+    table_path: str | None = None,
+    groups: list[int] | None = None,
+    num_workers: int = 16,
+    incremental: bool = True
+):
     """
     Generate id2index.json from Keyframes directory with format like {"0": "24/1/137", "1": "24/1/138", ...}.
-    
+
     Args:
-        keyframes_root (str): Path to Keyframes directory (e.g., D:\AI Viet Nam\AI_Challenge\Dataset\Keyframes)
-        output_path (str): Path to save id2index.json
+        keyframes_root (str): Path to Keyframes directory (e.g., D:\\AI Viet Nam\\AI_Challenge\\Dataset\\Keyframes)
+        output_path (str): Path to save id2index.json; the binary manifest is saved next to it as <name>.manifest.npz
         expected_count (int): Expected number of keyframes (default: 289324)
+        table_path (str): Path to save the columnar KeyframeIndexTable .npy (with image extensions) the API loads (skipped if None)
+        groups (list[int]): Group numbers to scan (default: 21 to 30)
+        num_workers (int): Threads listing video folders
+        incremental (bool): Reuse the previous manifest and only list folders whose mtime changed
     """
     if os.name == 'nt':
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -35,92 +209,80 @@ def generate_id2index(keyframes_root: str, output_path: str, expected_count: int
         logger.error(f"Keyframes directory {keyframes_root} does not exist")
         raise FileNotFoundError(f"Keyframes directory {keyframes_root} does not exist")
 
-    id2index = {}
-    global_id = 0
-
-    try:
-        # Explicitly process Keyframes_L21 to Keyframes_L30
-        batch_folders = [f"Keyframes_L{i:02d}" for i in range(21, 31)]
-        logger.info(f"Processing {len(batch_folders)} batch folders: {batch_folders}")
-    except Exception as e:
-        logger.error(f"Failed to define batch folders: {e}")
-        raise
-
-    for batch_folder in batch_folders:
-        batch_path = keyframes_root / batch_folder
-        if not batch_path.exists():
-            logger.warning(f"Batch folder {batch_path} does not exist, skipping...")
-            continue
-
-        try:
-            batch_num = int(batch_folder.split('_L')[1])  # L24 -> 24
-        except (IndexError, ValueError) as e:
-            logger.warning(f"Skipping invalid batch folder {batch_folder}: {e}")
-            continue
-
-        video_root = batch_path / 'keyframes'
-        if not video_root.exists():
-            logger.warning(f"Video root {video_root} does not exist, skipping...")
-            continue
-
-        try:
-            video_folders = sorted(
-                [f for f in os.listdir(video_root) if f.startswith("L") and '_V' in f],
-                key=lambda x: int(x.split('_V')[1])
-            )
-            logger.debug(f"Found {len(video_folders)} video folders in {batch_folder}: {video_folders[:5]}...")
-        except Exception as e:
-            logger.warning(f"Failed to list video folders in {video_root}: {e}")
-            continue
-
-        for video_folder in video_folders:
-            try:
-                video_num = int(video_folder.split('_V')[1])
-            except (IndexError, ValueError) as e:
-                logger.warning(f"Skipping invalid video folder {video_folder}: {e}")
-                continue
-
-            video_path = video_root / video_folder
-            if not video_path.exists():
-                logger.warning(f"Video path {video_path} does not exist, skipping...")
-                continue
-
-            try:
-                keyframe_files = sorted(
-                    [f for f in os.listdir(video_path) if f.lower().endswith(('.jpg', '.png'))],
-                    key=lambda x: int(''.join(filter(str.isdigit, x.split('.')[0])))
-                )
-                logger.debug(f"Found {len(keyframe_files)} keyframe files in {video_folder}: {keyframe_files[:5]}...")
-            except Exception as e:
-                logger.warning(f"Failed to list keyframe files in {video_path}: {e}")
-                continue
-
-            for keyframe_file in keyframe_files:
-                try:
-                    # Extract keyframe index from filename, handling varied formats
-                    keyframe_idx = int(''.join(filter(str.isdigit, keyframe_file.split('.')[0])))
-                    value = f"{batch_num}/{video_num}/{keyframe_idx}"
-                    id2index[str(global_id)] = value
-                    global_id += 1
-                except (IndexError, ValueError) as e:
-                    logger.warning(f"Skipping invalid keyframe file {keyframe_file}: {e}")
-                    continue
+    groups = groups or DEFAULT_GROUPS
+    logger.info(f"Processing groups {groups}")
+    manifest_path = manifest_path_for(output_path)
+    previous = _load_manifest(manifest_path) if incremental else None
+    if previous is not None:
+        logger.info(f"Rescanning against {manifest_path} ({len(previous[0])} rows)")
 
-    logger.info(f"Generated {global_id} id2index entries")
-    if global_id != expected_count:
-        logger.warning(f"Generated {global_id} entries, expected {expected_count}. Dataset may be incomplete or file parsing issue.")
+    records, video_keys, video_mtimes = scan_keyframes(keyframes_root, groups, previous, num_workers)
+    valid = np.flatnonzero(records["group_num"] >= 0)
+    logger.info(f"Generated {len(valid)} id2index entries ({len(records) - len(valid)} retired ids)")
+    if len(valid) != expected_count:
+        logger.warning(f"Generated {len(valid)} entries, expected {expected_count}. Dataset may be incomplete or file parsing issue.")
 
+    id2index = {
+        str(id_): f"{group_num}/{video_num}/{keyframe_num}"
+        for id_, group_num, video_num, keyframe_num in zip(
+            valid.tolist(),
+            records["group_num"][valid].tolist(),
+            records["video_num"][valid].tolist(),
+            records["keyframe_num"][valid].tolist()
+        )
+    }
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(id2index, f, indent=4)
-        logger.info(f"Saved id2index.json with {global_id} entries at {output_path}")
+            json.dump(id2index, f, separators=(',', ':'))
+        logger.info(f"Saved id2index.json with {len(id2index)} entries at {output_path}")
     except Exception as e:
         logger.error(f"Failed to save id2index.json to {output_path}: {e}")
         raise
 
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, records=records, video_keys=video_keys, video_mtimes=video_mtimes)
+    os.replace(tmp_path, manifest_path)
+    logger.info(f"Saved binary manifest with {len(records)} rows at {manifest_path}")
+
+    if table_path:
+        KeyframeIndexTable(records).save(table_path)
+        logger.info(f"Saved keyframe index table with {len(records)} rows at {table_path}")
+
     return id2index
 
 if __name__ == "__main__":
-    keyframes_root = r"D:\AI Viet Nam\AI_Challenge\Dataset\Keyframes"
-    output_path = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline\file_embeddings\id2index.json"
-    generate_id2index(keyframes_root, output_path)
+    app_settings = AppSettings()
+    parser = argparse.ArgumentParser(description="Scan the Keyframes folder into id2index.json and a binary manifest.")
+    parser.add_argument("--keyframes_root", type=str, default=app_settings.DATA_FOLDER)
+    parser.add_argument("--output_path", type=str, default=app_settings.ID2INDEX_PATH)
+    parser.add_argument("--table_path", type=str, default=app_settings.KEYFRAME_TABLE_PATH)
+    parser.add_argument("--groups", type=int, nargs="*", default=DEFAULT_GROUPS)
+    parser.add_argument("--num_workers", type=int, default=16, help="Threads listing video folders.")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Ignore the previous manifest: list every folder and renumber ids from 0. Every id-keyed "
+             "artifact goes stale: rerun generate_embeddings_features.py (it re-keys the shards), then "
+             "rebuild the Milvus collection and rerun keyframe_migration.py."
+    )
+    parser.add_argument(
+        "--shard_dir", type=str, default=app_settings.EMBEDDING_SHARD_DIR,
+        help="Embedding shard store checked before --full renumbers ids."
+    )
+    parser.add_argument("--force", action="store_true", help="Allow --full even when embedding shards exist.")
+    args = parser.parse_args()
+
+    if args.full and not args.force and (Path(args.shard_dir) / SHARD_MANIFEST).exists():
+        parser.error(
+            f"--full renumbers every keyframe id, but embedding shards exist in {args.shard_dir}; "
+            "pass --force, then regenerate the shards, Milvus and keyframe metadata"
+        )
+
+    generate_id2index(
+        args.keyframes_root,
+        args.output_path,
+        table_path=args.table_path,
+        groups=args.groups,
+        num_workers=args.num_workers,
+        incremental=not args.full
+    )
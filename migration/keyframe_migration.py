@@ -1,8 +1,11 @@
 import argparse
 import asyncio
 import json
+import time
+import numpy as np
 from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
+from pymongo import DeleteMany, IndexModel, UpdateOne
+from tqdm import tqdm
 import sys
 import os
 
@@ -18,7 +21,9 @@ except ImportError:
 
 logger = SimpleLogger(__name__)
 # Add root directory to Python path
-ROOT_FOLDER = r"D:\AI Viet Nam\AI_Challenge\Source_Code\HCMAI2025_Baseline"
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
 sys.path.insert(0, ROOT_FOLDER)
 
 # Debug directory structure
@@ -34,13 +39,17 @@ else:
 # Try importing Keyframe
 try:
     from app.models.keyframe import Keyframe
-    from app.core.settings import MongoDBSettings
+    from app.core.settings import MongoDBSettings, AppSettings
+    from app.core.index_version import bump_index_version
+    from app.common.keyframe_index import KeyframeIndexTable
 except ImportError as e:
     logger.error(f"Failed to import Keyframe or MongoDBSettings: {e}")
     logger.info("Attempting alternative import paths...")
     try:
         from models.keyframe import Keyframe
-        from core.settings import MongoDBSettings
+        from core.settings import MongoDBSettings, AppSettings
+        from core.index_version import bump_index_version
+        from common.keyframe_index import KeyframeIndexTable
         logger.info("Successfully imported Keyframe from models.keyframe")
     except ImportError as e:
         logger.error(f"Alternative import failed: {e}")
@@ -66,55 +75,120 @@ async def init_db():
         # Test connection
         await client.server_info()
         logger.info("Successfully connected to MongoDB Atlas")
-        await init_beanie(database=client[settings.MONGO_DB], document_models=[Keyframe])
-        logger.info("Initialized Beanie with Keyframe model")
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB Atlas: {e}")
         raise
+    # Raw motor collection behind the Keyframe model; documents are written as plain dicts
+    return client, client[settings.MONGO_DB][Keyframe.Settings.name]
 
 
-def load_json_data(file_path):
-    return json.load(open(file_path, 'r', encoding='utf-8'))
+def load_keyframe_records(file_path: str) -> np.ndarray:
+    """
+    Keyframe table records (row index == key) from a table .npy (memory-mapped), an
+    id2index manifest .npz or id2index.json.
+    """
+    if file_path.endswith(".npy"):
+        return KeyframeIndexTable.load(file_path).records
+    if file_path.endswith(".npz"):
+        with np.load(file_path) as manifest:
+            return manifest["records"]
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return KeyframeIndexTable.from_id2index(json.load(f)).records
 
 
-def transform_data(data: dict[str, str]) -> list[Keyframe]:
+def build_operations(records: np.ndarray, start: int) -> list:
     """
-    Convert the data from the old format to the new Keyframe model.
+    Idempotent bulk operations for rows ``start:start + len(records)``: raw-dict upserts keyed on
+    ``key`` for known keyframes, one delete for retired (-1) ids.
     """
-    keyframes = []
-    for key, value in data.items():
-        group, video, keyframe = value.split('/')
-        keyframe_obj = Keyframe(
-            key=int(key),
-            video_num=int(video),
-            group_num=int(group),
-            keyframe_num=int(keyframe)
+    keys = np.arange(start, start + len(records))
+    valid = records["group_num"] >= 0
+    operations = [
+        UpdateOne(
+            {"key": key},
+            {"$set": {"key": key, "video_num": video_num, "group_num": group_num, "keyframe_num": keyframe_num}},
+            upsert=True
         )
-        keyframes.append(keyframe_obj)
-    return keyframes
-
-
-async def migrate_keyframes(file_path):
-    await init_db()
-    data = load_json_data(file_path)
-    keyframes = transform_data(data)
+        for key, group_num, video_num, keyframe_num in zip(
+            keys[valid].tolist(),
+            records["group_num"][valid].tolist(),
+            records["video_num"][valid].tolist(),
+            records["keyframe_num"][valid].tolist()
+        )
+    ]
+    retired = keys[~valid].tolist()
+    if retired:
+        operations.append(DeleteMany({"key": {"$in": retired}}))
+    return operations
 
-    await Keyframe.delete_all()
 
-    await Keyframe.insert_many(keyframes)
-    print(f"Inserted {len(keyframes)} keyframes into the database.")
+async def migrate_keyframes(file_path: str, batch_size: int = 1000, concurrency: int = 8):
+    """
+    Stream the keyframe table into MongoDB as unordered bulk upserts, ``concurrency`` batches in
+    flight. The collection is never emptied, so the API keeps serving during the migration.
+    """
+    client, collection = await init_db()
+    records = load_keyframe_records(file_path)
+    logger.info(f"Migrating {len(records)} keyframe ids in batches of {batch_size}, {concurrency} in flight")
+
+    # Upserts look documents up by key, so its unique index has to exist before the load;
+    # the secondary indexes are built once afterwards
+    await collection.create_index("key", unique=True)
+
+    started = time.perf_counter()
+    progress = tqdm(total=len(records), desc="Migrating keyframes", unit="kf")
+    totals = {"upserted": 0, "modified": 0, "deleted": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def write_batch(start: int):
+        try:
+            batch = records[start:start + batch_size]
+            operations = build_operations(batch, start)
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                totals["upserted"] += result.upserted_count
+                totals["modified"] += result.modified_count
+                totals["deleted"] += result.deleted_count
+            progress.update(len(batch))
+        finally:
+            semaphore.release()
+
+    tasks = []
+    for start in range(0, len(records), batch_size):
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(write_batch(start)))
+    await asyncio.gather(*tasks)
+    progress.close()
+
+    # Keys past the end of the table belong to an older, larger dataset
+    stale = await collection.delete_many({"key": {"$gte": len(records)}})
+    totals["deleted"] += stale.deleted_count
+    elapsed = time.perf_counter() - started
+
+    await collection.create_indexes([IndexModel(field) for field in ("video_num", "group_num", "keyframe_num")])
+    logger.info("Created video_num, group_num and keyframe_num indexes")
+
+    logger.info(
+        f"Upserted {totals['upserted']}, modified {totals['modified']}, deleted {totals['deleted']} keyframes "
+        f"in {elapsed:.1f}s ({len(records) / max(elapsed, 1e-9):.0f} ids/s)"
+    )
+    print(f"Bumped index version to {bump_index_version(AppSettings().INDEX_VERSION_PATH)}")
+    client.close()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Migrate keyframes to MongoDB.")
     parser.add_argument(
-        "--file_path", type=str, help="Path to the JSON file containing keyframe data."
+        "--file_path", type=str,
+        help="Keyframe table .npy, id2index manifest .npz or id2index.json."
     )
+    parser.add_argument("--batch_size", type=int, default=1000, help="Operations per bulk_write.")
+    parser.add_argument("--concurrency", type=int, default=8, help="bulk_write batches in flight.")
     args = parser.parse_args()
 
     if not os.path.exists(args.file_path):
         print(f"File {args.file_path} does not exist.")
         sys.exit(1)
 
-    asyncio.run(migrate_keyframes(args.file_path))
+    asyncio.run(migrate_keyframes(args.file_path, args.batch_size, args.concurrency))
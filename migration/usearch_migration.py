@@ -0,0 +1,132 @@
+import argparse
+import time
+import numpy as np
+from usearch.index import Index
+from tqdm import tqdm
+
+import sys
+import os
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+
+from app.core.settings import IndexPathSettings, AppSettings
+from app.core.index_version import bump_index_version
+from app.repository.local import load_normalized_embeddings
+
+try:
+    from core.logger import SimpleLogger, logger
+except ImportError:
+    import logging
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s | %(levelname)s | %(message)s')
+    logger = logging.getLogger(__name__)
+    SimpleLogger = logging.getLogger
+
+logger = SimpleLogger(__name__)
+
+
+def build_usearch_index(
+    embeddings: np.ndarray,
+    index_path: str,
+    connectivity: int = 16,
+    expansion_add: int = 128,
+    expansion_search: int = 64,
+    batch_size: int = 50000,
+) -> Index:
+    num_vectors, embedding_dim = embeddings.shape
+    index = Index(
+        ndim=embedding_dim,
+        metric='cos',
+        dtype='f32',
+        connectivity=connectivity,
+        expansion_add=expansion_add,
+        expansion_search=expansion_search,
+    )
+
+    for start in tqdm(range(0, num_vectors, batch_size), desc="Adding vectors"):
+        end = min(start + batch_size, num_vectors)
+        index.add(
+            np.arange(start, end, dtype=np.uint64),
+            np.ascontiguousarray(embeddings[start:end], dtype=np.float32)
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    index.save(index_path)
+    print(f"Saved USearch index with {len(index)} vectors to {index_path}")
+    return index
+
+
+def report_recall(
+    embeddings: np.ndarray,
+    index_path: str,
+    top_k: int = 100,
+    num_queries: int = 200,
+    seed: int = 0,
+):
+    """
+    Compare the mmap'd HNSW index against exact cosine search on sampled corpus vectors.
+    """
+    index = Index.restore(index_path, view=True)
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(embeddings.shape[0], size=min(num_queries, embeddings.shape[0]), replace=False)
+    queries = np.ascontiguousarray(embeddings[np.sort(query_ids)], dtype=np.float32)
+    # Perturb so the query is not trivially its own nearest neighbour
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact_latencies, ann_latencies, recalls = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        scores = embeddings @ query
+        exact_ids = np.argpartition(-scores, top_k - 1)[:top_k]
+        exact_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        matches = index.search(query, top_k)
+        ann_latencies.append(time.perf_counter() - start)
+
+        recalls.append(len(np.intersect1d(exact_ids, np.asarray(matches.keys, dtype=np.int64))) / top_k)
+
+    def _ms(values, q):
+        return np.percentile(values, q) * 1000
+
+    print(f"Recall@{top_k} over {len(queries)} queries: {np.mean(recalls):.4f} (min {np.min(recalls):.4f})")
+    print(f"Exact  latency: p50 {_ms(exact_latencies, 50):.2f} ms, p95 {_ms(exact_latencies, 95):.2f} ms")
+    print(f"USearch latency: p50 {_ms(ann_latencies, 50):.3f} ms, p95 {_ms(ann_latencies, 95):.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a USearch HNSW index from embedding pt.")
+    parser.add_argument(
+        "--file_path", type=str, help="Path to embedding pt."
+    )
+    parser.add_argument(
+        "--index_path", type=str, default=None,
+        help="Output index path (defaults to USEARCH_INDEX_PATH)."
+    )
+    parser.add_argument("--connectivity", type=int, default=16)
+    parser.add_argument("--expansion_add", type=int, default=128)
+    parser.add_argument("--expansion_search", type=int, default=64)
+    parser.add_argument("--top_k", type=int, default=100, help="k used for the recall report.")
+    parser.add_argument("--num_queries", type=int, default=200, help="Queries used for the recall report.")
+    parser.add_argument("--skip_build", action="store_true", help="Only run the recall/latency report.")
+    args = parser.parse_args()
+
+    index_path = args.index_path or IndexPathSettings().USEARCH_INDEX_PATH
+    if not index_path:
+        print("No index path given and USEARCH_INDEX_PATH is not set.")
+        sys.exit(1)
+
+    embeddings = load_normalized_embeddings(args.file_path)
+    if not args.skip_build:
+        build_usearch_index(
+            embeddings,
+            index_path,
+            connectivity=args.connectivity,
+            expansion_add=args.expansion_add,
+            expansion_search=args.expansion_search,
+        )
+        print(f"Bumped index version to {bump_index_version(AppSettings().INDEX_VERSION_PATH)}")
+    report_recall(embeddings, index_path, top_k=args.top_k, num_queries=args.num_queries)